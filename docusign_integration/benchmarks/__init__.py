@@ -0,0 +1,8 @@
+"""
+Benchmarks and load-test harnesses for the DocuSign and CMS integrations.
+
+These modules are not imported by the app at runtime. Run them against a
+dedicated development site, e.g.
+
+    bench --site bench.local execute docusign_integration.benchmarks.e2e.run
+"""
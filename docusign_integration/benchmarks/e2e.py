@@ -0,0 +1,333 @@
+"""
+End-to-end throughput benchmark for the DocuSign and CMS integration paths.
+
+Starts local fake DocuSign and CMS servers, points DocuSign Settings at them,
+then drives the real whitelisted functions at increasing concurrency levels and
+reports throughput and latency percentiles as JSON.
+
+Run it on a dedicated development site (it writes Tariff, Assign Tariff and File
+records and temporarily rewrites DocuSign Settings):
+
+    bench --site bench.local execute docusign_integration.benchmarks.e2e.run \\
+        --kwargs "{'concurrency': '1,4,8', 'requests_per_level': 100, 'latency_ms': 30, 'output': '/tmp/e2e.json'}"
+
+Sending requires existing documents of `doctype` with the fields used by
+`send_document_for_signature` (customer_email, customer_name, supplier_email, supplier_name).
+Pass them as `docnames`, or the latest records of `doctype` are used.
+"""
+
+import threading
+import time
+import uuid
+
+import frappe
+
+from docusign_integration.benchmarks.fake_servers import FakeCMS, FakeDocuSign
+from docusign_integration.benchmarks.stats import environment_info, summarize, write_report
+
+SCENARIOS = ("send", "download", "push_tariff", "assign_tariff")
+
+# DocuSign Settings fields rewritten for the duration of the run
+SETTINGS_FIELDS = (
+    "client_id",
+    "impersonated_user_guid",
+    "docusign_template_id",
+    "private_key",
+    "docusign_auth_url",
+    "docusign_base_path",
+    "cms_base_url",
+    "cms_api_key",
+)
+
+FIXTURE_PREFIX = "BENCH-E2E"
+
+
+def run(
+    concurrency="1,4,8",
+    requests_per_level=50,
+    scenarios=None,
+    doctype="EV Charging Contract",
+    docnames=None,
+    latency_ms=20,
+    jitter_ms=10,
+    error_rate=0.0,
+    chargepoints=500,
+    template_pages=2,
+    output=None,
+):
+    """
+    Runs the benchmark and returns the report dict.
+
+    Args:
+        concurrency (str or list): Concurrency levels, e.g. "1,4,8".
+        requests_per_level (int): Calls per scenario and concurrency level.
+        scenarios (str or list): Subset of "send", "download", "push_tariff", "assign_tariff".
+        doctype (str): DocType sent for signature in the "send" scenario.
+        docnames (str or list): Documents to send; defaults to the latest records of `doctype`.
+        latency_ms (float): Latency injected by the fake upstreams.
+        jitter_ms (float): Random extra latency injected by the fake upstreams.
+        error_rate (float): Fraction of upstream calls answered with HTTP 503.
+        chargepoints (int): Size of the fake CMS chargepoint catalogue.
+        template_pages (int): Page count of the fake DocuSign template PDF.
+        output (str): Optional path for the JSON report.
+    """
+    levels = _as_list(concurrency, int)
+    scenarios = _as_list(scenarios or SCENARIOS, str)
+    requests_per_level = int(requests_per_level)
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        frappe.throw(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    upstream_kwargs = {"latency_ms": float(latency_ms), "jitter_ms": float(jitter_ms), "error_rate": float(error_rate)}
+    docusign = FakeDocuSign(template_pages=int(template_pages), **upstream_kwargs).start()
+    cms = FakeCMS(chargepoints=int(chargepoints), **upstream_kwargs).start()
+
+    original_settings = _configure_settings(docusign, cms)
+    started_at = frappe.utils.now()
+    context = {"envelopes": [], "lock": threading.Lock()}
+    report = {
+        "environment": environment_info(),
+        "config": {
+            "concurrency": levels,
+            "requests_per_level": requests_per_level,
+            "scenarios": scenarios,
+            **upstream_kwargs,
+            "chargepoints": int(chargepoints),
+            "template_pages": int(template_pages),
+        },
+        "results": {},
+    }
+
+    try:
+        context.update(_create_fixtures(max(levels), doctype, docnames, "send" in scenarios))
+        for scenario in scenarios:
+            report["results"][scenario] = {}
+            for level in levels:
+                report["results"][scenario][str(level)] = _run_level(scenario, level, requests_per_level, context)
+        report["upstream_hits"] = {"docusign": dict(docusign.hits), "cms": dict(cms.hits)}
+    finally:
+        _cleanup(context, started_at)
+        _restore_settings(original_settings)
+        docusign.stop()
+        cms.stop()
+
+    print(write_report(report, output))
+    return report
+
+
+def _run_level(scenario, level, total, context):
+    """
+    Executes `total` calls of `scenario` spread over `level` threads, each with its own site connection.
+    """
+    call = SCENARIO_CALLS[scenario]
+    site = frappe.local.site
+    sites_path = frappe.local.sites_path
+    counter = iter(range(total))
+    counter_lock = threading.Lock()
+    latencies = []
+    errors = []
+    results_lock = threading.Lock()
+
+    def worker():
+        frappe.init(site=site, sites_path=sites_path)
+        frappe.connect()
+        frappe.set_user("Administrator")
+        # The fakes have no quota; don't let the DocuSign rate limiter throttle the measurement
+        frappe.local.conf.docusign_rate_limit = {"hourly_quota": 10**9}
+        try:
+            while True:
+                with counter_lock:
+                    index = next(counter, None)
+                if index is None:
+                    break
+                start = time.perf_counter()
+                try:
+                    call(index, context)
+                    frappe.db.commit()
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with results_lock:
+                        latencies.append(elapsed)
+                except Exception as e:
+                    frappe.db.rollback()
+                    with results_lock:
+                        errors.append(repr(e)[:200])
+                finally:
+                    frappe.local.message_log = []
+        finally:
+            frappe.destroy()
+
+    threads = [threading.Thread(target=worker, name=f"bench-{scenario}-{i}") for i in range(level)]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+
+    result = summarize(latencies, len(errors), wall)
+    result["sample_errors"] = sorted(set(errors))[:5]
+    return result
+
+
+def _call_send(index, context):
+    from docusign_integration.docusign_integration.api import send_document_for_signature
+
+    docnames = context["docnames"]
+    # Every call is a fresh send: without force and its own key the send guard would
+    # return the envelope of the previous call for the same document
+    envelope_id = send_document_for_signature(
+        doc={"doctype": context["doctype"], "name": docnames[index % len(docnames)]},
+        idempotency_key=str(uuid.uuid4()),
+        force=True,
+    )
+    with context["lock"]:
+        context["envelopes"].append(envelope_id)
+
+
+def _call_download(index, context):
+    from docusign_integration.docusign_integration.api import download_docusign_document
+
+    with context["lock"]:
+        envelopes = list(context["envelopes"])
+    envelope_id = envelopes[index % len(envelopes)] if envelopes else str(uuid.uuid4())
+    download_docusign_document(envelope_id)
+
+
+def _call_push_tariff(index, context):
+    from docusign_integration.tariff.api import push_tariff_to_cms
+
+    tariffs = context["tariffs"]
+    push_tariff_to_cms(frappe.get_doc("Tariff", tariffs[index % len(tariffs)]))
+
+
+def _call_assign_tariff(index, context):
+    from docusign_integration.tariff.api import assign_tariff_to_cms
+
+    assignments = context["assignments"]
+    result = assign_tariff_to_cms(assignments[index % len(assignments)])
+    if not result.get("success"):
+        raise Exception(result.get("message"))
+
+
+SCENARIO_CALLS = {
+    "send": _call_send,
+    "download": _call_download,
+    "push_tariff": _call_push_tariff,
+    "assign_tariff": _call_assign_tariff,
+}
+
+
+def _configure_settings(docusign, cms):
+    """
+    Points DocuSign Settings at the fake servers and returns the previous values.
+    """
+    settings = frappe.get_doc("DocuSign Settings", "DocuSign Settings")
+    original = {field: settings.get(field) for field in SETTINGS_FIELDS}
+
+    settings.update({
+        "client_id": "bench-client-id",
+        "impersonated_user_guid": "bench-user-guid",
+        "docusign_template_id": "bench-template-id",
+        "private_key": _generate_private_key(),
+        "docusign_auth_url": docusign.url,
+        "docusign_base_path": f"{docusign.url}/restapi",
+        "cms_base_url": cms.url,
+        "cms_api_key": "bench-api-key",
+    })
+    settings.flags.ignore_permissions = True
+    settings.save()
+    frappe.db.commit()
+    frappe.clear_document_cache("DocuSign Settings", "DocuSign Settings")
+    return original
+
+
+def _restore_settings(original):
+    settings = frappe.get_doc("DocuSign Settings", "DocuSign Settings")
+    settings.update(original)
+    settings.flags.ignore_permissions = True
+    settings.flags.ignore_mandatory = True
+    settings.save()
+    frappe.db.commit()
+    frappe.clear_document_cache("DocuSign Settings", "DocuSign Settings")
+
+
+def _create_fixtures(count, doctype, docnames, needs_documents):
+    """
+    Creates the Tariff and Assign Tariff records driven by the CMS scenarios.
+    """
+    fixtures = {"doctype": doctype, "docnames": _as_list(docnames, str) if docnames else [], "tariffs": [], "assignments": []}
+
+    if needs_documents and not fixtures["docnames"]:
+        fixtures["docnames"] = frappe.get_all(doctype, pluck="name", order_by="creation desc", limit=max(count, 8))
+        if not fixtures["docnames"]:
+            frappe.throw(f"No {doctype} records found to send. Pass docnames or create some first.")
+
+    for i in range(max(count, 8)):
+        tariff = frappe.get_doc({
+            "doctype": "Tariff",
+            "tariff_name": f"{FIXTURE_PREFIX}-{i}",
+            "type": "Energy",
+            "currency": "INR",
+            "value": 12.5,
+            "service_fee": 5,
+            "tax": "GST 18%",
+            "tax_identifier": "tax-gst-18",
+            "status": "Draft",
+        })
+        tariff.flags.ignore_permissions = True
+        tariff.insert()
+        # Assign Tariff only accepts Active tariffs that are in the CMS; set directly so nothing is pushed
+        tariff.db_set({"status": "Active", "cms_tariff_id": f"bench-tariff-{i}"}, update_modified=False)
+        fixtures["tariffs"].append(tariff.name)
+
+        assignment = frappe.get_doc({
+            "doctype": "Assign Tariff",
+            "charge_point": f"CP-{i + 1:05d}",
+            "charge_point_name": f"CP-{i + 1:05d}",
+            "status": "Draft",
+            "connectors": [
+                {"connector_number": str(n), "tariff": tariff.name, "cms_tariff_id": f"bench-tariff-{i}"}
+                for n in (1, 2)
+            ],
+        })
+        assignment.flags.ignore_permissions = True
+        assignment.flags.ignore_links = True
+        assignment.insert()
+        fixtures["assignments"].append(assignment.name)
+
+    frappe.db.commit()
+    return fixtures
+
+
+def _cleanup(context, started_at):
+    """
+    Removes the records created by the run.
+    """
+    frappe.db.rollback()
+    for name in context.get("assignments", []):
+        frappe.delete_doc("Assign Tariff", name, force=True, ignore_permissions=True)
+    for name in context.get("tariffs", []):
+        frappe.delete_doc("Tariff", name, force=True, ignore_permissions=True)
+    for name in frappe.get_all(
+        "File", filters={"file_name": ("like", "docusign_signed_%"), "creation": (">=", started_at)}, pluck="name"
+    ):
+        frappe.delete_doc("File", name, force=True, ignore_permissions=True)
+    frappe.db.commit()
+
+
+def _generate_private_key():
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode()
+
+
+def _as_list(value, cast):
+    if isinstance(value, str):
+        value = [v.strip() for v in value.split(",") if v.strip()]
+    return [cast(v) for v in value]
@@ -0,0 +1,329 @@
+"""
+Local stand-ins for the DocuSign and CMS HTTP APIs.
+
+Both servers run in a background thread on 127.0.0.1, answer with canned but
+well-formed payloads and support latency and error injection so that the
+integration code can be exercised end-to-end without touching real upstreams.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from docusign_integration.benchmarks.pdf_corpus import make_pdf
+
+
+class FakeUpstream:
+    """
+    Minimal routed HTTP server with latency and error injection.
+
+    Args:
+        latency_ms (float): Fixed delay added to every response.
+        jitter_ms (float): Extra uniformly distributed delay (0..jitter_ms).
+        error_rate (float): Fraction of requests answered with HTTP 503.
+        seed (int): Seed for the jitter and error generator, for repeatable runs.
+    """
+
+    name = "upstream"
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, seed=42):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.routes = []
+        self.hits = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.register_routes()
+
+    def register_routes(self):
+        raise NotImplementedError
+
+    def route(self, method, pattern, handler):
+        self.routes.append((method, re.compile(f"^{pattern}$"), handler))
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                upstream._dispatch(self, "GET")
+
+            def do_POST(self):
+                upstream._dispatch(self, "POST")
+
+            def do_PUT(self):
+                upstream._dispatch(self, "PUT")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"fake-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _should_fail(self):
+        with self._lock:
+            delay = self.latency_ms + (self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+            fail = self.error_rate and self._random.random() < self.error_rate
+        return delay, fail
+
+    def _dispatch(self, request, method):
+        parsed = urlparse(request.path)
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(parsed.path)
+            if route_method == method and match:
+                break
+        else:
+            return self._respond(request, 404, {"error": f"No fake route for {method} {parsed.path}"})
+
+        key = handler.__name__
+        with self._lock:
+            self.hits[key] = self.hits.get(key, 0) + 1
+
+        delay, fail = self._should_fail()
+        if delay:
+            time.sleep(delay / 1000.0)
+        if fail:
+            return self._respond(request, 503, {"error": "injected failure"})
+
+        status, payload = handler(
+            match=match,
+            query=parse_qs(parsed.query),
+            body=body,
+            headers=request.headers,
+        )
+        self._respond(request, status, payload)
+
+    def _respond(self, request, status, payload):
+        if isinstance(payload, bytes):
+            data, content_type = payload, "application/pdf"
+        else:
+            data, content_type = json.dumps(payload).encode(), "application/json"
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+
+class FakeDocuSign(FakeUpstream):
+    """
+    Stand-in for the DocuSign OAuth, userinfo, templates and envelopes APIs.
+
+    Serves the same generated PDF for template documents and signed envelope downloads.
+
+    Args:
+        template_pages (int): Page count of the served template PDF.
+        account_id (str): Account ID returned from userinfo.
+    """
+
+    name = "docusign"
+
+    def __init__(self, template_pages=2, account_id="fake-account-id", **kwargs):
+        self.account_id = account_id
+        self.template_pdf = make_pdf(template_pages, title="DocuSign Template")
+        self.envelopes = {}
+        self.chunked_uploads = {}
+        super().__init__(**kwargs)
+
+    def register_routes(self):
+        account = r"/restapi/v2\.1/accounts/(?P<account>[^/]+)"
+        self.route("POST", r"/oauth/token", self.token)
+        self.route("GET", r"/oauth/userinfo", self.userinfo)
+        self.route("GET", account + r"/templates/(?P<template>[^/]+)", self.template)
+        self.route("GET", account + r"/templates/(?P<template>[^/]+)/documents/(?P<document>[^/]+)", self.template_document)
+        self.route("POST", account + r"/envelopes", self.create_envelope)
+        self.route("POST", account + r"/chunked_uploads", self.create_chunked_upload)
+        self.route("GET", account + r"/chunked_uploads/(?P<upload>[^/]+)", self.get_chunked_upload)
+        self.route("PUT", account + r"/chunked_uploads/(?P<upload>[^/]+)", self.commit_chunked_upload)
+        self.route("PUT", account + r"/chunked_uploads/(?P<upload>[^/]+)/(?P<sequence>\d+)", self.put_chunked_upload_part)
+        self.route("GET", account + r"/envelopes/(?P<envelope>[^/]+)/documents", self.list_documents)
+        self.route("GET", account + r"/envelopes/(?P<envelope>[^/]+)/documents/(?P<document>[^/]+)", self.get_document)
+
+    def token(self, **kwargs):
+        return 200, {"access_token": uuid.uuid4().hex, "token_type": "Bearer", "expires_in": 3600}
+
+    def userinfo(self, **kwargs):
+        return 200, {
+            "sub": "fake-user",
+            "accounts": [{"account_id": self.account_id, "is_default": True, "base_uri": self.url}],
+        }
+
+    def template(self, match, **kwargs):
+        return 200, {
+            "templateId": match["template"],
+            "name": "Benchmark Template",
+            "documents": [{"documentId": "1", "name": "template.pdf", "order": "1"}],
+        }
+
+    def template_document(self, **kwargs):
+        return 200, self.template_pdf
+
+    def create_envelope(self, body, **kwargs):
+        envelope_id = str(uuid.uuid4())
+        with self._lock:
+            self.envelopes[envelope_id] = len(body)
+        return 201, {
+            "envelopeId": envelope_id,
+            "status": "sent",
+            "statusDateTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "uri": f"/envelopes/{envelope_id}",
+        }
+
+    def create_chunked_upload(self, body, **kwargs):
+        upload_id = str(uuid.uuid4())
+        with self._lock:
+            self.chunked_uploads[upload_id] = {"parts": {0: len(json.loads(body)["data"])}, "committed": False}
+        return 201, self._chunked_upload(upload_id)
+
+    def get_chunked_upload(self, match, **kwargs):
+        if match["upload"] not in self.chunked_uploads:
+            return 404, {"errorCode": "CHUNKED_UPLOAD_NOT_FOUND"}
+        return 200, self._chunked_upload(match["upload"])
+
+    def put_chunked_upload_part(self, match, body, **kwargs):
+        upload = self.chunked_uploads.get(match["upload"])
+        if not upload or upload["committed"]:
+            return 400, {"errorCode": "CHUNKED_UPLOAD_INVALID"}
+        with self._lock:
+            upload["parts"][int(match["sequence"])] = len(json.loads(body)["data"])
+        return 200, self._chunked_upload(match["upload"])
+
+    def commit_chunked_upload(self, match, query, **kwargs):
+        upload = self.chunked_uploads.get(match["upload"])
+        if not upload or (query.get("action") or [""])[0] != "commit":
+            return 400, {"errorCode": "CHUNKED_UPLOAD_INVALID"}
+        upload["committed"] = True
+        return 200, self._chunked_upload(match["upload"])
+
+    def _chunked_upload(self, upload_id):
+        upload = self.chunked_uploads[upload_id]
+        return {
+            "chunkedUploadId": upload_id,
+            "chunkedUploadUri": f"docusignchunkedupload://{upload_id}",
+            "committed": str(upload["committed"]).lower(),
+            "chunkedUploadParts": [{"sequence": str(s), "size": str(n)} for s, n in sorted(upload["parts"].items())],
+        }
+
+    def list_documents(self, match, **kwargs):
+        return 200, {
+            "envelopeId": match["envelope"],
+            "envelopeDocuments": [{"documentId": "1", "name": "Contract.pdf", "type": "content", "order": "1"}],
+        }
+
+    def get_document(self, **kwargs):
+        return 200, self.template_pdf
+
+
+class FakeCMS(FakeUpstream):
+    """
+    Stand-in for the CMS chargepoint, tax, group and tariff APIs.
+
+    Args:
+        chargepoints (int): Size of the served chargepoint catalogue.
+        connectors_per_chargepoint (int): Connectors returned per chargepoint.
+    """
+
+    name = "cms"
+
+    def __init__(self, chargepoints=500, connectors_per_chargepoint=2, **kwargs):
+        self.chargepoints = {f"CP-{i:05d}": f"Charge Point {i:05d}" for i in range(1, chargepoints + 1)}
+        self.connectors_per_chargepoint = connectors_per_chargepoint
+        self.tariffs = {}
+        self.mappings = []
+        self.rules = {"identifier": "fake-rules", "numotype": "ocpp", "rules": []}
+        super().__init__(**kwargs)
+
+    def register_routes(self):
+        self.route("GET", r"/frapeencmsasset/chargepoint/get/cpDisplayName", self.chargepoint_list)
+        self.route("GET", r"/frapeencmsasset/chargepoint/connectors", self.connectors)
+        self.route("GET", r"/frapeetariff/api/fetch-tax", self.taxes)
+        self.route("GET", r"/frappeasset/api/group", self.groups)
+        self.route("GET", r"/frapeetariff/api/tariff", self.list_tariffs)
+        self.route("POST", r"/frapeetariff/api/tariff", self.create_tariff)
+        self.route("POST", r"/frapeetariff/api/tariffChargePointMapping", self.map_tariff)
+        self.route("GET", r"/frapeetariff/api/tariff_rules", self.get_rules)
+        self.route("POST", r"/frapeetariff/api/tariff_rules", self.set_rules)
+
+    def chargepoint_list(self, **kwargs):
+        return 200, {"Document": self.chargepoints}
+
+    def connectors(self, query, **kwargs):
+        cp_id = (query.get("cpId") or [""])[0]
+        if cp_id not in self.chargepoints:
+            return 200, {"Document": []}
+        return 200, {
+            "Document": [
+                {"ChargePointConnectorNumber": str(n), "ChargePointId": cp_id}
+                for n in range(1, self.connectors_per_chargepoint + 1)
+            ]
+        }
+
+    def taxes(self, **kwargs):
+        return 200, [
+            {"name": "GST 18%", "identifier": "tax-gst-18", "rate": 18},
+            {"name": "GST 5%", "identifier": "tax-gst-5", "rate": 5},
+            {"name": "Exempt", "identifier": "tax-exempt", "rate": 0},
+        ]
+
+    def groups(self, **kwargs):
+        return 200, [{"name": f"Group {i}", "identifier": f"group-{i}"} for i in range(1, 21)]
+
+    def list_tariffs(self, **kwargs):
+        with self._lock:
+            return 200, list(self.tariffs.values())
+
+    def create_tariff(self, body, **kwargs):
+        payload = json.loads(body or b"{}")
+        identifier = payload.get("identifier") or uuid.uuid4().hex
+        with self._lock:
+            self.tariffs[identifier] = dict(payload, identifier=identifier)
+        return 200, {"identifier": identifier, "status": "success"}
+
+    def map_tariff(self, body, **kwargs):
+        payload = json.loads(body or b"{}")
+        with self._lock:
+            self.mappings.extend(payload.get("tariff") or [])
+        return 200, {"status": "success", "count": len(payload.get("tariff") or [])}
+
+    def get_rules(self, **kwargs):
+        with self._lock:
+            return 200, [self.rules]
+
+    def set_rules(self, body, **kwargs):
+        payload = json.loads(body or b"{}")
+        with self._lock:
+            self.rules = payload
+        return 200, {"status": "success"}
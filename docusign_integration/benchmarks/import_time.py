@@ -0,0 +1,142 @@
+"""
+Import-time budget for the integration modules.
+
+Imports each module in a fresh interpreter under `python -X importtime` and adds
+up what that import costs. Modules every Frappe worker has loaded anyway
+(BASELINE) are imported first, so only what the module itself brings in is
+counted. A module fails when it goes over its budget or eagerly imports one of the
+DEFERRED packages, which belong inside the functions that use them.
+
+It does not need a site, only the app's Python environment:
+
+    ./env/bin/python -m docusign_integration.benchmarks.import_time
+    ./env/bin/python -m docusign_integration.benchmarks.import_time --module docusign_integration.tariff.api --budget-ms 80
+
+The exit status is 1 when any module fails, so it can gate CI.
+"""
+
+import argparse
+import subprocess
+import sys
+
+from docusign_integration.benchmarks.stats import environment_info, write_report
+
+BASELINE = ("frappe", "requests")
+
+# Milliseconds of import time each module may add on top of BASELINE
+BUDGETS_MS = {
+    "docusign_integration.docusign_integration.api": 150,
+    "docusign_integration.tariff.api": 150,
+}
+
+# Heavy packages that must only be imported inside the functions that need them
+DEFERRED = ("docusign_esign", "PyPDF2", "pikepdf", "jwt", "numpy")
+
+TOP_IMPORTS = 10
+
+
+def run(modules=None, budget_ms=None, repeat=5, python=None, output=None):
+    """
+    Measures `modules` (default: every module in BUDGETS_MS) and returns the report dict.
+
+    Args:
+        modules (str or list): Dotted module paths, e.g. "docusign_integration.tariff.api".
+        budget_ms (float): Budget for every measured module, instead of BUDGETS_MS.
+        repeat (int): Fresh interpreters per module; the median run is reported.
+        python (str): Interpreter to measure with (default: the current one).
+        output (str): Optional path for the JSON report.
+    """
+    if isinstance(modules, str):
+        modules = [m.strip() for m in modules.split(",") if m.strip()]
+    modules = modules or list(BUDGETS_MS)
+
+    report = {
+        "environment": environment_info(),
+        "config": {"baseline": list(BASELINE), "deferred": list(DEFERRED), "repeat": int(repeat)},
+        "results": {},
+    }
+    for module in modules:
+        budget = float(budget_ms) if budget_ms else BUDGETS_MS.get(module)
+        report["results"][module] = check_module(module, budget, repeat=int(repeat), python=python)
+
+    report["ok"] = all(result["ok"] for result in report["results"].values())
+    print(write_report(report, output))
+    return report
+
+
+def check_module(module, budget_ms, repeat=5, python=None):
+    """
+    Import cost of `module` against `budget_ms` (None for no time budget).
+    """
+    runs = sorted((measure(module, python=python) for _ in range(repeat)), key=lambda r: r["total_ms"])
+    result = runs[len(runs) // 2]
+
+    result["budget_ms"] = budget_ms
+    result["deferred_imported"] = sorted(
+        {name.split(".")[0] for name in result.pop("modules") if name.split(".")[0] in DEFERRED}
+    )
+    result["runs_ms"] = [r["total_ms"] for r in runs]
+    result["ok"] = not result["deferred_imported"] and (budget_ms is None or result["total_ms"] <= budget_ms)
+    return result
+
+
+def measure(module, baseline=BASELINE, python=None):
+    """
+    One fresh-interpreter import of `module` after `baseline`.
+
+    Returns:
+        dict: total_ms, the imported module names and the heaviest imports by self time.
+    """
+    code = "; ".join(f"import {name}" for name in (*baseline, module))
+    proc = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    entries = parse_importtime(proc.stderr)
+    # Entries are printed as each import finishes, so everything after the last
+    # baseline package was brought in by `module`
+    last_baseline = max(
+        (i for i, (name, *_rest) in enumerate(entries) if name in baseline),
+        default=-1,
+    )
+    own = entries[last_baseline + 1:]
+
+    return {
+        "total_ms": round(sum(self_us for _name, self_us, _cumulative in own) / 1000, 2),
+        "modules": [name for name, *_rest in own],
+        "top_imports_ms": [
+            {"module": name, "self_ms": round(self_us / 1000, 2), "cumulative_ms": round(cumulative / 1000, 2)}
+            for name, self_us, cumulative in sorted(own, key=lambda e: e[1], reverse=True)[:TOP_IMPORTS]
+        ],
+    }
+
+
+def parse_importtime(stderr):
+    """
+    (module, self µs, cumulative µs) for every line of `-X importtime` output, in output order.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            # Header line
+            continue
+        entries.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return entries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", action="append", help="Module to measure; repeat for several")
+    parser.add_argument("--budget-ms", type=float, help="Budget for every measured module")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    args = parser.parse_args()
+    report = run(modules=args.module, budget_ms=args.budget_ms, repeat=args.repeat, output=args.output)
+    sys.exit(0 if report["ok"] else 1)
@@ -0,0 +1,151 @@
+"""
+Dependency-free PDF generator used to feed the benchmarks with realistic documents.
+"""
+
+import os
+import random
+import zlib
+from io import BytesIO
+
+PAGE_WIDTH = 595  # A4 in points
+PAGE_HEIGHT = 842
+
+# Size of the embedded image on "heavy" pages; noisy pixels so it barely compresses,
+# which is roughly what scanned annexures and photos look like to the PDF engine.
+IMAGE_WIDTH = 400
+IMAGE_HEIGHT = 300
+
+# Default benchmark matrix
+CORPUS_PAGES = (1, 10, 50, 100, 200)
+TEMPLATE_PAGES = 2
+
+
+def make_pdf(pages=1, title="Benchmark Contract", images=False, seed=0):
+    """
+    Builds a valid PDF with `pages` text pages.
+
+    Args:
+        pages (int): Number of pages to generate.
+        title (str): Text printed at the top of each page.
+        images (bool): Embed a distinct RGB image on every page.
+        seed (int): Seed for the image noise, for repeatable corpora.
+
+    Returns:
+        The PDF as bytes.
+    """
+    rng = random.Random(seed)
+    objects = []  # index + 1 == object number
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    page_tree = add(None)
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_refs = []
+    for page_no in range(1, pages + 1):
+        content = _text_stream(f"{title} - page {page_no} of {pages}")
+        resources = f"/Font << /F1 {font} 0 R >>"
+        if images:
+            image_ref = add(_image(rng))
+            resources += f" /XObject << /Im1 {image_ref} 0 R >>"
+            content += f"\nq {IMAGE_WIDTH} 0 0 {IMAGE_HEIGHT} 100 80 cm /Im1 Do Q".encode()
+        content_ref = add(_stream(content))
+        page_refs.append(add(
+            (
+                f"<< /Type /Page /Parent {page_tree} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources << {resources} >> /Contents {content_ref} 0 R >>"
+            ).encode()
+        ))
+
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs)
+    objects[page_tree - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_refs)} >>".encode()
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {page_tree} 0 R >>".encode()
+
+    return _serialize(objects, catalog)
+
+
+def build_corpus(pages=CORPUS_PAGES, template_pages=TEMPLATE_PAGES, directory=None):
+    """
+    Generates the benchmark corpus: one template PDF and a contract PDF per page count,
+    with and without heavy images.
+
+    Args:
+        pages (iterable): Contract page counts.
+        template_pages (int): Page count of the DocuSign template stand-in.
+        directory (str): When given, the PDFs are also written there for reuse by other tools.
+
+    Returns:
+        dict with "template" bytes and "contracts", a list of
+        {"name", "pages", "images", "bytes"} entries.
+    """
+    corpus = {"template": make_pdf(template_pages, title="DocuSign Template"), "contracts": []}
+    for page_count in pages:
+        for images in (False, True):
+            name = f"contract_{page_count:03d}p_{'images' if images else 'text'}"
+            corpus["contracts"].append({
+                "name": name,
+                "pages": page_count,
+                "images": images,
+                "bytes": make_pdf(page_count, images=images, seed=page_count),
+            })
+
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "template.pdf"), "wb") as f:
+            f.write(corpus["template"])
+        for contract in corpus["contracts"]:
+            with open(os.path.join(directory, f"{contract['name']}.pdf"), "wb") as f:
+                f.write(contract["bytes"])
+
+    return corpus
+
+
+def _image(rng):
+    pixels = rng.randbytes(IMAGE_WIDTH * IMAGE_HEIGHT * 3)
+    return _stream(
+        zlib.compress(pixels, 1),
+        f" /Type /XObject /Subtype /Image /Width {IMAGE_WIDTH} /Height {IMAGE_HEIGHT}"
+        " /ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode",
+    )
+
+
+def _text_stream(text):
+    lines = [text] + [
+        f"Clause {i}: The parties agree to the tariff schedule set out in the annexure." for i in range(1, 30)
+    ]
+    ops = ["BT", "/F1 11 Tf", "14 TL", f"50 {PAGE_HEIGHT - 60} Td"]
+    for line in lines:
+        ops.append(f"({_escape(line)}) Tj T*")
+    ops.append("ET")
+    return "\n".join(ops).encode()
+
+
+def _stream(data, extra=""):
+    return b"<< /Length %d%s >>\nstream\n" % (len(data), extra.encode()) + data + b"\nendstream"
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _serialize(objects, root):
+    out = BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number)
+        out.write(body)
+        out.write(b"\nendobj\n")
+
+    xref_offset = out.tell()
+    out.write(b"xref\n0 %d\n" % (len(objects) + 1))
+    out.write(b"0000000000 65535 f \n")
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\n" % (len(objects) + 1, root))
+    out.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+    return out.getvalue()
@@ -0,0 +1,206 @@
+"""
+Micro-benchmark of the contract PDF pipeline.
+
+Times every stage that `get_merged_contract_for_signature` goes through for a
+template + contract pair (parse, merge, write, base64, page-count reparse) over a
+generated corpus of 1-200 page contracts with and without heavy images, and
+records the peak memory of each stage with tracemalloc. Merge + page count is
+also timed with every installed PDF backend (utils/pdf_backend.py).
+
+It does not need a site, only the app's Python environment:
+
+    ./env/bin/python -m docusign_integration.benchmarks.pdf_pipeline --output /tmp/pdf.json
+"""
+
+import argparse
+import base64
+import gc
+import statistics
+import time
+import tracemalloc
+from io import BytesIO
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from docusign_integration.benchmarks.pdf_corpus import CORPUS_PAGES, TEMPLATE_PAGES, build_corpus
+from docusign_integration.benchmarks.stats import environment_info, write_report
+
+STAGES = ("parse", "merge", "write", "base64", "page_count")
+
+
+def run(pages=None, template_pages=TEMPLATE_PAGES, repeat=3, corpus_dir=None, output=None):
+    """
+    Runs the benchmark and returns the report dict.
+
+    Args:
+        pages (str or list): Contract page counts, e.g. "1,10,200".
+        template_pages (int): Page count of the template stand-in.
+        repeat (int): Timing repetitions per document; the median and minimum are reported.
+        corpus_dir (str): Optional directory to keep the generated PDFs in.
+        output (str): Optional path for the JSON report.
+    """
+    if isinstance(pages, str):
+        pages = [int(p) for p in pages.split(",") if p.strip()]
+    pages = pages or CORPUS_PAGES
+    repeat = int(repeat)
+
+    corpus = build_corpus(pages=pages, template_pages=int(template_pages), directory=corpus_dir)
+    template = corpus["template"]
+
+    report = {
+        "environment": environment_info(),
+        "config": {"pages": list(pages), "template_pages": int(template_pages), "repeat": repeat},
+        "results": [],
+    }
+
+    for contract in corpus["contracts"]:
+        timings = {stage: [] for stage in STAGES}
+        timings["merge_pdfs"] = []
+        for _ in range(repeat):
+            for stage, seconds in _time_pipeline(template, contract["bytes"]).items():
+                timings[stage].append(seconds * 1000)
+            merge_pdfs_ms = _time_merge_pdfs(template, contract["bytes"])
+            if merge_pdfs_ms is not None:
+                timings["merge_pdfs"].append(merge_pdfs_ms)
+            for stage, ms in _time_backends(template, contract["bytes"]).items():
+                timings.setdefault(stage, []).append(ms)
+
+        report["results"].append({
+            "name": contract["name"],
+            "pages": contract["pages"],
+            "images": contract["images"],
+            "input_bytes": len(contract["bytes"]),
+            "time_ms": {
+                stage: {"median": round(statistics.median(values), 3), "min": round(min(values), 3)}
+                for stage, values in timings.items()
+                if values
+            },
+            "peak_memory_bytes": _profile_pipeline(template, contract["bytes"]),
+        })
+
+    print(write_report(report, output))
+    return report
+
+
+def _pipeline(template_bytes, contract_bytes, checkpoint):
+    """
+    The stages of `merge_pdfs` + `get_merged_contract` + the page-count reparse in
+    `get_merged_contract_for_signature`; `checkpoint(stage)` is called after each one.
+    """
+    template_reader = PdfReader(BytesIO(template_bytes))
+    contract_reader = PdfReader(BytesIO(contract_bytes))
+    template_pages = list(template_reader.pages)
+    contract_pages = list(contract_reader.pages)
+    checkpoint("parse")
+
+    writer = PdfWriter()
+    for page in template_pages:
+        writer.add_page(page)
+    for page in contract_pages:
+        writer.add_page(page)
+    checkpoint("merge")
+
+    buffer = BytesIO()
+    writer.write(buffer)
+    merged = buffer.getvalue()
+    buffer.close()
+    checkpoint("write")
+
+    encoded = base64.b64encode(merged).decode()
+    checkpoint("base64")
+
+    total_pages = len(PdfReader(BytesIO(merged)).pages)
+    checkpoint("page_count")
+
+    return merged, encoded, total_pages
+
+
+def _time_pipeline(template_bytes, contract_bytes):
+    timings = {}
+    last = [time.perf_counter()]
+
+    def checkpoint(stage):
+        now = time.perf_counter()
+        timings[stage] = now - last[0]
+        last[0] = now
+
+    gc.collect()
+    _pipeline(template_bytes, contract_bytes, checkpoint)
+    return timings
+
+
+def _time_merge_pdfs(template_bytes, contract_bytes):
+    """
+    Times the real `merge_pdfs` when the app's dependencies (frappe, docusign_esign) are importable.
+    """
+    try:
+        from docusign_integration.docusign_integration.api import merge_pdfs
+    except ImportError:
+        return None
+
+    gc.collect()
+    start = time.perf_counter()
+    merge_pdfs(template_bytes, contract_bytes)
+    return (time.perf_counter() - start) * 1000
+
+
+def _time_backends(template_bytes, contract_bytes):
+    """
+    Merge + page count with each installed PDF backend, as `backend_<name>` stages.
+    """
+    try:
+        from docusign_integration.utils.pdf_backend import BACKENDS
+    except ImportError:
+        return {}
+
+    timings = {}
+    for name, backend_class in BACKENDS.items():
+        if not backend_class.available():
+            continue
+        backend = backend_class()
+        gc.collect()
+        start = time.perf_counter()
+        backend.page_count(backend.merge([template_bytes, contract_bytes]))
+        timings[f"backend_{name}"] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def _profile_pipeline(template_bytes, contract_bytes):
+    """
+    Peak traced allocation of each stage, measured in a separate pass so that
+    tracemalloc overhead does not distort the timings.
+    """
+    peaks = {}
+
+    def checkpoint(stage):
+        current, peak = tracemalloc.get_traced_memory()
+        peaks[stage] = peak - baseline[0]
+        baseline[0] = current
+        tracemalloc.reset_peak()
+
+    gc.collect()
+    tracemalloc.start()
+    baseline = [tracemalloc.get_traced_memory()[0]]
+    try:
+        _pipeline(template_bytes, contract_bytes, checkpoint)
+    finally:
+        tracemalloc.stop()
+    peaks["max_stage"] = max(peaks.values())
+    return peaks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default=",".join(str(p) for p in CORPUS_PAGES), help="Contract page counts")
+    parser.add_argument("--template-pages", type=int, default=TEMPLATE_PAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--corpus-dir", help="Keep the generated PDFs in this directory")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    args = parser.parse_args()
+    run(
+        pages=args.pages,
+        template_pages=args.template_pages,
+        repeat=args.repeat,
+        corpus_dir=args.corpus_dir,
+        output=args.output,
+    )
@@ -0,0 +1,86 @@
+"""Latency statistics and report helpers shared by the benchmark harnesses."""
+
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+
+    Args:
+        sorted_values (list): Values in ascending order.
+        pct (float): Percentile between 0 and 100.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies_ms, errors, wall_seconds):
+    """
+    Builds the standard result block: count, error rate, throughput and latency percentiles.
+    """
+    values = sorted(latencies_ms)
+    total = len(values) + errors
+    return {
+        "requests": total,
+        "ok": len(values),
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_sec": round(total / wall_seconds, 2) if wall_seconds else 0.0,
+        "latency_ms": {
+            "min": round(values[0], 2) if values else None,
+            "p50": _round(percentile(values, 50)),
+            "p90": _round(percentile(values, 90)),
+            "p95": _round(percentile(values, 95)),
+            "p99": _round(percentile(values, 99)),
+            "max": round(values[-1], 2) if values else None,
+            "mean": round(sum(values) / len(values), 2) if values else None,
+        },
+    }
+
+
+def environment_info():
+    """
+    Identifies the commit and interpreter so that reports can be compared between runs.
+    """
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def write_report(report, output=None):
+    """
+    Writes the report as JSON to `output` (when given) and returns the serialized string.
+    """
+    serialized = json.dumps(report, indent=2, sort_keys=True, default=str)
+    if output:
+        with open(output, "w") as f:
+            f.write(serialized)
+    return serialized
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def _git_commit():
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=app_dir,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except Exception:
+        return None
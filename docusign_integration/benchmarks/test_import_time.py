@@ -0,0 +1,23 @@
+# Copyright (c) 2026, nithin and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from docusign_integration.benchmarks.import_time import BUDGETS_MS, check_module, parse_importtime
+
+API_MODULE = "docusign_integration.docusign_integration.api"
+
+
+class TestImportTime(FrappeTestCase):
+	def test_parse_importtime(self):
+		stderr = (
+			"import time: self [us] | cumulative | imported package\n"
+			"import time:       120 |        120 |   _io\n"
+			"import time:      2500 |       4100 | docusign_esign\n"
+		)
+		self.assertEqual(parse_importtime(stderr), [("_io", 120, 120), ("docusign_esign", 2500, 4100)])
+
+	def test_api_module_stays_lean(self):
+		result = check_module(API_MODULE, BUDGETS_MS[API_MODULE], repeat=3)
+		self.assertEqual(result["deferred_imported"], [], "Import these inside the functions that use them")
+		self.assertLessEqual(result["total_ms"], result["budget_ms"], result["top_imports_ms"])
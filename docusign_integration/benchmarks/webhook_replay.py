@@ -0,0 +1,311 @@
+"""
+Webhook replay load test for `handle_webhook`.
+
+Replays recorded or synthetic DocuSign Connect payloads at a fixed rate against
+a running site and reports ack latency, error rate and database writes per event.
+
+    bench --site bench.local execute docusign_integration.benchmarks.webhook_replay.run \\
+        --kwargs "{'site_url': 'http://bench.local:8000', 'rate': 50, 'duration': 30, 'output': '/tmp/webhooks.json'}"
+
+Synthetic payloads target existing documents of `doctype` and cover the shapes
+parsed by the handler:
+
+- ``connect_v2``: ``data.envelopeSummary.customFields`` (Connect JSON SIM)
+- ``data_custom_fields``: ``data.customFields`` with the status in ``data.envelopeSummary``
+- ``top_level``: ``envelopeId``/``status``/``customFields`` at the top level
+- ``form``: form-encoded ``envelopeId``/``status``/``frappe_doctype``/``frappe_docname``
+
+Recorded payloads are read from a JSON-lines file, one Connect message per line.
+A line may also be ``{"content_type": ..., "body": ...}`` to replay a raw body as-is.
+"""
+
+import itertools
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import frappe
+import requests
+from requests.adapters import HTTPAdapter
+
+from docusign_integration.benchmarks.stats import environment_info, summarize, write_report
+
+WEBHOOK_METHOD = "docusign_integration.docusign_integration.api.handle_webhook"
+
+SHAPES = ("connect_v2", "data_custom_fields", "top_level", "form")
+
+# Envelope lifecycle replayed per document, in order
+STATUS_SEQUENCE = ("sent", "delivered", "completed")
+
+DB_WRITE_COUNTERS = ("Com_insert", "Com_update", "Com_delete", "Com_replace")
+
+
+def run(
+    site_url=None,
+    rate=20,
+    duration=10,
+    count=None,
+    max_in_flight=64,
+    payloads_file=None,
+    shapes=None,
+    doctype="EV Charging Contract",
+    docnames=None,
+    timeout=30,
+    drain_timeout=120,
+    output=None,
+):
+    """
+    Replays webhook payloads and returns the report dict.
+
+    Args:
+        site_url (str): Base URL of the site under test; defaults to the site's own URL.
+        rate (float): Target events per second.
+        duration (float): Seconds to replay for, unless `count` is given.
+        count (int): Exact number of events to send.
+        max_in_flight (int): Upper bound on concurrent outstanding requests.
+        payloads_file (str): JSON-lines file of recorded payloads; synthetic payloads are used otherwise.
+        shapes (str or list): Synthetic payload shapes to cycle through.
+        doctype (str): DocType referenced by synthetic payloads.
+        docnames (str or list): Documents referenced by synthetic payloads; defaults to the latest records.
+        timeout (float): Per-request timeout in seconds.
+        drain_timeout (float): Seconds to wait for queued events to be applied (webhook_queue.py).
+        output (str): Optional path for the JSON report.
+    """
+    rate = float(rate)
+    total = int(count) if count else int(rate * float(duration))
+    url = f"{(site_url or frappe.utils.get_url()).rstrip('/')}/api/method/{WEBHOOK_METHOD}"
+
+    if payloads_file:
+        payloads = load_recorded_payloads(payloads_file)
+    else:
+        shapes = [s.strip() for s in shapes.split(",")] if isinstance(shapes, str) else list(shapes or SHAPES)
+        if isinstance(docnames, str):
+            docnames = [d.strip() for d in docnames.split(",") if d.strip()]
+        docnames = docnames or frappe.get_all(doctype, pluck="name", order_by="creation desc", limit=50)
+        if not docnames:
+            frappe.throw(f"No {doctype} records found. Pass docnames or create some first.")
+        payloads = synthetic_payloads(doctype, docnames, shapes)
+
+    events = list(itertools.islice(itertools.cycle(payloads), total))
+    db_before = _db_counters()
+    error_logs_before = frappe.db.count("Error Log")
+
+    result = _replay(url, events, rate, int(max_in_flight), float(timeout))
+    # Queued events are applied by the workers; count their writes too
+    drain_seconds = _wait_for_webhook_queue(float(drain_timeout))
+
+    frappe.db.commit()
+    db_after = _db_counters()
+    error_logs_after = frappe.db.count("Error Log")
+    writes = {k: db_after.get(k, 0) - db_before.get(k, 0) for k in DB_WRITE_COUNTERS}
+
+    report = {
+        "environment": environment_info(),
+        "config": {
+            "url": url,
+            "target_rate": rate,
+            "events": total,
+            "max_in_flight": int(max_in_flight),
+            "source": payloads_file or "synthetic",
+        },
+        "ack": result["summary"],
+        "achieved_rate_per_sec": result["achieved_rate"],
+        "max_schedule_lag_ms": result["max_lag_ms"],
+        # Seconds after the last ack until the workers had applied every queued event
+        # (0 with queued processing off, None if not done within drain_timeout)
+        "queue_drain_seconds": drain_seconds,
+        "status_codes": result["status_codes"],
+        "db_writes": {
+            "total": writes,
+            "per_event": {k: round(v / total, 2) if total else 0 for k, v in writes.items()},
+            "error_log_rows_per_event": round((error_logs_after - error_logs_before) / total, 2) if total else 0,
+        },
+        "sample_errors": result["sample_errors"],
+    }
+
+    print(write_report(report, output))
+    return report
+
+
+def _wait_for_webhook_queue(timeout):
+    from docusign_integration.docusign_integration.webhook_queue import (
+        QUEUE_KEY,
+        get_webhook_queue_config,
+        webhook_queue_enabled,
+    )
+
+    if not webhook_queue_enabled():
+        return 0.0
+
+    partitions = int(get_webhook_queue_config()["partitions"])
+    start = time.perf_counter()
+    while any(frappe.cache().llen(QUEUE_KEY.format(p)) for p in range(partitions)):
+        if time.perf_counter() - start > timeout:
+            return None
+        time.sleep(0.1)
+    return round(time.perf_counter() - start, 3)
+
+
+def synthetic_payloads(doctype, docnames, shapes=SHAPES):
+    """
+    Builds one envelope per document and walks it through STATUS_SEQUENCE,
+    rotating through the requested payload shapes.
+
+    Returns:
+        list of (content_type, body) tuples in replay order.
+    """
+    unknown = set(shapes) - set(SHAPES)
+    if unknown:
+        frappe.throw(f"Unknown payload shapes: {', '.join(sorted(unknown))}")
+
+    shape_cycle = itertools.cycle(shapes)
+    envelopes = [(docname, str(uuid.uuid4())) for docname in docnames]
+    payloads = []
+    for status in STATUS_SEQUENCE:
+        for docname, envelope_id in envelopes:
+            payloads.append(_build_payload(next(shape_cycle), doctype, docname, envelope_id, status))
+    return payloads
+
+
+def load_recorded_payloads(path):
+    """
+    Reads recorded Connect messages from a JSON-lines file.
+    """
+    payloads = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            message = json.loads(line)
+            if isinstance(message, dict) and "content_type" in message and "body" in message:
+                body = message["body"]
+                payloads.append((message["content_type"], body if isinstance(body, str) else json.dumps(body)))
+            else:
+                payloads.append(("application/json", json.dumps(message)))
+    if not payloads:
+        frappe.throw(f"No payloads found in {path}")
+    return payloads
+
+
+def _build_payload(shape, doctype, docname, envelope_id, status):
+    custom_fields = {
+        "textCustomFields": [
+            {"name": "frappe_doctype", "value": doctype, "show": "false", "required": "false"},
+            {"name": "frappe_docname", "value": docname, "show": "false", "required": "false"},
+        ]
+    }
+    generated = time.strftime("%Y-%m-%dT%H:%M:%S.0000000Z", time.gmtime())
+
+    if shape == "form":
+        return (
+            "application/x-www-form-urlencoded",
+            urlencode({
+                "envelopeId": envelope_id,
+                "status": status,
+                "frappe_doctype": doctype,
+                "frappe_docname": docname,
+            }),
+        )
+
+    if shape == "top_level":
+        body = {"envelopeId": envelope_id, "status": status, "customFields": custom_fields}
+    elif shape == "data_custom_fields":
+        body = {
+            "event": f"envelope-{status}",
+            "generatedDateTime": generated,
+            "data": {
+                "envelopeId": envelope_id,
+                "customFields": custom_fields,
+                "envelopeSummary": {"status": status, "envelopeId": envelope_id},
+            },
+        }
+    else:
+        body = {
+            "event": f"envelope-{status}",
+            "apiVersion": "v2.1",
+            "uri": f"/restapi/v2.1/accounts/bench/envelopes/{envelope_id}",
+            "generatedDateTime": generated,
+            "data": {
+                "accountId": "bench",
+                "envelopeId": envelope_id,
+                "envelopeSummary": {
+                    "status": status,
+                    "envelopeId": envelope_id,
+                    "statusChangedDateTime": generated,
+                    "customFields": custom_fields,
+                },
+            },
+        }
+    return "application/json", json.dumps(body)
+
+
+def _replay(url, events, rate, max_in_flight, timeout):
+    """
+    Open-loop replay: event i is released at start + i / rate regardless of how
+    fast earlier events were acknowledged, bounded by `max_in_flight`.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    latencies = []
+    errors = []
+    status_codes = {}
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(max_in_flight)
+    max_lag = [0.0]
+
+    def send(content_type, body):
+        start = time.perf_counter()
+        try:
+            resp = session.post(url, data=body.encode(), headers={"Content-Type": content_type}, timeout=timeout)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                status_codes[str(resp.status_code)] = status_codes.get(str(resp.status_code), 0) + 1
+                if resp.ok:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(f"HTTP {resp.status_code}: {resp.text[:200]}")
+        except requests.exceptions.RequestException as e:
+            with lock:
+                status_codes["exception"] = status_codes.get("exception", 0) + 1
+                errors.append(repr(e)[:200])
+        finally:
+            slots.release()
+
+    interval = 1.0 / rate if rate > 0 else 0
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for i, (content_type, body) in enumerate(events):
+            due = wall_start + i * interval
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            slots.acquire()
+            max_lag[0] = max(max_lag[0], (time.perf_counter() - due) * 1000)
+            executor.submit(send, content_type, body)
+    wall = time.perf_counter() - wall_start
+
+    return {
+        "summary": summarize(latencies, len(errors), wall),
+        "achieved_rate": round(len(events) / wall, 2) if wall else 0.0,
+        "max_lag_ms": round(max_lag[0], 2),
+        "status_codes": status_codes,
+        "sample_errors": sorted(set(errors))[:5],
+    }
+
+
+def _db_counters():
+    """
+    Server-wide write statement counters; run against a site with no other traffic.
+    """
+    rows = frappe.db.sql(
+        "SHOW GLOBAL STATUS WHERE Variable_name IN %(names)s",
+        {"names": DB_WRITE_COUNTERS},
+    )
+    return {name: int(value) for name, value in rows}
@@ -0,0 +1,53 @@
+import json
+
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("estimate-tariff-costs")
+@click.option("--tariff", "tariffs", multiple=True, required=True, help="Tariff to price; repeat to compare")
+@click.option("--sessions", "sessions_file", help="CSV with kwh, connector_id and duration_minutes columns")
+@click.option("--synthetic", type=int, help="Price this many generated sessions instead of a CSV")
+@click.option("--tax-rate", "tax_rates", multiple=True, help="Override a tax rate, e.g. tax-gst-18=18")
+@click.option("--top-connectors", type=int, default=10, show_default=True)
+@pass_context
+def estimate_tariff_costs(context, tariffs, sessions_file=None, synthetic=None, tax_rates=(), top_connectors=10):
+	"""Preview what tariffs would charge for historical or generated charging sessions."""
+	from docusign_integration.tariff.cost_estimator import (
+		estimate_costs,
+		load_sessions_csv,
+		synthetic_sessions,
+	)
+
+	if not sessions_file and not synthetic:
+		raise click.UsageError("Pass --sessions or --synthetic")
+
+	overrides = {}
+	for item in tax_rates:
+		identifier, _, rate = item.partition("=")
+		overrides[identifier] = float(rate)
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		if sessions_file:
+			kwh, connector_ids, durations = load_sessions_csv(sessions_file)
+		else:
+			kwh, connector_ids, durations = synthetic_sessions(synthetic)
+
+		result = estimate_costs(
+			list(tariffs),
+			kwh,
+			connector_ids=connector_ids,
+			duration_minutes=durations,
+			tax_rates=overrides,
+			top_connectors=top_connectors,
+		)
+		click.echo(json.dumps(result, indent=2, default=str))
+	finally:
+		frappe.destroy()
+
+
+commands = [estimate_tariff_costs]
@@ -0,0 +1,260 @@
+"""
+Pool of DocuSign accounts / integration keys.
+
+DocuSign Settings holds the "default" account and Additional Accounts adds more,
+each with its own credentials, cached access token and API quota bucket
+(utils/rate_limiter.py). Sends are spread over the enabled accounts by the
+Account Routing setting:
+
+    Round Robin   next account in turn, shared by all workers through Redis
+    Least Used    the account with the largest share of its hourly quota left
+    Per DocType   the account whose Route DocTypes lists the document's DocType;
+                  Round Robin for DocTypes no account is routed for
+
+The account that sent an envelope is recorded on the document (`docusign_account`,
+when its DocType has that field), in the envelope's custom fields (so webhooks carry
+it) and in the envelope registry (envelope_registry.py) used by downloads. Envelopes
+missing from the registry are searched for in each account.
+"""
+
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import frappe
+
+from docusign_integration.docusign_integration.envelope_registry import get_envelope, record_envelope
+from docusign_integration.utils.circuit_breaker import get_session
+from docusign_integration.utils.rate_limiter import RateLimiter, rate_account
+
+DEFAULT_ACCOUNT = "default"
+# Demo environment defaults, overridable from DocuSign Settings
+DEFAULT_AUTH_URL = "https://account-d.docusign.com"
+DEFAULT_BASE_PATH = "https://demo.docusign.net/restapi"
+
+TOKEN_KEY = "docusign_integration:access_token:{}"
+USER_INFO_KEY = "docusign_integration:user_info:{}"
+ROUND_ROBIN_KEY = "docusign_integration:account_round_robin"
+# Tokens are renewed this many seconds before DocuSign expires them
+TOKEN_EXPIRY_MARGIN = 300
+# userinfo (account ID and base URI) hardly ever changes
+USER_INFO_TTL = 24 * 60 * 60
+
+
+def get_accounts(enabled_only=True):
+    """
+    The default account followed by the additional accounts, as frappe._dicts.
+    """
+    settings = frappe.get_cached_doc("DocuSign Settings", "DocuSign Settings")
+    accounts = [_as_account(settings, settings, DEFAULT_ACCOUNT)]
+    for row in settings.get("docusign_accounts") or []:
+        if row.enabled or not enabled_only:
+            accounts.append(_as_account(settings, row, row.account_name))
+    return accounts
+
+
+def _as_account(settings, source, name):
+    return frappe._dict(
+        name=name,
+        client_id=source.client_id,
+        impersonated_user_guid=source.impersonated_user_guid,
+        private_key=source.private_key,
+        template_id=source.get("docusign_template_id") or settings.docusign_template_id,
+        auth_url=(source.get("docusign_auth_url") or settings.get("docusign_auth_url") or DEFAULT_AUTH_URL).rstrip("/"),
+        base_path=(source.get("docusign_base_path") or settings.get("docusign_base_path") or DEFAULT_BASE_PATH).rstrip("/"),
+        hourly_quota=source.get("hourly_quota") or None,
+        route_doctypes=[d.strip() for d in (source.get("route_doctypes") or "").splitlines() if d.strip()],
+    )
+
+
+def get_account(name=None):
+    """
+    Account `name`, or the default account. Disabled accounts are returned too, so
+    envelopes they already sent can still be downloaded.
+    """
+    name = name or DEFAULT_ACCOUNT
+    for account in get_accounts(enabled_only=False):
+        if account.name == name:
+            return account
+    frappe.throw(f"DocuSign account {name!r} is not configured in DocuSign Settings", frappe.DoesNotExistError)
+
+
+def pick_account(doctype=None):
+    """
+    Account to send the next envelope for a document of `doctype` through.
+    """
+    accounts = get_accounts()
+    if len(accounts) == 1:
+        return accounts[0]
+
+    routing = frappe.get_cached_doc("DocuSign Settings", "DocuSign Settings").get("account_routing") or "Round Robin"
+    if routing == "Per DocType" and doctype:
+        for account in accounts:
+            if doctype in account.route_doctypes:
+                return account
+    elif routing == "Least Used":
+        return max(accounts, key=_budget_left)
+
+    turn = frappe.cache().incr(_redis_key(ROUND_ROBIN_KEY))
+    return accounts[(turn - 1) % len(accounts)]
+
+
+def _budget_left(account):
+    limiter = RateLimiter(account.name, hourly_quota=account.hourly_quota)
+    return limiter.remaining()["tokens"] / limiter.capacity
+
+
+def _redis_key(key):
+    key = frappe.cache().make_key(key)
+    return key.decode() if isinstance(key, bytes) else key
+
+
+@contextmanager
+def use_account(account):
+    """
+    Charges the block's DocuSign calls to `account`'s quota.
+    """
+    with rate_account(account.name, account.hourly_quota):
+        yield account
+
+
+def get_access_token(account):
+    """
+    Access token of `account` from its JWT grant, cached until shortly before it expires.
+    """
+    cache = frappe.cache()
+    key = TOKEN_KEY.format(account.name)
+    token = cache.get_value(key)
+    if token:
+        return token
+
+    # PyJWT (and its crypto backend) is only needed when a token has to be minted
+    from jwt import encode
+
+    now = int(time.time())
+    payload = {
+        "iss": account.client_id,
+        "sub": account.impersonated_user_guid,
+        "aud": urlparse(account.auth_url).netloc,
+        "iat": now,
+        "exp": now + 3600,
+        "scope": "signature impersonation",
+    }
+    body = {
+        "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer",
+        "assertion": encode(payload, account.private_key, algorithm="RS256"),
+    }
+    with use_account(account):
+        response = get_session("docusign").post(
+            f"{account.auth_url}/oauth/token",
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            data=body,
+        )
+    response.raise_for_status()
+    data = response.json()
+
+    token = data.get("access_token")
+    if token:
+        expires_in = int(data.get("expires_in") or 3600)
+        cache.set_value(key, token, expires_in_sec=max(60, expires_in - TOKEN_EXPIRY_MARGIN))
+    return token
+
+
+def get_account_user_info(account, access_token=None):
+    """
+    userinfo of `account`'s impersonated user (DocuSign account IDs and base URIs).
+    """
+    cache = frappe.cache()
+    key = USER_INFO_KEY.format(account.name)
+    user_info = cache.get_value(key)
+    if user_info:
+        return user_info
+
+    access_token = access_token or get_access_token(account)
+    with use_account(account):
+        response = get_session("docusign").get(
+            f"{account.auth_url}/oauth/userinfo",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+    response.raise_for_status()
+    user_info = response.json()
+    cache.set_value(key, user_info, expires_in_sec=USER_INFO_TTL)
+    return user_info
+
+
+def clear_account_cache():
+    """
+    Drops cached tokens and userinfo, e.g. after credentials changed.
+    """
+    cache = frappe.cache()
+    cache.delete_keys(TOKEN_KEY.format(""))
+    cache.delete_keys(USER_INFO_KEY.format(""))
+
+
+def record_envelope_account(doc, envelope_id, account_name, **registry_values):
+    """
+    Remembers that `envelope_id` belongs to `account_name`, in the envelope registry
+    and on `doc` when it has a docusign_account field.
+
+    Args:
+        registry_values: status, source, event or send_key for record_envelope.
+    """
+    record_envelope(
+        envelope_id,
+        reference_doctype=doc.doctype if doc is not None else None,
+        reference_name=doc.name if doc is not None else None,
+        account=account_name,
+        **registry_values,
+    )
+    if doc is not None and account_name and doc.meta.has_field("docusign_account"):
+        doc.docusign_account = account_name
+
+
+def get_envelope_account(envelope_id):
+    """
+    Account that sent `envelope_id`.
+    """
+    envelope = get_envelope(envelope_id)
+    name = envelope.docusign_account if envelope else None
+    accounts = get_accounts(enabled_only=False)
+    for account in accounts:
+        if account.name == name:
+            return account
+
+    # Sent before the pool existed, or not registered: ask each account
+    if len(accounts) == 1:
+        return accounts[0]
+    for account in accounts:
+        if _has_envelope(account, envelope_id):
+            record_envelope_account(None, envelope_id, account.name)
+            return account
+    frappe.throw(f"Envelope {envelope_id} was not found in any DocuSign account", frappe.DoesNotExistError)
+
+
+def _has_envelope(account, envelope_id):
+    try:
+        access_token = get_access_token(account)
+        user_account = get_account_user_info(account, access_token)["accounts"][0]
+        with use_account(account):
+            response = get_session("docusign").get(
+                f"{user_account.get('base_uri') or account.base_path.removesuffix('/restapi')}/restapi"
+                f"/v2.1/accounts/{user_account['account_id']}/envelopes/{envelope_id}",
+                headers={"Authorization": f"Bearer {access_token}"},
+            )
+    except Exception:
+        frappe.log_error(title=f"DocuSign account {account.name} lookup failed", message=frappe.get_traceback())
+        return False
+    return response.status_code == 200
+
+
+@frappe.whitelist()
+def get_account_status():
+    """
+    Remaining API budget per enabled account, for monitoring the pool.
+    """
+    frappe.only_for("System Manager")
+    status = {}
+    for account in get_accounts():
+        limiter = RateLimiter(account.name, hourly_quota=account.hourly_quota)
+        status[account.name] = limiter.remaining()
+    return status
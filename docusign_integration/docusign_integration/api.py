@@ -1,38 +1,64 @@
 # Standard Python imports
 import base64
 import json
-import time
 import requests
 from datetime import datetime, timedelta
-from jwt import encode, decode
-from PyPDF2 import PdfReader, PdfWriter
 from io import BytesIO
 
 # Frappe framework imports
 import frappe
-from docusign_esign import ApiClient, EnvelopesApi, EnvelopeDefinition, TemplatesApi
-from docusign_esign.client.api_exception import ApiException
-from docusign_esign.models import (
-    Document,
-    Signer,
-    Recipients,
-    Tabs,
-    SignHere,
-    DateSigned,
-    Text,
-    CustomFields,
-    TextCustomField,
-    CompositeTemplate,
-    ServerTemplate,
-    InlineTemplate,
-    TemplateRole
+
+# The docusign_esign SDK (and its ~1000 model modules) is imported inside the functions
+# that call DocuSign, so fetch_groups, webhooks and workers importing this module don't
+# pay for it. benchmarks/import_time.py keeps it that way.
+
+from docusign_integration.docusign_integration.accounts import (
+    get_access_token,
+    get_account,
+    get_account_user_info,
+    get_envelope_account,
+    pick_account,
+    record_envelope_account,
+    use_account,
+)
+from docusign_integration.docusign_integration.chunked_upload import (
+    clear_upload_state,
+    needs_chunked_upload,
+    upload_document,
+)
+from docusign_integration.docusign_integration.envelope_builder import (
+    build_envelope_body,
+    create_envelope,
+    use_lean_envelopes,
+)
+from docusign_integration.docusign_integration.envelope_registry import (
+    get_envelope,
+    record_envelope,
+    status_advances,
+)
+from docusign_integration.docusign_integration.send_guard import (
+    get_idempotency_key,
+    get_sent_envelope,
+    remember_envelope,
+    send_lock,
 )
+from docusign_integration.docusign_integration.webhook_queue import (
+    enqueue_webhook_event,
+    webhook_queue_enabled,
+)
+from docusign_integration.tariff.tariff_rules import upsert_tariff_rule
+from docusign_integration.utils.cache import get_reference_list
+from docusign_integration.utils.circuit_breaker import get_session, upstream_call
+from docusign_integration.utils.pdf_backend import get_pdf_backend
 
 # Replace with your app's name
 APP_NAME = "docusign_integration"
 
+# (connect, read) seconds for docusign_esign SDK calls
+SDK_TIMEOUT = (5, 60)
+
 @frappe.whitelist()
-def send_document_for_signature(doc=None, doctype=None, docname=None, template_id=None):
+def send_document_for_signature(doc=None, doctype=None, docname=None, template_id=None, idempotency_key=None, force=False):
     """
     Sends a document from Frappe to DocuSign for signature using a template.
     This function handles calls from both the client-side
@@ -43,6 +69,8 @@ def send_document_for_signature(doc=None, doctype=None, docname=None, template_i
         doctype (str, optional): The DocType name. Used if 'doc' is not provided.
         docname (str, optional): The document name. Used if 'doc' is not provided.
         template_id (str, optional): The DocuSign template ID to be used.
+        idempotency_key (str, optional): Identifies this send across client retries; see send_guard.py.
+        force (bool, optional): Send again even if the document already has a live envelope.
     """
     # Log the start of the function and the received arguments
     frappe.log_error(f"Starting send_document_for_signature for {doctype} {docname} with template_id {template_id}", "DocuSign Debug")
@@ -62,185 +90,259 @@ def send_document_for_signature(doc=None, doctype=None, docname=None, template_i
     if not doc.customer_email:
         frappe.throw("Recipient Email is required.")
 
-    try:
-        # 1. Get the JWT access token and API base path
-        access_token, api_client_base_path, template_id = get_jwt_access_token()
-        frappe.log_error("Successfully retrieved JWT access token.", "DocuSign Debug")
-        if not template_id:
-            frappe.throw("DocuSign Template ID is not set in DocuSign Settings.")
-        # 2. Get user info and account ID
-        user_info = get_user_info(access_token)
-        account_id = user_info['accounts'][0]['account_id']
-
-
-        api_client = ApiClient(api_client_base_path)
-        api_client.set_default_header("Authorization", "Bearer " + access_token)
-        templates_api = TemplatesApi(api_client)
-
-        envelopes_api = EnvelopesApi(api_client)
-        # 3. Create the envelope definition
-        envelope_definition = get_merged_contract_for_signature(doc, template_id, account_id, templates_api, access_token, api_client_base_path)
-
-        # 4. Add custom fields to identify the Frappe document in webhooks
-        # The webhook events will be configured directly in DocuSign Connect
-        
-        # Create custom fields using the proper DocuSign SDK classes
-        text_custom_fields = [
-            TextCustomField(
-                name="frappe_doctype",
-                value=doc.doctype,
-                required="false",
-                show="false"
-            ),
-            TextCustomField(
-                name="frappe_docname", 
-                value=doc.name,
-                required="false",
-                show="false"
-            )
-        ]
-        
-        custom_fields = CustomFields(text_custom_fields=text_custom_fields)
-        envelope_definition.custom_fields = custom_fields
-        
-        frappe.log_error("Successfully added custom fields to envelope definition.", "DocuSign Debug")
+    # One send per document at a time; repeats return the envelope already created
+    idempotency_key = get_idempotency_key(doc, idempotency_key)
+    with send_lock(doc):
+        # Another call may have sent the document while this one waited for the lock
+        doc.reload()
+        sent = get_sent_envelope(doc, idempotency_key, force=frappe.utils.cint(force))
+        if sent:
+            if doc.docusign_envelope_id != sent["envelope_id"]:
+                # DocuSign created the envelope but the document was never updated
+                mark_document_sent(doc, sent["envelope_id"], sent["account"], idempotency_key)
+            frappe.msgprint("Document was already sent to DocuSign.")
+            return sent["envelope_id"]
 
-        # 5. Send the envelope
-      
+        return send_envelope(doc, idempotency_key)
 
-        frappe.log_error("Attempting to create and send the envelope.", "DocuSign Debug")
-        results = envelopes_api.create_envelope(account_id, envelope_definition=envelope_definition)
-        envelope_id = results.envelope_id
 
-        # 6. Update the Frappe DocType
-        doc.docusign_envelope_id = envelope_id
-        doc.docusign_status = "Sent"
-        doc.save()
-        frappe.db.commit()
+def send_envelope(doc, idempotency_key):
+    """
+    Merges, uploads and sends `doc` as a new envelope; called under the document's send lock.
+    """
+    from docusign_esign import ApiClient, EnvelopesApi, TemplatesApi
+    from docusign_esign.client.api_exception import ApiException
+    from docusign_esign.models import CustomFields, TextCustomField
 
-        frappe.msgprint("Document sent to DocuSign successfully!")
-        frappe.log_error(f"Document sent successfully with Envelope ID: {envelope_id}. DocType updated.", "DocuSign Debug")
-        return envelope_id
+    # Spread sends over the DocuSign account pool; every call below is charged to this account
+    account = pick_account(doc.doctype)
+    with use_account(account):
+        try:
+            # 1. Get the JWT access token and API base path
+            access_token, api_client_base_path, template_id = get_jwt_access_token(account)
+            frappe.log_error("Successfully retrieved JWT access token.", "DocuSign Debug")
+            if not template_id:
+                frappe.throw("DocuSign Template ID is not set in DocuSign Settings.")
+            # 2. Get user info and account ID
+            user_info = get_user_info(access_token, account)
+            account_id = user_info['accounts'][0]['account_id']
+
+
+            api_client = ApiClient(api_client_base_path)
+            api_client.set_default_header("Authorization", "Bearer " + access_token)
+            templates_api = TemplatesApi(api_client)
+
+            if use_lean_envelopes():
+                # 3-5. Build the REST body from the precompiled skeleton and post it over the pooled session
+                body = get_lean_envelope_for_signature(doc, template_id, account_id, templates_api, access_token, api_client_base_path, account.name, idempotency_key)
+                frappe.log_error("Attempting to create and send the envelope.", "DocuSign Debug")
+                envelope_id = create_envelope(f"{api_client_base_path}/v2.1/accounts/{account_id}", access_token, body)
+            else:
+                envelopes_api = EnvelopesApi(api_client)
+                # 3. Create the envelope definition
+                envelope_definition = get_merged_contract_for_signature(doc, template_id, account_id, templates_api, access_token, api_client_base_path)
+
+                # 4. Add custom fields to identify the Frappe document in webhooks
+                # The webhook events will be configured directly in DocuSign Connect
+        
+                # Create custom fields using the proper DocuSign SDK classes
+                text_custom_fields = [
+                    TextCustomField(
+                        name="frappe_doctype",
+                        value=doc.doctype,
+                        required="false",
+                        show="false"
+                    ),
+                    TextCustomField(
+                        name="frappe_docname", 
+                        value=doc.name,
+                        required="false",
+                        show="false"
+                    ),
+                    TextCustomField(
+                        name="frappe_docusign_account",
+                        value=account.name,
+                        required="false",
+                        show="false"
+                    ),
+                    TextCustomField(
+                        name="frappe_send_key",
+                        value=idempotency_key,
+                        required="false",
+                        show="false"
+                    )
+                ]
+        
+                custom_fields = CustomFields(text_custom_fields=text_custom_fields)
+                envelope_definition.custom_fields = custom_fields
+        
+                frappe.log_error("Successfully added custom fields to envelope definition.", "DocuSign Debug")
 
-    except ApiException as ex:
-        frappe.log_error(f"DocuSign API Error: {ex}", "DocuSign Integration")
-        frappe.throw(f"DocuSign API Error: {ex.body}")
-    except Exception as ex:
-        frappe.log_error(f"General Error: {ex}", "DocuSign Integration")
-        frappe.throw(f"An error occurred: {ex}")
+                # 5. Send the envelope
+      
 
+                frappe.log_error("Attempting to create and send the envelope.", "DocuSign Debug")
+                with upstream_call("docusign"):
+                    results = envelopes_api.create_envelope(
+                        account_id, envelope_definition=envelope_definition, _request_timeout=SDK_TIMEOUT
+                    )
+                envelope_id = results.envelope_id
+            # Retries of this send now return the envelope, even if saving the document fails
+            remember_envelope(idempotency_key, envelope_id, account.name)
+            # A chunked upload is used up by the envelope; a later send starts a new one
+            clear_upload_state(f"{doc.doctype}:{doc.name}")
+
+            # 6. Update the Frappe DocType
+            mark_document_sent(doc, envelope_id, account.name, idempotency_key)
+
+            frappe.msgprint("Document sent to DocuSign successfully!")
+            frappe.log_error(f"Document sent successfully with Envelope ID: {envelope_id}. DocType updated.", "DocuSign Debug")
+            return envelope_id
+
+        except ApiException as ex:
+            frappe.log_error(f"DocuSign API Error: {ex}", "DocuSign Integration")
+            frappe.throw(f"DocuSign API Error: {ex.body}")
+        except requests.exceptions.HTTPError as ex:
+            frappe.log_error(f"DocuSign API Error: {ex}", "DocuSign Integration")
+            frappe.throw(f"DocuSign API Error: {ex.response.text}")
+        except Exception as ex:
+            frappe.log_error(f"General Error: {ex}", "DocuSign Integration")
+            frappe.throw(f"An error occurred: {ex}")
+
+
+
+def mark_document_sent(doc, envelope_id, account_name, idempotency_key=None):
+    """
+    Stores the envelope sent for `doc` on the document and in the envelope registry.
+    """
+    doc.docusign_envelope_id = envelope_id
+    doc.docusign_status = "Sent"
+    record_envelope_account(doc, envelope_id, account_name, status="sent", source="Send", send_key=idempotency_key)
+    doc.save()
+    frappe.db.commit()
 
 
 @frappe.whitelist(allow_guest=True)
-def download_docusign_document(envelope_id):
+def download_docusign_document(envelope_id, account=None):
     """
     Downloads a DocuSign document by its envelope ID and saves it to Frappe File doctype.
     
     Args:
         envelope_id (str): The DocuSign envelope ID.
+        account (str, optional): Pool account that sent the envelope; looked up when not given.
         
     Returns:
         Returns file_url in frappe.response['message'] for client-side download.
     """
+    from docusign_esign import ApiClient, EnvelopesApi
+
     try:
         # Validate envelope_id
         if not envelope_id:
             raise ValueError("Envelope ID is required")
 
-        # Get access token, API base path, and template ID
-        jwt_response = get_jwt_access_token()
-
-        # Unpack the three values
-        if isinstance(jwt_response, tuple) and len(jwt_response) == 3:
-            access_token, api_client_base_path, template_id = jwt_response
-        else:
-            raise ValueError(f"Expected 3 values from get_jwt_access_token, got {len(jwt_response) if isinstance(jwt_response, tuple) else 'non-tuple response'}")
-
-        if not access_token:
-            raise ValueError("Access token is empty or invalid")
-
-        # Get user info
-        user_info = get_user_info(access_token)
-        if not user_info.get('accounts'):
-            raise ValueError("No accounts found in user_info response")
-        account_id = user_info['accounts'][0]['account_id']
-        base_uri = user_info['accounts'][0].get('base_uri', api_client_base_path)
-
-        # Initialize DocuSign API client
-        api_client = ApiClient(base_uri + "/restapi")
-        api_client.set_default_header("Authorization", f"Bearer {access_token}")
-        envelopes_api = EnvelopesApi(api_client)
-
-        # Get list of documents in the envelope
-        document_list = envelopes_api.list_documents(account_id, envelope_id)
+        # The envelope lives in the account that sent it
+        account = get_account(account) if account else get_envelope_account(envelope_id)
+        with use_account(account):
+            # Get access token, API base path, and template ID
+            jwt_response = get_jwt_access_token(account)
+
+            # Unpack the three values
+            if isinstance(jwt_response, tuple) and len(jwt_response) == 3:
+                access_token, api_client_base_path, template_id = jwt_response
+            else:
+                raise ValueError(f"Expected 3 values from get_jwt_access_token, got {len(jwt_response) if isinstance(jwt_response, tuple) else 'non-tuple response'}")
+
+            if not access_token:
+                raise ValueError("Access token is empty or invalid")
+
+            # Get user info
+            user_info = get_user_info(access_token, account)
+            if not user_info.get('accounts'):
+                raise ValueError("No accounts found in user_info response")
+            account_id = user_info['accounts'][0]['account_id']
+            base_uri = user_info['accounts'][0].get('base_uri', api_client_base_path)
+
+            # Initialize DocuSign API client
+            api_client = ApiClient(base_uri + "/restapi")
+            api_client.set_default_header("Authorization", f"Bearer {access_token}")
+            envelopes_api = EnvelopesApi(api_client)
+
+            # Get list of documents in the envelope
+            with upstream_call("docusign"):
+                document_list = envelopes_api.list_documents(account_id, envelope_id, _request_timeout=SDK_TIMEOUT)
         
-        # Check for envelope_documents
-        if not hasattr(document_list, 'envelope_documents') or not document_list.envelope_documents:
-            frappe.throw("No documents found in the envelope.", frappe.DoesNotExistError)
-
-        # Try downloading the combined document
-        document_id = 'combined'
-        pdf_data = None
-        try:
-            pdf_data = envelopes_api.get_document(
-                account_id=account_id,
-                envelope_id=envelope_id,
-                document_id=document_id,
-                certificate=False
-            )
-        except Exception as e:
-            frappe.log_error(f"Combined document failed: {str(e)}", "DocuSign Debug")
-            # Fallback to first document
-            document_id = document_list.envelope_documents[0].document_id
-            frappe.log_error(f"Falling back to document ID: {document_id}", "DocuSign Debug")
-            pdf_data = envelopes_api.get_document(
-                account_id=account_id,
-                envelope_id=envelope_id,
-                document_id=document_id,
-                certificate=False
-            )
+            # Check for envelope_documents
+            if not hasattr(document_list, 'envelope_documents') or not document_list.envelope_documents:
+                frappe.throw("No documents found in the envelope.", frappe.DoesNotExistError)
 
-        # Log PDF data details
-        if pdf_data is None:
-            frappe.log_error("No PDF data retrieved", "DocuSign Error")
-            frappe.throw("Failed to retrieve document data", frappe.DataError)
+            # Try downloading the combined document
+            document_id = 'combined'
+            pdf_data = None
+            try:
+                with upstream_call("docusign"):
+                    pdf_data = envelopes_api.get_document(
+                        account_id=account_id,
+                        envelope_id=envelope_id,
+                        document_id=document_id,
+                        certificate=False,
+                        _request_timeout=SDK_TIMEOUT
+                    )
+            except Exception as e:
+                frappe.log_error(f"Combined document failed: {str(e)}", "DocuSign Debug")
+                # Fallback to first document
+                document_id = document_list.envelope_documents[0].document_id
+                frappe.log_error(f"Falling back to document ID: {document_id}", "DocuSign Debug")
+                with upstream_call("docusign"):
+                    pdf_data = envelopes_api.get_document(
+                        account_id=account_id,
+                        envelope_id=envelope_id,
+                        document_id=document_id,
+                        certificate=False,
+                        _request_timeout=SDK_TIMEOUT
+                    )
+
+            # Log PDF data details
+            if pdf_data is None:
+                frappe.log_error("No PDF data retrieved", "DocuSign Error")
+                frappe.throw("Failed to retrieve document data", frappe.DataError)
         
-        # Ensure pdf_data is a byte stream
-        if isinstance(pdf_data, BytesIO):
-            pdf_data.seek(0)
-            pdf_content = pdf_data.read()
-        else:
-            pdf_content = pdf_data
-
-        # Verify pdf_content is not empty
-        if not pdf_content or len(pdf_content) == 0:
-            frappe.log_error("PDF content is empty", "DocuSign Error")
-            frappe.throw("Failed to download document: Empty content received", frappe.DataError)
-
-        # Save file to Frappe File doctype
-        filename = f"docusign_signed_{envelope_id}_{document_id}.pdf"
-        file_doc = None
-        try:
-            file_doc = frappe.get_doc({
-                "doctype": "File",
-                "file_name": filename,
-                "content": pdf_content,
-                "is_private": 1,
-                "attached_to_doctype": "Contract",
-                "attached_to_name": frappe.form_dict.get('name') or "CON-00001"
-            })
-            file_doc.save()
-            frappe.log_error(f"File saved: {file_doc.file_url}", "DocuSign Debug")
-        except Exception as e:
-            frappe.log_error(f"Failed to save file: {str(e)}", "DocuSign Error")
-            frappe.throw(f"Failed to save file: {str(e)}", frappe.DataError)
-
-        # Set Frappe response
-        frappe.log_error(f"Returning file URL: {file_doc.file_url}", "DocuSign Debug")
-        frappe.response['message'] = {
-            "filename": filename,
-            "file_url": file_doc.file_url
-        }
+            # Ensure pdf_data is a byte stream
+            if isinstance(pdf_data, BytesIO):
+                pdf_data.seek(0)
+                pdf_content = pdf_data.read()
+            else:
+                pdf_content = pdf_data
+
+            # Verify pdf_content is not empty
+            if not pdf_content or len(pdf_content) == 0:
+                frappe.log_error("PDF content is empty", "DocuSign Error")
+                frappe.throw("Failed to download document: Empty content received", frappe.DataError)
+
+            # Save file to Frappe File doctype
+            filename = f"docusign_signed_{envelope_id}_{document_id}.pdf"
+            file_doc = None
+            try:
+                file_doc = frappe.get_doc({
+                    "doctype": "File",
+                    "file_name": filename,
+                    "content": pdf_content,
+                    "is_private": 1,
+                    "attached_to_doctype": "Contract",
+                    "attached_to_name": frappe.form_dict.get('name') or "CON-00001"
+                })
+                file_doc.save()
+                frappe.log_error(f"File saved: {file_doc.file_url}", "DocuSign Debug")
+            except Exception as e:
+                frappe.log_error(f"Failed to save file: {str(e)}", "DocuSign Error")
+                frappe.throw(f"Failed to save file: {str(e)}", frappe.DataError)
+
+            # Set Frappe response
+            frappe.log_error(f"Returning file URL: {file_doc.file_url}", "DocuSign Debug")
+            frappe.response['message'] = {
+                "filename": filename,
+                "file_url": file_doc.file_url
+            }
 
     except requests.exceptions.HTTPError as err:
         error_msg = f"DocuSign API Error: {str(err)}"
@@ -313,6 +415,9 @@ def download_docusign_document(envelope_id):
 def handle_webhook():
     """
     Handles incoming webhook notifications from DocuSign.
+
+    Events are queued by envelope and applied in order by background workers
+    (webhook_queue.py); with queued processing switched off they are applied inline.
     """
     frappe.log_error("DocuSign Webhook received.", "DocuSign Webhook")
     
@@ -332,15 +437,62 @@ def handle_webhook():
         else:
             data = frappe.form_dict
 
+        # Extract envelope information
+        envelope_id, new_status = get_webhook_envelope_status(data)
+
+        # Validate required data
+        if not envelope_id:
+            frappe.log_error("Missing envelope ID in webhook payload.", "DocuSign Webhook Error")
+            frappe.response['http_status_code'] = 400
+            return {"status": "error", "message": "Missing envelope ID"}
+
+        if not new_status:
+            frappe.log_error("Missing status in webhook payload.", "DocuSign Webhook Error")
+            frappe.response['http_status_code'] = 400
+            return {"status": "error", "message": "Missing status"}
+
+        if webhook_queue_enabled():
+            enqueue_webhook_event(envelope_id, data)
+            frappe.response['http_status_code'] = 200
+            return {"status": "success", "message": "Event queued"}
+
+    except Exception as e:
+        error_msg = f"Unexpected error handling DocuSign webhook: {str(e)}"
+        frappe.log_error(error_msg, "DocuSign Webhook Error")
+        frappe.response['http_status_code'] = 500
+        return {"status": "error", "message": "Internal server error"}
+
+    return process_webhook_event(data)
+
+
+def get_webhook_envelope_status(data):
+    """
+    (envelope ID, envelope status) of a DocuSign Connect payload.
+    """
+    envelope_id = data.get("envelopeId") or data.get("data", {}).get("envelopeId")
+    new_status = data.get("status") or data.get("data", {}).get("envelopeSummary", {}).get("status")
+    return envelope_id, new_status
+
+
+def process_webhook_event(data, raise_errors=False):
+    """
+    Applies one DocuSign Connect event to its Frappe document and the envelope registry.
+
+    Statuses only move forward (envelope_registry.status_advances): a late `sent`
+    after `completed` is kept in the envelope's history but not applied.
+
+    Args:
+        raise_errors (bool): Re-raise unexpected (possibly transient) errors after
+            rolling back instead of answering 500, so queued events can be retried.
+    """
+    frappe_doctype = None
+    frappe_docname = None
+
+    try:
         frappe.log_error(f"Webhook Payload: {json.dumps(data, indent=2)}", "DocuSign Webhook")
 
         # Extract envelope information
-        envelope_id = data.get("envelopeId") or data.get("data", {}).get("envelopeId")
-        new_status = data.get("status") or data.get("data", {}).get("envelopeSummary", {}).get("status")
-        
-        # Initialize variables
-        frappe_doctype = None
-        frappe_docname = None
+        envelope_id, new_status = get_webhook_envelope_status(data)
         
         # Method 1: Try to extract from customFields in the webhook data
         if "data" in data and "customFields" in data["data"]:
@@ -381,6 +533,16 @@ def handle_webhook():
                     elif field.get("name") == "frappe_docname" and not frappe_docname:
                         frappe_docname = field.get("value")
 
+        # Pool account that sent the envelope
+        docusign_account = get_text_custom_field(data, "frappe_docusign_account")
+
+        # The envelope registry is authoritative; custom fields cover envelopes sent before it
+        envelope = get_envelope(envelope_id)
+        if envelope and envelope.reference_doctype and envelope.reference_name:
+            frappe_doctype = envelope.reference_doctype
+            frappe_docname = envelope.reference_name
+            docusign_account = envelope.docusign_account or docusign_account
+
         frappe.log_error(f"Extracted: doctype={frappe_doctype}, docname={frappe_docname}, status={new_status}, envelope_id={envelope_id}", "DocuSign Webhook")
 
         # Validate required data
@@ -416,10 +578,23 @@ def handle_webhook():
         
         # Store old status for comparison
         old_status = getattr(frappe_doc, 'docusign_status', None)
+
+        # Only move the envelope forward; a late event is kept in its history only
+        current_status = envelope.status if envelope else (
+            old_status if frappe_doc.get("docusign_envelope_id") == envelope_id else None
+        )
+        if not status_advances(current_status, new_status):
+            record_envelope(envelope_id, status=new_status, source="Webhook", event=data.get("event"), update_status=False)
+            frappe.db.commit()
+            frappe.response['http_status_code'] = 200
+            return {"status": "success", "message": f"Ignored {new_status}: envelope is already {current_status}"}
         
         # Update document fields
         frappe_doc.docusign_status = new_status
         frappe_doc.docusign_envelope_id = envelope_id
+        record_envelope_account(
+            frappe_doc, envelope_id, docusign_account, status=new_status, source="Webhook", event=data.get("event")
+        )
         
         # Add timestamp for when status was updated
         frappe_doc.docusign_last_updated = frappe.utils.now()
@@ -447,60 +622,61 @@ def handle_webhook():
         frappe.response['http_status_code'] = 200
         return {"status": "success", "message": f"Document updated successfully. Status: {new_status}"}
 
+    # Every failure rolls back the registry write too, so the redelivered event is applied again
     except frappe.DoesNotExistError:
+        frappe.db.rollback()
         error_msg = f"Document not found: {frappe_doctype} - {frappe_docname}"
         frappe.log_error(error_msg, "DocuSign Webhook Error")
         frappe.response['http_status_code'] = 404
         return {"status": "error", "message": error_msg}
         
     except frappe.ValidationError as ve:
+        frappe.db.rollback()
         error_msg = f"Validation error updating document: {str(ve)}"
         frappe.log_error(error_msg, "DocuSign Webhook Error")
         frappe.response['http_status_code'] = 400
         return {"status": "error", "message": error_msg}
         
     except Exception as e:
+        frappe.db.rollback()
+        if raise_errors:
+            raise
         error_msg = f"Unexpected error handling DocuSign webhook: {str(e)}"
         frappe.log_error(error_msg, "DocuSign Webhook Error")
         frappe.response['http_status_code'] = 500
         return {"status": "error", "message": "Internal server error"}
 
-def get_jwt_access_token():
+def get_text_custom_field(data, name):
     """
-    Retrieves a JWT access token for DocuSign authentication from the DocuSign Settings DocType.
+    Value of the envelope text custom field `name` in a DocuSign Connect payload.
     """
-    docusign_settings = frappe.get_cached_doc('DocuSign Settings', 'DocuSign Settings')
-    private_key = docusign_settings.private_key
-    client_id = docusign_settings.client_id
-    template_id = docusign_settings.docusign_template_id
-    impersonated_user_guid = docusign_settings.impersonated_user_guid
-    if not private_key or not client_id or not impersonated_user_guid:
-        frappe.throw("DocuSign credentials not set in DocuSign Settings.")
-
-    now = int(time.time())
-    exp = now + 3600 # 1 hour expiry
-    payload = {
-        "iss": client_id,
-        "sub": impersonated_user_guid,
-        "aud": "account-d.docusign.com",
-        "iat": now,
-        "exp": exp,
-        "scope": "signature impersonation"
-    }
-    jwt_token = encode(payload, private_key, algorithm="RS256")
-    url = "https://account-d.docusign.com/oauth/token"
-    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    body = {
-        "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer",
-        "assertion": jwt_token
-    }
-    response = requests.post(url, headers=headers, data=body)
-    response.raise_for_status()
-    data = response.json()
+    envelope = data.get("data") or {}
+    for source in (envelope, data, envelope.get("envelopeSummary") or {}):
+        for field in (source.get("customFields") or {}).get("textCustomFields") or []:
+            if field.get("name") == name:
+                return field.get("value")
+    return data.get(name)
 
-    access_token = data.get("access_token")
 
-    return access_token, "https://demo.docusign.net/restapi", template_id
+def get_jwt_access_token(account=None):
+    """
+    Retrieves a JWT access token for a DocuSign account of the pool (the default
+    account from DocuSign Settings when none is given). Tokens are cached per account.
+    """
+    account = account or get_account()
+    if not account.private_key or not account.client_id or not account.impersonated_user_guid:
+        frappe.throw(f"DocuSign credentials not set for account {account.name} in DocuSign Settings.")
+
+    access_token = get_access_token(account)
+
+    return access_token, account.base_path, account.template_id
+
+
+def get_docusign_auth_url():
+    """
+    Returns the OAuth server URL from DocuSign Settings, falling back to the demo account server.
+    """
+    return get_account().auth_url
 
 
 # def get_user_info(access_token):
@@ -513,16 +689,12 @@ def get_jwt_access_token():
 #     response.raise_for_status()
 #     return response.json()
 
-def get_user_info(access_token):
+def get_user_info(access_token, account=None):
     """
-    Retrieves the user's account information using the access token.
+    Retrieves the user's account information using the access token (cached per pool account).
     """
     try:
-        url = "https://account-d.docusign.com/oauth/userinfo"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        user_info = response.json()
+        user_info = get_account_user_info(account or get_account(), access_token)
         return user_info
     except Exception as e:
         error_msg = f"Failed to get user info: {str(e)}"
@@ -535,27 +707,8 @@ def merge_pdfs(docusign_pdf_bytes, custom_pdf_bytes):
     Merge DocuSign template PDF with your custom PDF
     """
     try:
-        # Create PDF readers
-        docusign_reader = PdfReader(BytesIO(docusign_pdf_bytes))
-        custom_reader = PdfReader(BytesIO(custom_pdf_bytes))
-        
-        # Create PDF writer
-        writer = PdfWriter()
-        
-        # Add pages from DocuSign template first
-        for page in docusign_reader.pages:
-            writer.add_page(page)
-        
-        # Add pages from custom PDF
-        for page in custom_reader.pages:
-            writer.add_page(page)
-        
-        # Write to bytes
-        output_buffer = BytesIO()
-        writer.write(output_buffer)
-        
-        merged_pdf_bytes = output_buffer.getvalue()
-        output_buffer.close()
+        # DocuSign template pages first, then the custom PDF, with the engine from DocuSign Settings
+        merged_pdf_bytes = get_pdf_backend().merge([docusign_pdf_bytes, custom_pdf_bytes])
         
         return merged_pdf_bytes
         
@@ -576,6 +729,8 @@ def get_docusign_template_pdf(template_id, account_id, templates_api, access_tok
     """
     Get PDF bytes directly from DocuSign template (much better approach!)
     """
+    from docusign_esign import ApiClient
+
     try:
         # Initialize DocuSign client
         api_client = ApiClient()
@@ -586,7 +741,8 @@ def get_docusign_template_pdf(template_id, account_id, templates_api, access_tok
         frappe.log_error(f"account ID: {account_id}", "DocuSign Debug")
     
         # Get template information
-        template_info = templates_api.get(account_id, template_id)
+        with upstream_call("docusign"):
+            template_info = templates_api.get(account_id, template_id, _request_timeout=SDK_TIMEOUT)
         
 
         # Get the first document from template (usually there's only one)
@@ -639,7 +795,7 @@ def get_template_document(access_token, account_id, template_id, document_id, ba
     print(f"Making API call to: {url}")
     
     try:
-        response = requests.get(url, headers=headers)
+        response = get_session("docusign").hedged_get(url, "template_document", headers=headers)
 
         response.raise_for_status()  # This will raise an HTTPError if the status is 4xx or 5xx
         # The response content is the raw PDF file
@@ -658,6 +814,8 @@ def get_merged_contract_for_signature(doc, template_id, account_id, templates_ap
     """
     Send merged PDF for signature (without using template, just as document)
     """
+    from docusign_esign import EnvelopeDefinition
+    from docusign_esign.models import Document, Recipients, Signer, SignHere, Tabs
     
     # Get merged PDF
     merged_contract = get_merged_contract(doc, template_id, account_id, templates_api, access_token, base_path)
@@ -669,8 +827,7 @@ def get_merged_contract_for_signature(doc, template_id, account_id, templates_ap
     # Get total number of pages (for last page)
     # Access raw bytes
     merged_pdf_bytes = merged_contract["bytes"]
-    reader = PdfReader(BytesIO(merged_pdf_bytes))
-    total_pages = len(reader.pages)
+    total_pages = get_pdf_backend().page_count(merged_pdf_bytes)
 
     # Create simple envelope with merged PDF
     envelope_definition = EnvelopeDefinition()
@@ -679,7 +836,16 @@ def get_merged_contract_for_signature(doc, template_id, account_id, templates_ap
     
     # Add merged document
     document = Document()
-    document.document_base64 = merged_pdf_base64
+    if needs_chunked_upload(len(merged_pdf_bytes)):
+        # Large contracts go up in parts (resumable per document) and are referenced by URI
+        document.remote_url = upload_document(
+            merged_pdf_bytes,
+            f"{base_path}/v2.1/accounts/{account_id}",
+            access_token,
+            resume_key=f"{doc.doctype}:{doc.name}",
+        )
+    else:
+        document.document_base64 = merged_pdf_base64
     document.name = f"Contract_{doc.name}.pdf"
     document.file_extension = "pdf"
     document.document_id = "1"
@@ -743,6 +909,25 @@ def get_merged_contract_for_signature(doc, template_id, account_id, templates_ap
     
     return envelope_definition
 
+def get_lean_envelope_for_signature(doc, template_id, account_id, templates_api, access_token, base_path, account_name, idempotency_key):
+    """
+    Same envelope as get_merged_contract_for_signature plus the custom fields, as a
+    ready-to-post JSON body (see envelope_builder.py)
+    """
+    merged_pdf_bytes = create_merged_contract_pdf(doc, template_id, account_id, templates_api, access_token, base_path)
+    total_pages = get_pdf_backend().page_count(merged_pdf_bytes)
+
+    remote_url = None
+    if needs_chunked_upload(len(merged_pdf_bytes)):
+        remote_url = upload_document(
+            merged_pdf_bytes,
+            f"{base_path}/v2.1/accounts/{account_id}",
+            access_token,
+            resume_key=f"{doc.doctype}:{doc.name}",
+        )
+
+    return build_envelope_body(doc, account_name, idempotency_key, total_pages, content=merged_pdf_bytes, remote_url=remote_url)
+
 # def get_merged_contract_base64(doc, template_id, account_id, templates_api,  access_token, base_path):
 #     """Get merged PDF as base64 for DocuSign sending"""
     
@@ -797,23 +982,26 @@ def create_merged_contract_pdf(doc, template_id, account_id, templates_api, acce
 
 @frappe.whitelist()
 def fetch_groups():
-    try:
-        docusign_settings = frappe.get_cached_doc('DocuSign Settings', 'DocuSign Settings')
-        base_url = docusign_settings.cms_base_url.rstrip("/")
-        group_fetch_url = f"{base_url}/frappeasset/api/group?assetKind=groups&numotype=ocpp"
-        # pull your API key from settings (add a Password field `cms_api_key` if not yet present)
-        api_key = docusign_settings.cms_api_key  
-
-        headers = {
-            "x-api-key": api_key,           # <<— the header your API expects
-            "Accept": "application/json"
-        }
-        resp = requests.get(group_fetch_url, headers=headers, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-    except requests.exceptions.RequestException as e:
-        frappe.log_error(f"Group fetch failed: {str(e)}")
-        return []
+    """
+    CMS group options, served from the reference cache.
+    """
+    return get_reference_list("groups")
+
+
+def get_groups_from_cms():
+    docusign_settings = frappe.get_cached_doc('DocuSign Settings', 'DocuSign Settings')
+    base_url = docusign_settings.cms_base_url.rstrip("/")
+    group_fetch_url = f"{base_url}/frappeasset/api/group?assetKind=groups&numotype=ocpp"
+    # pull your API key from settings (add a Password field `cms_api_key` if not yet present)
+    api_key = docusign_settings.cms_api_key  
+
+    headers = {
+        "x-api-key": api_key,           # <<— the header your API expects
+        "Accept": "application/json"
+    }
+    resp = get_session("cms").hedged_get(group_fetch_url, "groups", headers=headers, timeout=10)
+    resp.raise_for_status()
+    data = resp.json()
 
     # Return list of dicts with both name & identifier
     return [{"name": d.get("name"), "identifier": d.get("identifier")} for d in data]
@@ -856,7 +1044,7 @@ def send_tariff(contract_id):
     }
 
     create_url = f"{base_url}/frapeetariff/api/tariff"
-    create_resp = requests.post(create_url, json=tariff_payload, headers=headers)
+    create_resp = get_session("cms").post(create_url, json=tariff_payload, headers=headers)
 
     if create_resp.status_code != 200:
         frappe.throw(f"Error creating tariff: {create_resp.text}")
@@ -871,33 +1059,8 @@ def send_tariff(contract_id):
     doc.save(ignore_permissions=True)
 
     # -----------------------------
-    # 2️⃣ Get existing rules
+    # 2️⃣ Build new rule
     # -----------------------------
-    rules_url = f"{base_url}/frapeetariff/api/tariff_rules"
-    params = {"numotype": "ocpp"}
-
-    rules_resp = requests.get(rules_url, params=params, headers=headers)
-
-    if rules_resp.status_code != 200:
-        frappe.log_error(rules_resp.text, "Fetch Rules Failed")
-        frappe.throw(f"Error fetching tariff rules: {rules_resp.text}")
-
-    # CMS returns either a single object or list; handle both
-    rules_json = rules_resp.json()
-
-    if isinstance(rules_json, list) and rules_json:
-        # take the first element if it's a list
-        rules_data = rules_json[0]
-    else:
-        rules_data = rules_json
-
-
-    # Ensure it has keys we need
-    numotype = rules_data.get("numotype", "ocpp")
-    identifier = rules_data.get("identifier") or frappe.generate_hash()
-    rules_list = rules_data.get("rules", [])
-
-    # 3️⃣ Build new rule
     new_rule = {
         "accountType": "group",
         "groupId": [doc.group_id],  # ensure this field matches your doctype
@@ -907,37 +1070,22 @@ def send_tariff(contract_id):
     }
     frappe.log_error(f"New rule to insert: {json.dumps(new_rule, indent=2)}", "send_tariff")
 
-    # Insert at start of rules
-    rules_list.insert(0, new_rule)
-
-    # Build final payload in CMS format
-    final_payload = {
-        "numotype": numotype,
-        "rules": rules_list,
-        "identifier": identifier
-    }
-
-    # 4️⃣ Push updated rules back
-    push_url = f"{base_url}/frapeetariff/api/tariff_rules"
-    frappe.log_error(f"Posting updated rules to {push_url}", "send_tariff")
-    push_resp = requests.post(push_url, json=final_payload, headers=headers)
-    frappe.log_error(f"Rules POST response code={push_resp.status_code}, body={push_resp.text}", "send_tariff")
+    # -----------------------------
+    # 3️⃣ Upsert it against the local rules mirror (conditional write, retried on conflict)
+    # -----------------------------
+    identifier = upsert_tariff_rule(docusign_settings, new_rule)
 
-    if push_resp.status_code != 200:
-        frappe.log_error(push_resp.text, "Push Rules Failed")
-        frappe.throw(f"Error posting updated rules: {push_resp.text}")
-    else:
     # success case
-        # suppress automatic form merge/refresh
-         # Save to Contract
-        doc.has_tariff_published_to_cms = True
-        doc.save(ignore_permissions=True)
-        frappe.response["message"] = None  # 👈 clear message so client gets null
-        # you can still send status info separately:
-        frappe.response["status"] = "success"
-        frappe.response["tariff_id"] = tariff_id
-        frappe.response["rules_identifier"] = identifier
-        return  # nothing returned, nothing merged
+    # suppress automatic form merge/refresh
+    # Save to Contract
+    doc.has_tariff_published_to_cms = True
+    doc.save(ignore_permissions=True)
+    frappe.response["message"] = None  # 👈 clear message so client gets null
+    # you can still send status info separately:
+    frappe.response["status"] = "success"
+    frappe.response["tariff_id"] = tariff_id
+    frappe.response["rules_identifier"] = identifier
+    return  # nothing returned, nothing merged
 
 
 
@@ -0,0 +1,389 @@
+"""
+Native DocuSign Bulk Send for mass contracts on one template.
+
+A DocuSign Bulk Send document lists the Frappe documents to send. Instead of
+building and uploading one merged-PDF envelope per document, the recipients, their
+merge fields and the Frappe references (as envelope custom fields, so webhooks
+still find the document) are uploaded as bulk send lists of up to BULK_LIST_LIMIT
+copies, and a single send request per list has DocuSign create the envelopes from
+the template: two API calls per list instead of a few per document.
+
+DocuSign creates the envelopes asynchronously. poll_bulk_sends runs on the
+scheduler, reads each batch's envelopes back and writes the envelope IDs to the
+rows and to the Frappe documents; copies DocuSign could not send are marked Failed
+and are retried by sending the document again.
+
+Documents that already have a live envelope (send_guard.has_live_envelope) are
+not sent again. Each copy carries the send key a single send of the unchanged
+document would use, so a later single send finds the bulk envelope instead of
+creating a second one.
+"""
+
+import frappe
+from frappe.utils import cint, now_datetime
+
+from docusign_integration.docusign_integration.accounts import (
+    get_access_token,
+    get_account,
+    get_account_user_info,
+    pick_account,
+    record_envelope_account,
+    use_account,
+)
+from docusign_integration.docusign_integration.send_guard import get_idempotency_key, has_live_envelope
+from docusign_integration.utils.circuit_breaker import get_session
+
+DOCTYPE = "DocuSign Bulk Send"
+ITEM_DOCTYPE = "DocuSign Bulk Send Item"
+
+# DocuSign accepts at most this many copies per bulk send list
+BULK_LIST_LIMIT = 1000
+ENVELOPE_PAGE_SIZE = 100
+RUN_LOCK_KEY = "docusign_integration:bulk_send:{}"
+RECIPIENT_FIELDS = ("customer_email", "customer_name")
+SUPPLIER_FIELDS = ("supplier_email", "supplier_name")
+# Read to skip documents that were already sent
+ENVELOPE_FIELDS = ("docusign_envelope_id", "docusign_status")
+
+
+class BulkSendClient:
+    """
+    Bulk send endpoints of one pool account. Build it inside `use_account(account)`.
+    """
+
+    def __init__(self, account):
+        access_token = get_access_token(account)
+        user_account = get_account_user_info(account, access_token)["accounts"][0]
+        base_uri = user_account.get("base_uri") or account.base_path.removesuffix("/restapi")
+
+        self.base_url = f"{base_uri}/restapi/v2.1/accounts/{user_account['account_id']}"
+        self.headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
+        self.session = get_session("docusign")
+
+    def create_list(self, name, bulk_copies):
+        data = self._request("POST", "bulk_send_lists", json={"name": name, "bulkCopies": bulk_copies})
+        return data["listId"]
+
+    def send(self, list_id, template_id, batch_name):
+        data = self._request(
+            "POST",
+            f"bulk_send_lists/{list_id}/send",
+            json={"envelopeOrTemplateId": template_id, "batchName": batch_name},
+        )
+        return data["batchId"]
+
+    def batch_status(self, batch_id):
+        return self._request("GET", f"bulk_send_batch/{batch_id}")
+
+    def batch_envelopes(self, batch_id):
+        """
+        Yields the envelopes DocuSign has created for the batch so far.
+        """
+        start = 0
+        while True:
+            data = self._request(
+                "GET",
+                f"bulk_send_batch/{batch_id}/envelopes",
+                params={"count": ENVELOPE_PAGE_SIZE, "start_position": start, "include": "custom_fields"},
+            )
+            envelopes = data.get("envelopes") or []
+            yield from envelopes
+            if len(envelopes) < ENVELOPE_PAGE_SIZE:
+                return
+            start += len(envelopes)
+
+    def _request(self, method, path, **kwargs):
+        resp = self.session.request(method, f"{self.base_url}/{path}", headers=self.headers, **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+
+
+def parse_merge_fields(merge_fields):
+    """
+    "tab_label=fieldname" lines as a {tab_label: fieldname} dict.
+    """
+    fields = {}
+    for line in (merge_fields or "").splitlines():
+        label, _, fieldname = line.partition("=")
+        if label.strip() and fieldname.strip():
+            fields[label.strip()] = fieldname.strip()
+    return fields
+
+
+def get_document_values(doctype, names, merge_fields=None):
+    """
+    Recipient, supplier, envelope and merge field values of `names`, in one query.
+    """
+    meta = frappe.get_meta(doctype)
+    fields = ["name", "modified", *RECIPIENT_FIELDS]
+    fields += [f for f in (*SUPPLIER_FIELDS, *ENVELOPE_FIELDS) if meta.has_field(f)]
+    fields += [f for f in (merge_fields or {}).values() if f not in fields]
+    rows = frappe.get_all(doctype, filters={"name": ("in", list(names))}, fields=fields)
+    return {row.name: row for row in rows}
+
+
+def run_bulk_send(name):
+    """
+    Uploads the rows that are not Queued or Sent yet as bulk send lists and sends
+    them.
+
+    Returns:
+        dict: Counts of queued and failed rows in this run, or None if the document
+        is already being sent.
+    """
+    cache = frappe.cache()
+    lock = cache.lock(cache.make_key(RUN_LOCK_KEY.format(name)), timeout=30 * 60)
+    if not lock.acquire(blocking=False):
+        return None
+
+    try:
+        doc = frappe.get_doc(DOCTYPE, name)
+        # A resumed run stays on the account that sent the first lists
+        account = get_account(doc.docusign_account) if doc.docusign_account else pick_account(doc.reference_doctype)
+        doc.db_set({"run_status": "Sending", "docusign_account": account.name})
+        frappe.db.commit()
+
+        with use_account(account):
+            result = _send(doc, account)
+
+        _update_counts(name)
+        frappe.db.commit()
+        return result
+    except Exception:
+        frappe.db.rollback()
+        frappe.db.set_value(DOCTYPE, name, "run_status", "Failed")
+        frappe.db.commit()
+        frappe.log_error(title=f"DocuSign bulk send failed: {name}", message=frappe.get_traceback())
+        raise
+    finally:
+        lock.release()
+
+
+def _send(doc, account):
+    result = {"queued": 0, "failed": 0}
+    rows = [row for row in doc.documents if row.status in ("Pending", "Failed")]
+    if not rows:
+        return result
+
+    template_id = doc.template_id or account.template_id
+    if not template_id:
+        frappe.throw(f"No Template ID set on {doc.name} or on DocuSign account {account.name}")
+
+    merge_fields = parse_merge_fields(doc.merge_fields)
+    values = get_document_values(doc.reference_doctype, [row.reference_name for row in rows], merge_fields)
+
+    # Sent on their own since the bulk send was saved
+    sent = [row for row in rows if has_live_envelope(values.get(row.reference_name) or {})]
+    for row in sent:
+        envelope_id = values[row.reference_name].docusign_envelope_id
+        _record(row, "Failed", error=f"Already sent in envelope {envelope_id}")
+    result["failed"] += len(sent)
+    rows = [row for row in rows if row not in sent]
+
+    client = BulkSendClient(account)
+
+    for start in range(0, len(rows), BULK_LIST_LIMIT):
+        chunk = rows[start:start + BULK_LIST_LIMIT]
+        part = start // BULK_LIST_LIMIT + 1
+        try:
+            copies = [_bulk_copy(doc, values[row.reference_name], merge_fields, account) for row in chunk]
+            list_id = client.create_list(f"{doc.name}-{part}", copies)
+            batch_id = client.send(list_id, template_id, f"{doc.batch_name or doc.name} ({part})")
+        except Exception as e:
+            frappe.log_error(title=f"DocuSign bulk send list failed: {doc.name}", message=frappe.get_traceback())
+            for row in chunk:
+                _record(row, "Failed", error=str(e))
+            result["failed"] += len(chunk)
+        else:
+            for row in chunk:
+                _record(row, "Queued", batch_id=batch_id)
+            result["queued"] += len(chunk)
+        frappe.db.commit()
+
+    return result
+
+
+def _bulk_copy(doc, values, merge_fields, account):
+    customer = {
+        "roleName": doc.customer_role,
+        "name": values.customer_name,
+        "email": values.customer_email,
+    }
+    if merge_fields:
+        customer["tabs"] = [
+            {"tabLabel": label, "initialValue": str(values.get(fieldname) or "")}
+            for label, fieldname in merge_fields.items()
+        ]
+    recipients = [customer]
+    if doc.supplier_role and values.get("supplier_email"):
+        recipients.append({
+            "roleName": doc.supplier_role,
+            "name": values.get("supplier_name"),
+            "email": values.supplier_email,
+        })
+
+    return {
+        "recipients": recipients,
+        # Same custom fields as single sends, so webhooks and downloads work unchanged
+        "customFields": [
+            {"name": "frappe_doctype", "value": doc.reference_doctype},
+            {"name": "frappe_docname", "value": values.name},
+            {"name": "frappe_docusign_account", "value": account.name},
+            {
+                "name": "frappe_send_key",
+                "value": get_idempotency_key(frappe._dict(values, doctype=doc.reference_doctype)),
+            },
+        ],
+    }
+
+
+def poll_bulk_send(name):
+    """
+    Writes the envelope IDs DocuSign created for the Queued rows back to the rows
+    and their documents; rows of finished batches without an envelope are Failed.
+    """
+    doc = frappe.get_doc(DOCTYPE, name)
+    queued = {}
+    for row in doc.documents:
+        if row.status == "Queued" and row.batch_id:
+            queued.setdefault(row.batch_id, {})[row.reference_name] = row
+    if not queued:
+        _update_counts(name)
+        return
+
+    account = get_account(doc.docusign_account)
+    with use_account(account):
+        client = BulkSendClient(account)
+        for batch_id, rows in queued.items():
+            for envelope in client.batch_envelopes(batch_id):
+                row = rows.pop(_custom_field(envelope, "frappe_docname"), None)
+                if row and envelope.get("envelopeId"):
+                    _record(row, "Sent", envelope_id=envelope["envelopeId"])
+                    _write_back(
+                        doc.reference_doctype,
+                        row.reference_name,
+                        envelope["envelopeId"],
+                        account.name,
+                        _custom_field(envelope, "frappe_send_key"),
+                    )
+
+            if rows:
+                status = client.batch_status(batch_id)
+                # Nothing left in DocuSign's queue: copies without an envelope were rejected
+                if not cint(status.get("queued")):
+                    error = "; ".join(
+                        e.get("errorMessage") or "" for e in status.get("bulkErrors") or []
+                    ) or "DocuSign did not create an envelope"
+                    for row in rows.values():
+                        _record(row, "Failed", error=error)
+            frappe.db.commit()
+
+    doc.db_set("last_polled_on", now_datetime(), update_modified=False)
+    _update_counts(name)
+    frappe.db.commit()
+
+
+def poll_bulk_sends():
+    """
+    Scheduler entry point: polls every bulk send that is still sending.
+    """
+    for name in frappe.get_all(DOCTYPE, filters={"run_status": "Sending"}, pluck="name"):
+        try:
+            poll_bulk_send(name)
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title=f"DocuSign bulk send poll failed: {name}", message=frappe.get_traceback())
+
+
+def _custom_field(envelope, name):
+    for field in (envelope.get("customFields") or {}).get("textCustomFields") or []:
+        if field.get("name") == name:
+            return field.get("value")
+    return None
+
+
+def _write_back(doctype, docname, envelope_id, account_name, send_key=None):
+    try:
+        target = frappe.get_doc(doctype, docname)
+        target.docusign_envelope_id = envelope_id
+        target.docusign_status = "Sent"
+        record_envelope_account(
+            target, envelope_id, account_name, status="sent", source="Bulk Send", send_key=send_key
+        )
+        target.flags.ignore_permissions = True
+        target.save()
+    except Exception:
+        # The row keeps the envelope ID; the document can be fixed up from it
+        frappe.log_error(title=f"DocuSign bulk send write-back failed: {docname}", message=frappe.get_traceback())
+
+
+def _record(row, status, envelope_id=None, batch_id=None, error=None):
+    values = {"status": status, "error": error}
+    if envelope_id:
+        values["envelope_id"] = envelope_id
+    if batch_id:
+        values["batch_id"] = batch_id
+    frappe.db.set_value(ITEM_DOCTYPE, row.name, values, update_modified=False)
+
+
+def _update_counts(name):
+    rows = frappe.get_all(
+        ITEM_DOCTYPE,
+        filters={"parent": name, "parenttype": DOCTYPE},
+        fields=["status", "count(name) as count"],
+        group_by="status",
+    )
+    counts = {row.status: row.count for row in rows}
+    if counts.get("Queued"):
+        run_status = "Sending"
+    elif counts.get("Failed") or counts.get("Pending"):
+        run_status = "Completed with Errors"
+    else:
+        run_status = "Completed"
+
+    frappe.db.set_value(
+        DOCTYPE,
+        name,
+        {
+            "queued_count": counts.get("Queued", 0),
+            "sent_count": counts.get("Sent", 0),
+            "failed_count": counts.get("Failed", 0),
+            "run_status": run_status,
+        },
+        update_modified=False,
+    )
+
+
+@frappe.whitelist()
+def start_bulk_send(name):
+    """
+    Queues the rows of a bulk send that are not Queued or Sent yet.
+    """
+    frappe.only_for("System Manager")
+
+    if frappe.db.get_value(DOCTYPE, name, "run_status") in ("Queued", "Sending"):
+        frappe.throw("This bulk send is already in progress")
+
+    frappe.db.set_value(DOCTYPE, name, "run_status", "Queued")
+    frappe.enqueue(
+        "docusign_integration.docusign_integration.bulk_send.run_bulk_send",
+        queue="long",
+        timeout=30 * 60,
+        name=name,
+        enqueue_after_commit=True,
+        job_id=f"docusign_integration_bulk_send_{name}",
+        deduplicate=True,
+    )
+    return {"queued": True}
+
+
+@frappe.whitelist()
+def refresh_bulk_send_status(name):
+    """
+    Polls DocuSign for the bulk send now instead of waiting for the scheduler.
+    """
+    frappe.only_for("System Manager")
+    poll_bulk_send(name)
+    return frappe.db.get_value(
+        DOCTYPE, name, ["run_status", "queued_count", "sent_count", "failed_count"], as_dict=True
+    )
@@ -0,0 +1,158 @@
+"""
+DocuSign chunked uploads for large envelope documents.
+
+Documents above `threshold` bytes are not inlined as document_base64 in the
+create_envelope body. They go up in `chunk_size` parts through the chunked_uploads
+API, each part retried on its own, and the committed upload is referenced from the
+envelope by its URI.
+
+The upload's ID is kept in Redis under a caller-chosen resume key (e.g. the Frappe
+document) with a digest of the content. A send that is retried after a dropped
+connection with the same content asks DocuSign which parts already arrived and
+only uploads the rest; a committed upload is reused as-is.
+
+Defaults are overridable via `docusign_chunked_upload` in site_config.json.
+"""
+
+import base64
+import hashlib
+import time
+
+import frappe
+import requests
+
+from docusign_integration.utils.circuit_breaker import get_session, is_upstream_failure
+from docusign_integration.utils.rate_limiter import current_account
+
+DEFAULTS = {
+    # Documents larger than this (bytes) are uploaded in parts
+    "threshold": 5 * 1024 * 1024,
+    "chunk_size": 2 * 1024 * 1024,
+    "part_attempts": 4,
+}
+
+STATE_KEY = "docusign_integration:chunked_upload:{}"
+# DocuSign drops uncommitted uploads after 20 minutes; forget them a little earlier
+STATE_TTL = 15 * 60
+
+
+def get_chunked_upload_config():
+    return {**DEFAULTS, **(frappe.conf.get("docusign_chunked_upload") or {})}
+
+
+def needs_chunked_upload(size):
+    return size > int(get_chunked_upload_config()["threshold"])
+
+
+def upload_document(content, account_url, access_token, resume_key):
+    """
+    Uploads `content` in parts and commits it.
+
+    Args:
+        content (bytes): The document.
+        account_url (str): eSignature API base of the account, ".../restapi/v2.1/accounts/{id}".
+        access_token (str): Bearer token of the account.
+        resume_key (str): Identifies the upload across retries, e.g. "Contract:CON-0001".
+
+    Returns:
+        str: The upload's URI, to set as the envelope document's remote_url.
+    """
+    config = get_chunked_upload_config()
+    chunk_size = int(config["chunk_size"])
+    parts = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+    digest = hashlib.sha256(content).hexdigest()
+
+    cache = frappe.cache()
+    # Uploads belong to a DocuSign account, so the pool account is part of the key
+    key = STATE_KEY.format(f"{current_account()[0]}:{resume_key}")
+    uploader = ChunkedUploader(account_url, access_token, int(config["part_attempts"]))
+
+    state = cache.get_value(key)
+    received = set()
+    if state and state.get("digest") == digest:
+        remote = uploader.status(state["id"])
+        if remote is None:
+            state = None
+        elif str(remote.get("committed")).lower() == "true":
+            return state["uri"]
+        else:
+            received = {
+                int(p["sequence"]) for p in remote.get("chunkedUploadParts") or [] if int(p.get("size") or 0)
+            }
+    else:
+        state = None
+
+    if not state:
+        data = uploader.create(parts[0])
+        state = {"digest": digest, "id": data["chunkedUploadId"], "uri": data["chunkedUploadUri"]}
+        cache.set_value(key, state, expires_in_sec=STATE_TTL)
+        received = {0}
+
+    for sequence, part in enumerate(parts):
+        if sequence not in received:
+            uploader.put_part(state["id"], sequence, part)
+
+    uploader.commit(state["id"])
+    return state["uri"]
+
+
+def clear_upload_state(resume_key):
+    """
+    Forgets the upload of `resume_key` once an envelope has been created from it.
+    """
+    frappe.cache().delete_value(STATE_KEY.format(f"{current_account()[0]}:{resume_key}"))
+
+
+class ChunkedUploader:
+    def __init__(self, account_url, access_token, attempts):
+        self.url = f"{account_url.rstrip('/')}/chunked_uploads"
+        self.headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
+        self.attempts = attempts
+        self.session = get_session("docusign")
+
+    def create(self, part):
+        return self._request("POST", self.url, json={"data": _b64(part)}).json()
+
+    def put_part(self, upload_id, sequence, part):
+        self._request(
+            "PUT",
+            f"{self.url}/{upload_id}/{sequence}",
+            json={"chunkedUploadId": upload_id, "data": _b64(part)},
+        )
+
+    def commit(self, upload_id):
+        self._request("PUT", f"{self.url}/{upload_id}", params={"action": "commit"}, json={})
+
+    def status(self, upload_id):
+        """
+        The upload's parts and commit state, or None when DocuSign no longer has it.
+        """
+        try:
+            return self._request("GET", f"{self.url}/{upload_id}", endpoint="chunked_upload_status").json()
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code in (400, 404):
+                return None
+            raise
+
+    def _request(self, method, url, endpoint=None, **kwargs):
+        """
+        Sends one request, retrying transport errors, 5xx and 429 with backoff.
+        GETs given an `endpoint` go through the session's hedged_get.
+        """
+        for attempt in range(1, self.attempts + 1):
+            try:
+                if endpoint:
+                    resp = self.session.hedged_get(url, endpoint, headers=self.headers, **kwargs)
+                else:
+                    resp = self.session.request(method, url, headers=self.headers, **kwargs)
+                resp.raise_for_status()
+                return resp
+            except requests.RequestException as e:
+                # UpstreamUnavailable (breaker open) is not a RequestException and is not retried
+                if attempt == self.attempts or not is_upstream_failure(e):
+                    raise
+            time.sleep(min(2 ** (attempt - 1), 8))
+
+
+def _b64(part):
+    return base64.b64encode(part).decode()
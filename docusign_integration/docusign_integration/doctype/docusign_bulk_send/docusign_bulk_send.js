@@ -0,0 +1,60 @@
+// Copyright (c) 2026, nithin and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('DocuSign Bulk Send', {
+    refresh(frm) {
+        if (frm.is_new()) {
+            return;
+        }
+
+        if (['Not Started', 'Completed with Errors', 'Failed'].includes(frm.doc.run_status)) {
+            frm.add_custom_button(__('Add Documents'), () => add_documents(frm));
+            frm.add_custom_button(__('Send'), () => {
+                frappe.call({
+                    method: 'docusign_integration.docusign_integration.bulk_send.start_bulk_send',
+                    args: { name: frm.doc.name },
+                    callback() {
+                        frappe.show_alert({ message: __('Bulk send queued'), indicator: 'blue' });
+                        frm.reload_doc();
+                    }
+                });
+            }).addClass('btn-primary');
+        }
+
+        if (frm.doc.run_status === 'Sending') {
+            frm.add_custom_button(__('Refresh Status'), () => {
+                frappe.call({
+                    method: 'docusign_integration.docusign_integration.bulk_send.refresh_bulk_send_status',
+                    args: { name: frm.doc.name },
+                    freeze: true,
+                    callback() {
+                        frm.reload_doc();
+                    }
+                });
+            });
+        }
+    }
+});
+
+
+function add_documents(frm) {
+    if (!frm.doc.reference_doctype) {
+        frappe.msgprint(__('Select a Document Type first'));
+        return;
+    }
+
+    const picker = new frappe.ui.form.MultiSelectDialog({
+        doctype: frm.doc.reference_doctype,
+        target: frm,
+        setters: {},
+        action(selections) {
+            const existing = new Set((frm.doc.documents || []).map(row => row.reference_name));
+            selections.filter(name => !existing.has(name)).forEach(name => {
+                frm.add_child('documents', { reference_doctype: frm.doc.reference_doctype, reference_name: name });
+            });
+            frm.refresh_field('documents');
+            picker.dialog.hide();
+            frm.save();
+        }
+    });
+}
@@ -0,0 +1,53 @@
+# Copyright (c) 2026, nithin and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+from docusign_integration.docusign_integration.bulk_send import (
+	RECIPIENT_FIELDS,
+	get_document_values,
+	parse_merge_fields,
+)
+from docusign_integration.docusign_integration.send_guard import has_live_envelope
+
+
+class DocuSignBulkSend(Document):
+	def validate(self):
+		meta = frappe.get_meta(self.reference_doctype)
+		merge_fields = parse_merge_fields(self.merge_fields)
+		missing = [f for f in (*RECIPIENT_FIELDS, *merge_fields.values()) if not meta.has_field(f)]
+		if missing:
+			frappe.throw(f"{self.reference_doctype} has no field(s): {', '.join(missing)}")
+
+		# The same document twice would get two envelopes
+		seen = set()
+		duplicates = [row for row in self.documents if row.reference_name in seen or seen.add(row.reference_name)]
+		for row in duplicates:
+			self.remove(row)
+
+		if not self.documents:
+			frappe.throw("No documents selected")
+
+		values = get_document_values(self.reference_doctype, [row.reference_name for row in self.documents])
+		no_email = []
+		already_sent = []
+		for row in self.documents:
+			row.reference_doctype = self.reference_doctype
+			recipient = values.get(row.reference_name)
+			if not recipient or not recipient.customer_email:
+				no_email.append(row.reference_name)
+				continue
+			row.recipient_email = recipient.customer_email
+			row.recipient_name = recipient.customer_name
+			# A second live envelope for the document; rows this bulk send sent are fine
+			if row.status not in ("Queued", "Sent") and has_live_envelope(recipient):
+				already_sent.append(row.reference_name)
+
+		if no_email:
+			frappe.throw(f"Recipient Email is required. Missing for: {', '.join(no_email[:20])}")
+		if already_sent:
+			frappe.throw(
+				"Already sent to DocuSign (void or decline the envelope to send again): "
+				f"{', '.join(already_sent[:20])}"
+			)
@@ -0,0 +1,14 @@
+# Copyright (c) 2026, nithin and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class DocuSignEnvelope(Document):
+	pass
+
+
+def on_doctype_update():
+	# Envelopes sent for a document
+	frappe.db.add_index("DocuSign Envelope", ["reference_doctype", "reference_name"])
@@ -4,5 +4,26 @@
 import frappe
 from frappe.model.document import Document
 
+from docusign_integration.utils.pdf_backend import resolve_engine
+
 class DocuSignSettings(Document):
-    pass
+    def validate(self):
+        seen = {"default"}
+        for row in self.get("docusign_accounts") or []:
+            row.account_name = (row.account_name or "").strip()
+            if row.account_name in seen:
+                frappe.throw(f"Row {row.idx}: Account Name {row.account_name!r} is already used")
+            seen.add(row.account_name)
+
+        engine = self.get("pdf_engine")
+        if engine and resolve_engine(engine) != engine and engine != "Auto":
+            frappe.msgprint(
+                f"{engine} is not installed on this server; PDFs will be processed with {resolve_engine(engine)}",
+                indicator="orange",
+            )
+
+    def on_update(self):
+        from docusign_integration.docusign_integration.accounts import clear_account_cache
+
+        # Credentials may have changed; drop cached tokens and account info
+        clear_account_cache()
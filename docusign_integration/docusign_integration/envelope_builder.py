@@ -0,0 +1,171 @@
+"""
+Lean create_envelope requests for contract sends.
+
+The SDK path builds EnvelopeDefinition, Document, Signer, SignHere, Tabs and
+Recipients models, and create_envelope serializes them with the SDK's generic
+sanitizer, which walks every attribute and copies the base64 document along the
+way. Only a handful of values change between sends, so here the REST body is put
+together from a skeleton compiled once per DocType: its static JSON is encoded
+once, and a send only encodes the document's own values. The base64 document
+needs no JSON escaping and goes in as bytes, so it is copied once, when the body
+is joined. The body is posted over the pooled DocuSign session.
+
+The SDK stays as the fallback: `docusign_lean_envelopes: 0` in site_config.json
+sends through the SDK models again.
+"""
+
+import base64
+import json
+from functools import lru_cache
+
+import frappe
+
+from docusign_integration.utils.circuit_breaker import get_session
+
+# (connect, read) seconds; the body can carry a multi-megabyte document
+CREATE_TIMEOUT = (5, 60)
+
+# Skeleton slots are written as "@@name@@" strings and replaced by the encoded value
+_SLOT = "@@{}@@"
+
+
+def use_lean_envelopes():
+    return bool(frappe.conf.get("docusign_lean_envelopes", 1))
+
+
+@lru_cache(maxsize=64)
+def get_skeleton(doctype, remote):
+    """
+    Compiled body for `doctype`: static JSON fragments alternating with slot names.
+
+    Args:
+        doctype (str): Baked into the frappe_doctype custom field.
+        remote (bool): The document is referenced by remoteUrl (chunked upload)
+            instead of inlined as documentBase64.
+    """
+    # Same layout as get_merged_contract_for_signature: the supplier signs first,
+    # then the customer, both on the last page
+    body = {
+        "emailSubject": _slot("email_subject"),
+        "status": "sent",
+        "documents": [
+            {
+                "documentId": "1",
+                "name": _slot("document_name"),
+                "fileExtension": "pdf",
+                ("remoteUrl" if remote else "documentBase64"): _slot("document"),
+            }
+        ],
+        "recipients": {
+            "signers": [
+                _signer("customer", recipient_id="2", x_position="500"),
+                _signer("supplier", recipient_id="1", x_position="50"),
+            ]
+        },
+        "customFields": {
+            "textCustomFields": [
+                _text_custom_field("frappe_doctype", doctype),
+                _text_custom_field("frappe_docname", _slot("docname")),
+                _text_custom_field("frappe_docusign_account", _slot("account")),
+                _text_custom_field("frappe_send_key", _slot("send_key")),
+            ]
+        },
+    }
+
+    fragments, slots = [], []
+    rest = json.dumps(body, separators=(",", ":"))
+    while True:
+        start = rest.find('"@@')
+        if start == -1:
+            fragments.append(rest.encode())
+            break
+        end = rest.index('@@"', start + 3)
+        fragments.append(rest[:start].encode())
+        slots.append(rest[start + 3:end])
+        rest = rest[end + 3:]
+    return tuple(fragments), tuple(slots)
+
+
+def _slot(name):
+    return _SLOT.format(name)
+
+
+def _signer(role, recipient_id, x_position):
+    return {
+        "email": _slot(f"{role}_email"),
+        "name": _slot(f"{role}_name"),
+        "recipientId": recipient_id,
+        "routingOrder": recipient_id,
+        "tabs": {
+            "signHereTabs": [
+                {"documentId": "1", "pageNumber": _slot("last_page"), "xPosition": x_position, "yPosition": "700"}
+            ]
+        },
+    }
+
+
+def _text_custom_field(name, value):
+    return {"name": name, "value": value, "required": "false", "show": "false"}
+
+
+def build_envelope_body(doc, account_name, send_key, total_pages, content=None, remote_url=None):
+    """
+    create_envelope request body for sending `doc`'s merged contract.
+
+    Args:
+        doc: The Frappe document being sent.
+        account_name (str): Pool account sending the envelope.
+        send_key (str): Idempotency key of the send (send_guard.py).
+        total_pages (int): Pages in the merged contract; signatures go on the last one.
+        content (bytes): The merged contract, inlined when no `remote_url` is given.
+        remote_url (str): URI of the committed chunked upload of the contract.
+
+    Returns:
+        bytes: The JSON body.
+    """
+    fragments, slots = get_skeleton(doc.doctype, remote_url is not None)
+    values = {
+        "email_subject": f"Contract for {doc.name} - Please Sign",
+        "document_name": f"Contract_{doc.name}.pdf",
+        "last_page": str(total_pages),
+        "customer_email": doc.customer_email,
+        "customer_name": doc.customer_name,
+        "supplier_email": doc.supplier_email,
+        "supplier_name": doc.supplier_name,
+        "docname": doc.name,
+        "account": account_name,
+        "send_key": send_key,
+    }
+
+    parts = [fragments[0]]
+    for slot, fragment in zip(slots, fragments[1:]):
+        if slot != "document":
+            parts.append(json.dumps(values[slot]).encode())
+        elif remote_url is not None:
+            parts.append(json.dumps(remote_url).encode())
+        else:
+            parts += (b'"', base64.b64encode(content), b'"')
+        parts.append(fragment)
+    return b"".join(parts)
+
+
+def create_envelope(account_url, access_token, body):
+    """
+    Posts a create_envelope `body` (bytes) and returns the new envelope's ID.
+
+    Args:
+        account_url (str): eSignature API base of the account, ".../restapi/v2.1/accounts/{id}".
+        access_token (str): Bearer token of the account.
+    """
+    response = get_session("docusign").post(
+        f"{account_url.rstrip('/')}/envelopes",
+        data=body,
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        },
+        timeout=CREATE_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()["envelopeId"]
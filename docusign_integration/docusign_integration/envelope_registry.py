@@ -0,0 +1,119 @@
+"""
+Registry of DocuSign envelopes.
+
+One DocuSign Envelope record per envelope, named by the envelope ID. It holds the
+document the envelope was sent for, the pool account that sent it, its current
+status and an append-only history of status events. Webhooks and downloads find
+their document and account with one primary-key read, instead of relying on the
+payload's custom fields or scanning contract tables.
+
+Sends (single and bulk) register envelopes as they are created. Webhooks append
+events, and also register envelopes sent before the registry existed, from their
+custom fields.
+"""
+
+import frappe
+from frappe.utils import now_datetime
+
+DOCTYPE = "DocuSign Envelope"
+EVENT_DOCTYPE = "DocuSign Envelope Event"
+FIELDS = ["name", "reference_doctype", "reference_name", "docusign_account", "status", "status_changed_on"]
+
+# Envelope statuses in lifecycle order. An envelope only moves forward, and the
+# final statuses (completed, declined, voided) are never left.
+STATUS_RANK = {
+    "created": 0,
+    "sent": 1,
+    "delivered": 2,
+    "signed": 3,
+    "completed": 4,
+    "declined": 4,
+    "voided": 4,
+}
+
+
+def get_envelope(envelope_id):
+    """
+    Registry entry of `envelope_id` as a frappe._dict, or None when it is not registered.
+    """
+    if not envelope_id:
+        return None
+    return frappe.db.get_value(DOCTYPE, envelope_id, FIELDS, as_dict=True)
+
+
+def status_advances(current, new):
+    """
+    Whether an envelope in status `current` may move to status `new`. Statuses
+    outside STATUS_RANK are always applied.
+    """
+    current_rank = STATUS_RANK.get((current or "").lower())
+    new_rank = STATUS_RANK.get((new or "").lower())
+    if current_rank is None or new_rank is None:
+        return True
+    return new_rank > current_rank
+
+
+def record_envelope(
+    envelope_id,
+    reference_doctype=None,
+    reference_name=None,
+    account=None,
+    status=None,
+    source=None,
+    event=None,
+    send_key=None,
+    update_status=True,
+):
+    """
+    Creates or updates the registry entry of `envelope_id`; a `status` is also
+    appended to its event history. Values that are not given are left as they are.
+
+    Args:
+        status (str): DocuSign envelope status, e.g. "sent" or "completed".
+        update_status (bool): False to only add `status` to the history, for
+            events that arrived out of order.
+        source (str): What reported the status: Send, Webhook, Bulk Send or Lookup.
+        event (str): DocuSign Connect event name, e.g. "envelope-completed".
+        send_key (str): Idempotency key of the send that created the envelope.
+    """
+    now = now_datetime()
+    values = {
+        "reference_doctype": reference_doctype,
+        "reference_name": reference_name,
+        "docusign_account": account,
+        "send_key": send_key,
+    }
+    values = {field: value for field, value in values.items() if value}
+    if status and update_status:
+        values.update(status=status.lower(), status_changed_on=now)
+
+    if frappe.db.exists(DOCTYPE, envelope_id):
+        if values:
+            frappe.db.set_value(DOCTYPE, envelope_id, values, update_modified=False)
+    else:
+        try:
+            frappe.get_doc({"doctype": DOCTYPE, "envelope_id": envelope_id, **values}).db_insert()
+        except frappe.DuplicateEntryError:
+            # Registered by a concurrent webhook or send in the meantime
+            frappe.db.set_value(DOCTYPE, envelope_id, values, update_modified=False)
+
+    if status:
+        _append_event(envelope_id, status, source, event, now)
+
+
+def _append_event(envelope_id, status, source, event, received_on):
+    # Events are only ever inserted, without loading and re-saving the whole history
+    frappe.get_doc(
+        {
+            "doctype": EVENT_DOCTYPE,
+            "parent": envelope_id,
+            "parenttype": DOCTYPE,
+            "parentfield": "events",
+            "idx": frappe.db.count(EVENT_DOCTYPE, {"parent": envelope_id, "parenttype": DOCTYPE}) + 1,
+            "status": status.lower(),
+            "source": source,
+            "event": event,
+            "received_on": received_on,
+        }
+    ).db_insert()
+
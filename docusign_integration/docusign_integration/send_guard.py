@@ -0,0 +1,111 @@
+"""
+Guards against sending the same document to DocuSign twice.
+
+A double click, a client retry or two users can start send_document_for_signature
+for one document at the same time. Each run would merge, upload and create its own
+live envelope. Sends of a document are serialized with a Redis lock, and a send
+that finds the document already sent returns that envelope instead:
+
+    in flight     a second call waits for the lock, then returns the envelope the
+                  first call created
+    sent          a later call returns the existing envelope without doing any
+                  work, unless it was declined or voided or `force` is passed
+
+Every send carries an idempotency key, the caller's or one derived from the
+document's last modification (which a successful send moves on). The key is
+stored with the envelope: in its custom fields, in the envelope registry, and
+mapped to the envelope ID in Redis as soon as DocuSign created it. A retry after
+a failure between creating the envelope and saving the document picks that
+envelope up instead of sending again.
+"""
+
+import hashlib
+from contextlib import contextmanager
+
+import frappe
+
+from docusign_integration.docusign_integration.envelope_registry import DOCTYPE as REGISTRY_DOCTYPE
+
+LOCK_KEY = "docusign_integration:send_lock:{}"
+ENVELOPE_KEY = "docusign_integration:send_envelope:{}"
+# Longest a send may hold the lock: merge, chunked upload and create_envelope
+LOCK_TIMEOUT = 10 * 60
+# Longest a second call waits for an in-flight send of the same document
+WAIT_TIMEOUT = 2 * 60
+KEY_TTL = 24 * 60 * 60
+# Envelopes in these states no longer count as sent
+RESEND_STATUSES = ("declined", "voided")
+
+
+class SendInProgress(frappe.ValidationError):
+    pass
+
+
+def get_idempotency_key(doc, idempotency_key=None):
+    """
+    `idempotency_key` when the caller passed one, else a key for `doc` as last modified.
+    """
+    if idempotency_key:
+        return str(idempotency_key)
+    return hashlib.sha256(f"{doc.doctype}\0{doc.name}\0{doc.modified}".encode()).hexdigest()[:32]
+
+
+@contextmanager
+def send_lock(doc):
+    """
+    Holds the send lock of `doc`, waiting up to WAIT_TIMEOUT for an in-flight send.
+    """
+    cache = frappe.cache()
+    lock = cache.lock(
+        cache.make_key(LOCK_KEY.format(f"{doc.doctype}:{doc.name}")),
+        timeout=LOCK_TIMEOUT,
+        blocking_timeout=WAIT_TIMEOUT,
+    )
+    if not lock.acquire():
+        frappe.throw(f"{doc.doctype} {doc.name} is still being sent to DocuSign, try again shortly", SendInProgress)
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def get_sent_envelope(doc, idempotency_key, force=False):
+    """
+    Envelope already created for this send of `doc`, as a dict with envelope_id and
+    account, or None when the document has to be sent.
+    """
+    sent = frappe.cache().get_value(ENVELOPE_KEY.format(idempotency_key))
+    if sent:
+        return sent
+
+    # The key outlives Redis in the envelope registry
+    registered = frappe.db.get_value(
+        REGISTRY_DOCTYPE, {"send_key": idempotency_key}, ["name", "docusign_account"], as_dict=True
+    )
+    if registered:
+        return {"envelope_id": registered.name, "account": registered.docusign_account}
+
+    if force or not has_live_envelope(doc):
+        return None
+    return {"envelope_id": doc.docusign_envelope_id, "account": doc.get("docusign_account")}
+
+
+def has_live_envelope(doc):
+    """
+    Whether `doc` (a document or a row with its docusign fields) was sent in an
+    envelope that was not declined or voided.
+    """
+    if not doc.get("docusign_envelope_id"):
+        return False
+    return (doc.get("docusign_status") or "").lower() not in RESEND_STATUSES
+
+
+def remember_envelope(idempotency_key, envelope_id, account_name):
+    """
+    Records that the send `idempotency_key` created `envelope_id`, before the document is saved.
+    """
+    frappe.cache().set_value(
+        ENVELOPE_KEY.format(idempotency_key),
+        {"envelope_id": envelope_id, "account": account_name},
+        expires_in_sec=KEY_TTL,
+    )
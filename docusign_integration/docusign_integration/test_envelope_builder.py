@@ -0,0 +1,70 @@
+# Copyright (c) 2026, nithin and Contributors
+# See license.txt
+
+import json
+from unittest.mock import MagicMock, patch
+
+import frappe
+from docusign_esign import ApiClient
+from docusign_esign.models import CustomFields, TextCustomField
+from frappe.tests.utils import FrappeTestCase
+
+from docusign_integration.docusign_integration.api import (
+	get_lean_envelope_for_signature,
+	get_merged_contract_for_signature,
+)
+
+API = "docusign_integration.docusign_integration.api"
+PDF = b"%PDF-1.4 merged contract \x00\xff"
+REMOTE_URL = "docusign://chunkeduploads/abc-123"
+SEND_ARGS = ("template-1", "account-1", MagicMock(), "token", "https://demo.docusign.net/restapi")
+
+
+class TestEnvelopeBuilder(FrappeTestCase):
+	def setUp(self):
+		self.doc = frappe._dict(
+			doctype="Contract",
+			name="CON-0001",
+			customer_email="customer@example.com",
+			customer_name='Customer "Quoted" Ltd',
+			supplier_email="supplier@example.com",
+			supplier_name="Supplier Ltd",
+		)
+
+	def test_inline_body_matches_sdk_envelope(self):
+		self.assert_same_body(chunked=False)
+
+	def test_chunked_body_matches_sdk_envelope(self):
+		body = self.assert_same_body(chunked=True)
+		self.assertEqual(body["documents"][0]["remoteUrl"], REMOTE_URL)
+		self.assertNotIn("documentBase64", body["documents"][0])
+
+	def assert_same_body(self, chunked):
+		backend = MagicMock()
+		backend.page_count.return_value = 3
+		with (
+			patch(f"{API}.create_merged_contract_pdf", return_value=PDF),
+			patch(f"{API}.get_pdf_backend", return_value=backend),
+			patch(f"{API}.needs_chunked_upload", return_value=chunked),
+			patch(f"{API}.upload_document", return_value=REMOTE_URL),
+			patch.object(frappe, "log_error"),
+		):
+			lean = json.loads(
+				get_lean_envelope_for_signature(self.doc, *SEND_ARGS, "account-a", "send-key-1")
+			)
+			envelope = get_merged_contract_for_signature(self.doc, *SEND_ARGS)
+
+		# The custom fields send_envelope adds to the SDK envelope
+		envelope.custom_fields = CustomFields(
+			text_custom_fields=[
+				TextCustomField(name=name, value=value, required="false", show="false")
+				for name, value in (
+					("frappe_doctype", self.doc.doctype),
+					("frappe_docname", self.doc.name),
+					("frappe_docusign_account", "account-a"),
+					("frappe_send_key", "send-key-1"),
+				)
+			]
+		)
+		self.assertEqual(lean, ApiClient().sanitize_for_serialization(envelope))
+		return lean
@@ -0,0 +1,174 @@
+"""
+Ordered, partitioned processing of DocuSign Connect events.
+
+handle_webhook only validates an event and appends it to one of `partitions`
+Redis lists, picked by a stable hash of the envelope ID, so all events of an
+envelope land in the same partition in arrival order. Each partition is drained
+by one background job at a time (a Redis lock per partition), oldest event first.
+Events of one envelope are applied in order, while partitions run in parallel on
+as many workers as there are.
+
+An event leaves its partition only after it was applied. A crashed drain applies
+it again, which the envelope status state machine (envelope_registry.status_advances)
+makes harmless: statuses never move backwards, so a late `sent` cannot overwrite
+`completed` either.
+
+DocuSign was already answered 200, so a failing event is not dropped. An event
+that fails unexpectedly (deadlock, lock wait timeout, ...) is rolled back and
+stays at the head of its partition, and the drain stops there, keeping the
+order of the events behind it. The next drain retries it. After `max_attempts`
+failures it is moved to a dead-letter list, which requeue_dead_letters puts
+back into the queue. Events rejected for good (e.g. their document does not
+exist) are logged by process_webhook_event and dropped.
+
+A per-minute scheduler job drains partitions whose drain job was lost or
+stopped at a failing event.
+
+Defaults are overridable via `docusign_webhook_queue` in site_config.json;
+`"enabled": 0` applies events inline in the webhook request again. Change
+`partitions` only while the queues are empty, or events of one envelope may end
+up in two partitions.
+"""
+
+import hashlib
+import json
+
+import frappe
+
+DEFAULTS = {
+    "enabled": 1,
+    "partitions": 8,
+    # Events read from Redis at a time; the drain lock is renewed after each batch
+    "drain_batch": 100,
+    # Failed applications of one event before it is moved to the dead-letter list
+    "max_attempts": 5,
+}
+
+QUEUE_KEY = "docusign_integration:webhook_queue:{}"
+DRAIN_LOCK_KEY = "docusign_integration:webhook_drain:{}"
+DRAIN_LOCK_TIMEOUT = 5 * 60
+DRAIN_JOB_ID = "docusign_integration_webhook_partition_{}"
+# Failed attempts of the event at the head of a partition
+ATTEMPTS_KEY = "docusign_integration:webhook_attempts:{}"
+DEAD_LETTER_KEY = "docusign_integration:webhook_dead_letter"
+
+
+def get_webhook_queue_config():
+    return {**DEFAULTS, **(frappe.conf.get("docusign_webhook_queue") or {})}
+
+
+def webhook_queue_enabled():
+    return bool(int(get_webhook_queue_config()["enabled"]))
+
+
+def partition_for(envelope_id, partitions):
+    """
+    Partition of `envelope_id`, the same in every process (unlike hash()).
+    """
+    digest = hashlib.blake2b(str(envelope_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % partitions
+
+
+def enqueue_webhook_event(envelope_id, data):
+    """
+    Appends a Connect event to its envelope's partition and makes sure that partition is drained.
+
+    Returns:
+        int: The partition.
+    """
+    partition = partition_for(envelope_id, int(get_webhook_queue_config()["partitions"]))
+    frappe.cache().rpush(QUEUE_KEY.format(partition), json.dumps(data))
+    frappe.enqueue(
+        "docusign_integration.docusign_integration.webhook_queue.drain_partition",
+        queue="short",
+        job_id=DRAIN_JOB_ID.format(partition),
+        deduplicate=True,
+        partition=partition,
+    )
+    return partition
+
+
+def drain_partition(partition):
+    """
+    Applies the queued events of `partition` in order until it is empty, or until
+    an event fails and has to be retried.
+
+    Returns:
+        int: Events taken off the partition, or None if another drain holds it.
+    """
+    from docusign_integration.docusign_integration.api import process_webhook_event
+
+    cache = frappe.cache()
+    lock = cache.lock(cache.make_key(DRAIN_LOCK_KEY.format(partition)), timeout=DRAIN_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return None
+
+    config = get_webhook_queue_config()
+    key = QUEUE_KEY.format(partition)
+    attempts_key = ATTEMPTS_KEY.format(partition)
+    batch = int(config["drain_batch"])
+    attempts = cache.get_value(attempts_key) or 0
+    applied = 0
+    try:
+        while events := cache.lrange(key, 0, batch - 1):
+            for event in events:
+                try:
+                    process_webhook_event(json.loads(event), raise_errors=True)
+                except Exception:
+                    # process_webhook_event rolled back already
+                    attempts += 1
+                    if attempts < int(config["max_attempts"]):
+                        cache.set_value(attempts_key, attempts)
+                        frappe.log_error(
+                            title=f"DocuSign webhook event failed (attempt {attempts}), will retry",
+                            message=frappe.get_traceback(),
+                        )
+                        # Keep it, and the events behind it, for the next drain
+                        return applied
+                    cache.rpush(DEAD_LETTER_KEY, event)
+                    frappe.log_error(
+                        title="DocuSign webhook event moved to the dead-letter list",
+                        message=frappe.get_traceback(),
+                    )
+                cache.ltrim(key, 1, -1)
+                applied += 1
+                if attempts:
+                    attempts = 0
+                    cache.delete_value(attempts_key)
+            # Still draining: keep other drains of this partition out
+            lock.reacquire()
+    finally:
+        lock.release()
+
+    return applied
+
+
+def drain_all_partitions():
+    """
+    Scheduler safety net: drains every partition that still has events.
+    """
+    cache = frappe.cache()
+    for partition in range(int(get_webhook_queue_config()["partitions"])):
+        if cache.llen(QUEUE_KEY.format(partition)):
+            drain_partition(partition)
+
+
+@frappe.whitelist()
+def requeue_dead_letters():
+    """
+    Puts the dead-lettered events back into their partitions, e.g. once the cause
+    of their failures is fixed.
+
+    Returns:
+        int: Events requeued.
+    """
+    frappe.only_for("System Manager")
+    from docusign_integration.docusign_integration.api import get_webhook_envelope_status
+
+    cache = frappe.cache()
+    requeued = 0
+    while event := cache.lpop(DEAD_LETTER_KEY):
+        data = json.loads(event)
+        enqueue_webhook_event(get_webhook_envelope_status(data)[0], data)
+        requeued += 1
+    return requeued
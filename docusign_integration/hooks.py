@@ -28,7 +28,8 @@ fixtures = [
         "filters": [
             ["name", "in", [
                 "Tariff Approval",
-                "Tariff Assignment Approval"
+                "Tariff Assignment Approval",
+                "Bulk Tariff Assignment Approval"
             ]]
         ]
     },
@@ -210,6 +211,40 @@ fixtures = [
 # 	],
 # }
 
+scheduler_events = {
+    "hourly_long": [
+        "docusign_integration.tariff.reconciliation.scheduled_reconciliation"
+    ],
+    "daily": [
+        "docusign_integration.tariff.outbox.clear_processed_entries",
+        "docusign_integration.tariff.mapping_index.scheduled_full_sync"
+    ],
+    "cron": {
+        # Safety net for outbox entries whose post-commit drain job was lost or backed off
+        "* * * * *": [
+            "docusign_integration.tariff.outbox.process_outbox",
+            # Same for DocuSign webhook partitions whose drain job was lost
+            "docusign_integration.docusign_integration.webhook_queue.drain_all_partitions"
+        ],
+        # Keep CMS reference lists warm so form loads never wait on the CMS
+        "*/10 * * * *": [
+            "docusign_integration.utils.cache.refresh_stale_reference_lists"
+        ],
+        # Mirror the CMS chargepoint catalogue into the local search index
+        "*/30 * * * *": [
+            "docusign_integration.tariff.chargepoint_index.scheduled_sync"
+        ],
+        # Pull tariff <-> connector mapping changes made directly in the CMS
+        "15,45 * * * *": [
+            "docusign_integration.tariff.mapping_index.scheduled_sync"
+        ],
+        # Write envelope IDs of DocuSign bulk sends back to their documents
+        "*/5 * * * *": [
+            "docusign_integration.docusign_integration.bulk_send.poll_bulk_sends"
+        ]
+    }
+}
+
 # Testing
 # -------
 
@@ -0,0 +1,31 @@
+import frappe
+from frappe.utils import now_datetime
+
+
+def execute():
+    """
+    Assign Tariff.charge_point used to hold the chargepoint display name and is now a
+    Link to CMS Chargepoint (named by the CMS identifier). Seed the index with the
+    chargepoints already referenced and repoint existing documents at them.
+    """
+    rows = frappe.get_all(
+        "Assign Tariff",
+        filters={"charge_point_name": ("is", "set")},
+        fields=["name", "charge_point", "charge_point_name"],
+    )
+
+    now = now_datetime()
+    for row in rows:
+        if not frappe.db.exists("CMS Chargepoint", row.charge_point_name):
+            frappe.get_doc({
+                "doctype": "CMS Chargepoint",
+                "identifier": row.charge_point_name,
+                "display_name": row.charge_point or row.charge_point_name,
+                "is_active": 1,
+                "last_synced_on": now,
+            }).insert(ignore_permissions=True)
+
+        if row.charge_point != row.charge_point_name:
+            frappe.db.set_value(
+                "Assign Tariff", row.name, "charge_point", row.charge_point_name, update_modified=False
+            )
@@ -1,36 +1,52 @@
 # your_doctype.py
-import frappe
-import requests
+import hashlib
 import json
 
+import frappe
+from frappe.utils import flt
+
+from docusign_integration.tariff.mapping_index import record_mappings
+from docusign_integration.tariff.tariff_lookup import resolve_connector_tariffs
+from docusign_integration.utils.cache import get_reference_list
+from docusign_integration.utils.circuit_breaker import get_session
+
 @frappe.whitelist()
 def fetch_chargepoint_list():
-    try:
-        docusign_settings = frappe.get_cached_doc(
-            'DocuSign Settings',
-            'DocuSign Settings'
+    """
+    Active chargepoints from the local CMS Chargepoint index.
+
+    The Assign Tariff form searches the index page by page; this full list is kept for API clients.
+    """
+    return [
+        {"name": cp.display_name, "identifier": cp.name}
+        for cp in frappe.get_all(
+            "CMS Chargepoint",
+            filters={"is_active": 1},
+            fields=["name", "display_name"],
+            order_by="display_name asc",
         )
+    ]
 
-        base_url = docusign_settings.cms_base_url.rstrip("/")
-        api_key = docusign_settings.cms_api_key
 
-        url = f"{base_url}/frapeencmsasset/chargepoint/get/cpDisplayName"
+def get_chargepoints_from_cms():
+    docusign_settings = frappe.get_cached_doc(
+        'DocuSign Settings',
+        'DocuSign Settings'
+    )
 
-        headers = {
-            "x-api-key": api_key,
-            "Accept": "application/json"
-        }
+    base_url = docusign_settings.cms_base_url.rstrip("/")
+    api_key = docusign_settings.cms_api_key
 
-        resp = requests.get(url, headers=headers, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
+    url = f"{base_url}/frapeencmsasset/chargepoint/get/cpDisplayName"
 
-    except requests.exceptions.RequestException as e:
-        frappe.log_error(
-            message=str(e),
-            title="ChargePoint fetch failed"
-        )
-        return []
+    headers = {
+        "x-api-key": api_key,
+        "Accept": "application/json"
+    }
+
+    resp = get_session("cms").hedged_get(url, "chargepoints", headers=headers, timeout=15)
+    resp.raise_for_status()
+    data = resp.json()
 
     # Expected structure:
     # data["Document"] = { "cp_name": "display_name", ... }
@@ -48,38 +64,38 @@ def fetch_chargepoint_list():
 
 @frappe.whitelist()
 def fetch_tax_list():
-    try:
-        docusign_settings = frappe.get_cached_doc(
-            'DocuSign Settings',
-            'DocuSign Settings'
-        )
+    """
+    Tax dropdown options, served from the reference cache.
+    """
+    return get_reference_list("taxes")
 
-        base_url = docusign_settings.cms_base_url.rstrip("/")
-        api_key = docusign_settings.cms_api_key
 
-        url = f"{base_url}/frapeetariff/api/fetch-tax?numotype=ocpp"
+def get_taxes_from_cms():
+    docusign_settings = frappe.get_cached_doc(
+        'DocuSign Settings',
+        'DocuSign Settings'
+    )
 
-        headers = {
-            "x-api-key": api_key,
-            "Accept": "application/json"
-        }
+    base_url = docusign_settings.cms_base_url.rstrip("/")
+    api_key = docusign_settings.cms_api_key
 
-        resp = requests.get(url, headers=headers, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
+    url = f"{base_url}/frapeetariff/api/fetch-tax?numotype=ocpp"
 
-    except requests.exceptions.RequestException as e:
-        frappe.log_error(
-            message=str(e),
-            title="Tax fetch failed"
-        )
-        return []
+    headers = {
+        "x-api-key": api_key,
+        "Accept": "application/json"
+    }
+
+    resp = get_session("cms").hedged_get(url, "taxes", headers=headers, timeout=15)
+    resp.raise_for_status()
+    data = resp.json()
 
     # ✅ RETURN NORMALIZED DATA
     return [
         {
             "name": tax.get("name"),             # shown in dropdown
-            "identifier": tax.get("identifier")  # stored value
+            "identifier": tax.get("identifier"),  # stored value
+            "rate": tax.get("rate")              # percentage, used by the cost estimator
         }
         for tax in data
         if tax.get("name") and tax.get("identifier")
@@ -92,46 +108,14 @@ def push_tariff_to_cms(tariff_doc):
             "DocuSign Settings"
         )
 
-        url = f"{settings.cms_base_url.rstrip('/')}/frapeetariff/api/tariff"
-
-        payload = {
-            "name": tariff_doc.tariff_name,
-            "taxId": tariff_doc.tax_identifier,
-            "currencyType": tariff_doc.currency,
-            "numotype": "ocpp",
-            "services": []
-        }
-
-        if tariff_doc.type == "Energy":
-            payload["services"].append({
-                "type": "energyInkWh",
-                "rate": tariff_doc.value
-            })
-
-        if tariff_doc.service_fee:
-            payload["services"].append({
-                "type": "serviceFee",
-                "rate": tariff_doc.service_fee
-            })
-
-        headers = {
-            "x-api-key": settings.cms_api_key,
-            "Content-Type": "application/json"
-        }
-
-        resp = requests.post(url, json=payload, headers=headers, timeout=15)
-        resp.raise_for_status()
-                # Extract the identifier from CMS response
+        payload = build_tariff_payload(tariff_doc)
+        resp_data = post_tariff_payload(settings, payload)
+        # Extract the identifier from CMS response
         frappe.log_error(
             title="Tariff CMS push response",
-            message=json.dumps(resp.json(), indent=2)
-        )        
-        cms_id = resp.json().get("identifier")
-
-        if cms_id:
-            tariff_doc.db_set("cms_tariff_id", cms_id)
-            tariff_doc.db_set("pushed_to_cms", 1)
-
+            message=json.dumps(resp_data, indent=2)
+        )
+        mark_tariff_pushed(tariff_doc, resp_data.get("identifier"), tariff_fingerprint(payload))
 
     except Exception as e:
         frappe.log_error(
@@ -141,6 +125,96 @@ def push_tariff_to_cms(tariff_doc):
         frappe.throw("Failed to push tariff to CMS. Check error logs.")
 
 
+def build_tariff_payload(tariff_doc):
+    """
+    CMS tariff payload for a Tariff document. Tariffs already known to the CMS carry
+    their identifier so the CMS updates them instead of creating a new one.
+    """
+    payload = {
+        "name": tariff_doc.tariff_name,
+        "taxId": tariff_doc.tax_identifier,
+        "currencyType": tariff_doc.currency,
+        "numotype": "ocpp",
+        "services": []
+    }
+
+    if tariff_doc.type == "Energy":
+        payload["services"].append({
+            "type": "energyInkWh",
+            "rate": tariff_doc.value
+        })
+
+    if tariff_doc.service_fee:
+        payload["services"].append({
+            "type": "serviceFee",
+            "rate": tariff_doc.service_fee
+        })
+
+    if tariff_doc.get("cms_tariff_id"):
+        payload["identifier"] = tariff_doc.cms_tariff_id
+
+    return payload
+
+
+def tariff_fingerprint(payload):
+    """
+    Stable hash of the fields the CMS stores for a tariff (name, taxId, currencyType
+    and energyInkWh/serviceFee services). Works on local payloads and on tariffs
+    returned by the CMS alike.
+    """
+    services = sorted(
+        (service.get("type"), flt(service.get("rate")))
+        for service in payload.get("services") or []
+        if service.get("type") in ("energyInkWh", "serviceFee")
+    )
+    canonical = {
+        "name": payload.get("name"),
+        "taxId": payload.get("taxId"),
+        "currencyType": payload.get("currencyType"),
+        "services": services,
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def tariff_needs_push(tariff_doc):
+    """
+    True when the tariff was never pushed or its CMS payload changed since the last push.
+    """
+    return (
+        not tariff_doc.get("pushed_to_cms")
+        or tariff_doc.get("cms_payload_hash") != tariff_fingerprint(build_tariff_payload(tariff_doc))
+    )
+
+
+def post_tariff_payload(settings, payload, session=None):
+    """
+    POSTs one tariff payload to the CMS and returns the decoded response. Raises on failure.
+    """
+    url = f"{settings.cms_base_url.rstrip('/')}/frapeetariff/api/tariff"
+
+    headers = {
+        "x-api-key": settings.cms_api_key,
+        "Content-Type": "application/json"
+    }
+
+    resp = (session or get_session("cms")).post(url, json=payload, headers=headers, timeout=15)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def mark_tariff_pushed(tariff_doc, cms_id, fingerprint):
+    """
+    Records a successful push in a single update.
+    """
+    cms_id = cms_id or tariff_doc.get("cms_tariff_id")
+    if cms_id:
+        tariff_doc.db_set({
+            "cms_tariff_id": cms_id,
+            "pushed_to_cms": 1,
+            "cms_payload_hash": fingerprint
+        })
+
+
 
 
 @frappe.whitelist()
@@ -150,26 +224,7 @@ def fetch_chargepoint_connectors(cp_id):
             "DocuSign Settings",
             "DocuSign Settings"
         )
-
-        base_url = settings.cms_base_url.rstrip("/")
-        api_key = settings.cms_api_key
-
-        url = f"{base_url}/frapeencmsasset/chargepoint/connectors"
-        params = {"cpId": cp_id}
-
-        headers = {
-            "x-api-key": api_key,
-            "Accept": "application/json"
-        }
-
-        resp = requests.get(
-            url,
-            headers=headers,
-            params=params,
-            timeout=15
-        )
-        resp.raise_for_status()
-        data = resp.json()
+        return request_chargepoint_connectors(settings.cms_base_url, settings.cms_api_key, cp_id)
 
     except Exception as e:
         frappe.log_error(
@@ -178,6 +233,25 @@ def fetch_chargepoint_connectors(cp_id):
         )
         return []
 
+
+def request_chargepoint_connectors(base_url, api_key, cp_id, session=None):
+    """
+    Connectors of one chargepoint straight from the CMS; raises on failure.
+
+    Makes no frappe calls when given a session, so it is safe to run from worker threads.
+    """
+    url = f"{base_url.rstrip('/')}/frapeencmsasset/chargepoint/connectors"
+    headers = {
+        "x-api-key": api_key,
+        "Accept": "application/json"
+    }
+
+    resp = (session or get_session("cms")).hedged_get(
+        url, "connectors", headers=headers, params={"cpId": cp_id}, timeout=15
+    )
+    resp.raise_for_status()
+    data = resp.json()
+
     # ✅ SAFE extraction
     document = data.get("Document") or []
 
@@ -191,8 +265,6 @@ def fetch_chargepoint_connectors(cp_id):
     ]
 
 
-
-
 @frappe.whitelist()
 def assign_tariff_to_cms(assign_tariff_name):
     """
@@ -212,17 +284,6 @@ def assign_tariff_to_cms(assign_tariff_name):
             "DocuSign Settings"
         )
 
-        base_url = settings.cms_base_url.rstrip("/")
-        api_key = settings.cms_api_key
-
-        url = f"{base_url}/frapeetariff/api/tariffChargePointMapping"
-
-        headers = {
-            "x-api-key": api_key,
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
-
         # 🔹 Load Assign Tariff document
         assign_tariff_doc = frappe.get_doc("Assign Tariff", assign_tariff_name)
 
@@ -231,6 +292,11 @@ def assign_tariff_to_cms(assign_tariff_name):
             message=f"Charge Point: {assign_tariff_doc.charge_point_name}"
         )
 
+        # 🔹 Tariffs may have been re-pushed or deactivated since the assignment was saved
+        errors = resolve_connector_tariffs(assign_tariff_doc.connectors)
+        if errors:
+            frappe.throw("\n".join(errors))
+
         tariff_mappings = []
 
         # 🔹 Loop connector table (CORRECT)
@@ -247,19 +313,7 @@ def assign_tariff_to_cms(assign_tariff_name):
         if not tariff_mappings:
             frappe.throw("No valid connector mappings found")
 
-        payload = {
-            "numotype": "ocpp",
-            "tariff": tariff_mappings
-        }
-
-        resp = requests.post(
-            url,
-            headers=headers,
-            json=payload,
-            timeout=20
-        )
-        resp.raise_for_status()
-        data = resp.json()
+        data = post_tariff_mappings(settings.cms_base_url, settings.cms_api_key, tariff_mappings)
 
     except Exception:
         frappe.log_error(
@@ -273,9 +327,36 @@ def assign_tariff_to_cms(assign_tariff_name):
 
     # ✅ Mark Assign Tariff as pushed
     assign_tariff_doc.db_set("pushed_to_cms", 1)
+    record_mappings(tariff_mappings, "Assign Tariff", assign_tariff_doc.name)
 
     return {
         "success": True,
         "message": "Tariff assigned to CMS successfully",
         "response": data
     }
+
+
+def post_tariff_mappings(base_url, api_key, tariff_mappings, session=None):
+    """
+    Posts tariff ↔ chargepoint connector mappings to the CMS; raises on failure.
+
+    Makes no frappe calls when given a session, so it is safe to run from worker threads.
+
+    Args:
+        tariff_mappings (list): Dicts with tariffId, chargePointId and connectorId.
+    """
+    resp = (session or get_session("cms")).post(
+        f"{base_url.rstrip('/')}/frapeetariff/api/tariffChargePointMapping",
+        headers={
+            "x-api-key": api_key,
+            "Accept": "application/json",
+            "Content-Type": "application/json"
+        },
+        json={
+            "numotype": "ocpp",
+            "tariff": tariff_mappings
+        },
+        timeout=20
+    )
+    resp.raise_for_status()
+    return resp.json()
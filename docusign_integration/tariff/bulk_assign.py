@@ -0,0 +1,188 @@
+"""
+Fleet-wide tariff assignment.
+
+A Bulk Assign Tariff document targets many chargepoints (picked one by one or by
+a name filter on the local chargepoint index) and goes through one approval.
+Once active, connectors are expanded from the cached connector index and the
+tariffChargePointMapping calls are sent in chunks of chargepoints, a bounded
+number of chunks at a time. Every chargepoint row records its own result, so a
+failed or interrupted run is resumed by re-running only the rows that are not
+Assigned yet.
+"""
+
+import frappe
+from frappe.utils import cint, now_datetime
+from redis.exceptions import LockError
+
+from docusign_integration.tariff.cms_client import CMSClient
+from docusign_integration.tariff.connector_index import get_connector_index
+from docusign_integration.tariff.mapping_index import record_mappings
+
+DOCTYPE = "Bulk Assign Tariff"
+ITEM_DOCTYPE = "Bulk Assign Tariff Item"
+
+DEFAULT_CHUNK_SIZE = 25
+DEFAULT_MAX_WORKERS = 4
+# Keep a runaway setting from opening hundreds of CMS connections
+MAX_WORKERS_LIMIT = 16
+RUN_LOCK_KEY = "docusign_integration:bulk_assign_tariff:{}"
+# Most chargepoints a name filter can match
+MAX_MATCHING_CHARGEPOINTS = 5000
+
+
+def run_bulk_assignment(name):
+    """
+    Assigns the tariff to every chargepoint row that is not Assigned yet.
+
+    Returns:
+        dict: Counts of assigned and failed chargepoints in this run, or None if the
+        document is already being processed.
+    """
+    cache = frappe.cache()
+    lock = cache.lock(cache.make_key(RUN_LOCK_KEY.format(name)), timeout=60 * 60)
+    if not lock.acquire(blocking=False):
+        return None
+
+    try:
+        doc = frappe.get_doc(DOCTYPE, name)
+        doc.db_set({"run_status": "Running", "last_run_on": now_datetime()})
+        frappe.db.commit()
+
+        result = _run(doc)
+
+        counts = _result_counts(name)
+        doc.db_set({
+            "assigned_count": counts.get("Assigned", 0),
+            "failed_count": counts.get("Failed", 0),
+            "run_status": "Completed with Errors" if counts.get("Failed") or counts.get("Pending") else "Completed",
+        })
+        frappe.db.commit()
+        return result
+    except Exception:
+        frappe.db.rollback()
+        frappe.db.set_value(DOCTYPE, name, "run_status", "Completed with Errors")
+        frappe.db.commit()
+        frappe.log_error(title=f"Bulk tariff assignment failed: {name}", message=frappe.get_traceback())
+        raise
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # The run outlived the lock; its result above still stands
+            pass
+
+
+def _run(doc):
+    result = {"assigned": 0, "failed": 0}
+    rows = [row for row in doc.chargepoints if row.result != "Assigned"]
+    if not rows:
+        return result
+
+    tariff_id = frappe.db.get_value("Tariff", doc.tariff, "cms_tariff_id")
+    if not tariff_id:
+        frappe.throw(f"Tariff {doc.tariff} has not been pushed to the CMS yet")
+
+    max_workers = min(cint(doc.max_workers) or DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT)
+    chunk_size = cint(doc.chunk_size) or DEFAULT_CHUNK_SIZE
+
+    index, errors = get_connector_index([row.charge_point for row in rows], max_workers=max_workers)
+
+    ready = []
+    for row in rows:
+        if row.charge_point in errors:
+            _record(row, "Failed", error=f"Connector lookup failed: {errors[row.charge_point]}")
+            result["failed"] += 1
+        elif not index.get(row.charge_point):
+            _record(row, "Failed", error="No connectors found")
+            result["failed"] += 1
+        else:
+            ready.append(row)
+    frappe.db.commit()
+
+    chunks = {}
+    for start in range(0, len(ready), chunk_size):
+        chunk = ready[start:start + chunk_size]
+        chunks[start] = [
+            {"tariffId": tariff_id, "chargePointId": row.charge_point, "connectorId": connector}
+            for row in chunk
+            for connector in index[row.charge_point]
+        ]
+
+    def on_done(start, response, error):
+        # Runs on this thread as each chunk finishes; committed per chunk so a crash loses nothing
+        chunk = ready[start:start + chunk_size]
+        for row in chunk:
+            _record(row, "Failed" if error else "Assigned", connectors=index[row.charge_point], error=error)
+        if error:
+            result["failed"] += len(chunk)
+        else:
+            record_mappings(chunks[start], DOCTYPE, doc.name)
+            result["assigned"] += len(chunk)
+        frappe.db.commit()
+
+    with CMSClient.from_settings(max_concurrency=max_workers) as client:
+        client.post_mappings(chunks, on_done=on_done)
+
+    return result
+
+
+def _record(row, status, connectors=None, error=None):
+    values = {"result": status, "error": error, "processed_on": now_datetime()}
+    if connectors is not None:
+        values["connectors"] = ", ".join(str(c) for c in connectors)
+    frappe.db.set_value(ITEM_DOCTYPE, row.name, values, update_modified=False)
+
+
+def _result_counts(name):
+    rows = frappe.get_all(
+        ITEM_DOCTYPE,
+        filters={"parent": name, "parenttype": DOCTYPE},
+        fields=["result", "count(name) as count"],
+        group_by="result",
+    )
+    return {row.result: row.count for row in rows}
+
+
+def enqueue_bulk_assignment(name):
+    frappe.db.set_value(DOCTYPE, name, "run_status", "Queued")
+    frappe.enqueue(
+        "docusign_integration.tariff.bulk_assign.run_bulk_assignment",
+        queue="long",
+        timeout=60 * 60,
+        name=name,
+        enqueue_after_commit=True,
+        job_id=f"docusign_integration_bulk_assign_{name}",
+        deduplicate=True,
+    )
+
+
+@frappe.whitelist()
+def resume_bulk_assignment(name):
+    """
+    Re-runs the chargepoints of an active bulk assignment that are not Assigned yet.
+    """
+    frappe.only_for(("System Manager", "Tariff Admin"))
+
+    doc = frappe.get_doc(DOCTYPE, name)
+    if doc.docstatus != 1 or doc.status != "Active":
+        frappe.throw("Only active bulk assignments can be resumed")
+    enqueue_bulk_assignment(name)
+    return {"queued": True}
+
+
+@frappe.whitelist()
+def get_matching_chargepoints(pattern, limit=MAX_MATCHING_CHARGEPOINTS):
+    """
+    Active chargepoints in the local index whose display name or identifier matches
+    `pattern` (SQL LIKE syntax, e.g. "BLR-%"), as far as the user may read them.
+    """
+    if not pattern:
+        return []
+    return frappe.get_list(
+        "CMS Chargepoint",
+        filters={"is_active": 1},
+        or_filters={"display_name": ("like", pattern), "name": ("like", pattern)},
+        fields=["name", "display_name"],
+        order_by="display_name asc",
+        limit_page_length=min(cint(limit) or MAX_MATCHING_CHARGEPOINTS, MAX_MATCHING_CHARGEPOINTS),
+    )
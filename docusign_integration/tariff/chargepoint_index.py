@@ -0,0 +1,122 @@
+"""
+Local index of CMS chargepoints.
+
+The CMS only offers the full `cpDisplayName` catalogue, so instead of shipping it
+to every Assign Tariff form it is mirrored into the CMS Chargepoint doctype and
+searched server-side, a page at a time.
+"""
+
+import frappe
+from frappe.utils import cint, now_datetime
+
+from docusign_integration.tariff.api import get_chargepoints_from_cms
+
+DOCTYPE = "CMS Chargepoint"
+BATCH_SIZE = 1000
+# Largest page a link-field search may ask for
+MAX_SEARCH_PAGE_LENGTH = 100
+
+
+def sync_chargepoint_index():
+    """
+    Mirrors the CMS chargepoint catalogue into CMS Chargepoint.
+
+    Only differences are written: new chargepoints are bulk inserted, renamed or
+    reappearing ones are updated and chargepoints missing from the CMS are marked
+    inactive (not deleted, since Assign Tariff documents link to them).
+
+    Returns:
+        dict: Counts of inserted, updated and deactivated chargepoints.
+    """
+    remote = {cp["identifier"]: cp["name"] for cp in get_chargepoints_from_cms() if cp.get("identifier")}
+    local = {
+        row.name: row
+        for row in frappe.get_all(DOCTYPE, fields=["name", "display_name", "is_active"])
+    }
+    now = now_datetime()
+
+    to_insert = [identifier for identifier in remote if identifier not in local]
+    to_update = [
+        identifier
+        for identifier, display_name in remote.items()
+        if identifier in local
+        and (local[identifier].display_name != display_name or not local[identifier].is_active)
+    ]
+    to_deactivate = [name for name, row in local.items() if row.is_active and name not in remote]
+
+    user = frappe.session.user
+    for start in range(0, len(to_insert), BATCH_SIZE):
+        frappe.db.bulk_insert(
+            DOCTYPE,
+            fields=["name", "identifier", "display_name", "is_active", "last_synced_on",
+                    "creation", "modified", "owner", "modified_by", "docstatus"],
+            values=[
+                (identifier, identifier, remote[identifier], 1, now, now, now, user, user, 0)
+                for identifier in to_insert[start:start + BATCH_SIZE]
+            ],
+            ignore_duplicates=True,
+        )
+
+    for identifier in to_update:
+        frappe.db.set_value(
+            DOCTYPE,
+            identifier,
+            {"display_name": remote[identifier], "is_active": 1, "last_synced_on": now},
+        )
+
+    for start in range(0, len(to_deactivate), BATCH_SIZE):
+        frappe.db.set_value(
+            DOCTYPE,
+            {"name": ("in", to_deactivate[start:start + BATCH_SIZE])},
+            {"is_active": 0, "last_synced_on": now},
+        )
+
+    frappe.db.commit()
+
+    return {"inserted": len(to_insert), "updated": len(to_update), "deactivated": len(to_deactivate)}
+
+
+def scheduled_sync():
+    """
+    Scheduler entry point; failures are logged and retried on the next run.
+    """
+    try:
+        sync_chargepoint_index()
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(title="ChargePoint index sync failed", message=frappe.get_traceback())
+
+
+@frappe.whitelist()
+def enqueue_chargepoint_sync():
+    """
+    Triggers a background sync from the Assign Tariff form.
+    """
+    frappe.only_for(("System Manager", "Tariff Admin"))
+    frappe.enqueue(
+        "docusign_integration.tariff.chargepoint_index.scheduled_sync",
+        queue="long",
+        job_id="docusign_integration_chargepoint_sync",
+        deduplicate=True,
+    )
+    return {"queued": True}
+
+
+@frappe.whitelist()
+@frappe.validate_and_sanitize_search_inputs
+def search_chargepoints(doctype, txt, searchfield, start, page_len, filters):
+    """
+    Link-field query for CMS Chargepoint: active chargepoints whose display name or
+    identifier contains `txt`, one page at a time, as far as the user may read them.
+    """
+    txt = f"%{txt}%"
+    return frappe.get_list(
+        DOCTYPE,
+        filters={"is_active": 1},
+        or_filters={"display_name": ("like", txt), "name": ("like", txt)},
+        fields=["name", "display_name"],
+        order_by="display_name asc",
+        start=cint(start),
+        page_length=min(cint(page_len) or MAX_SEARCH_PAGE_LENGTH, MAX_SEARCH_PAGE_LENGTH),
+        as_list=True,
+    )
@@ -0,0 +1,180 @@
+"""
+Concurrent CMS client for operations that touch many chargepoints or tariffs.
+
+The helpers in tariff/api.py make one sequential request each. CMSClient runs
+them on a thread pool over one pooled, circuit-broken session, with a per-host cap on
+in-flight requests shared by every client in the process, so a batch takes
+roughly N / concurrency round trips instead of N.
+
+Batch calls never raise for individual items: they return a BatchResult with the
+successful results and the errors, both keyed by the input item. Worker threads
+only do HTTP; build the client and handle results on the calling thread.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import frappe
+
+from docusign_integration.tariff.api import (
+    post_tariff_mappings,
+    post_tariff_payload,
+    request_chargepoint_connectors,
+)
+from docusign_integration.utils.circuit_breaker import CircuitBreaker, GuardedSession
+
+DEFAULT_MAX_CONCURRENCY = 8
+# Most chargepoints fetch_connectors_batch looks up per call
+MAX_CONNECTOR_BATCH = 200
+
+_host_limits = {}
+_host_limits_lock = threading.Lock()
+
+
+class BatchResult:
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def as_dict(self):
+        return {"results": self.results, "errors": self.errors}
+
+
+class CMSClient:
+    """
+    Args:
+        base_url (str): CMS base URL.
+        api_key (str): CMS x-api-key.
+        max_concurrency (int): Worker threads for this client. In-flight requests to
+            one CMS host are also capped process-wide, at the limit of the first
+            client created for that host.
+    """
+
+    def __init__(self, base_url, api_key, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        # Shape expected by the tariff/api.py helpers that take the settings doc
+        self._settings = frappe._dict(cms_base_url=self.base_url, cms_api_key=api_key)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._slots = _host_semaphore(urlparse(self.base_url).netloc, self.max_concurrency)
+
+        # Circuit breaker + bulkhead + default timeouts; keys are resolved here, on the calling thread
+        self.session = GuardedSession(CircuitBreaker("cms"), pool_maxsize=self.max_concurrency)
+
+    @classmethod
+    def from_settings(cls, max_concurrency=None):
+        settings = frappe.get_cached_doc("DocuSign Settings", "DocuSign Settings")
+        return cls(
+            settings.cms_base_url,
+            settings.cms_api_key,
+            max_concurrency or frappe.conf.get("cms_max_concurrency") or DEFAULT_MAX_CONCURRENCY,
+        )
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def map(self, fn, items, on_done=None):
+        """
+        Runs fn(item) for every item, at most max_concurrency at a time.
+
+        Args:
+            on_done (callable, optional): on_done(item, result, error), called on the
+                calling thread as each item finishes - e.g. to commit progress.
+
+        Returns:
+            BatchResult keyed by item (items must be hashable).
+        """
+        batch = BatchResult()
+        items = list(dict.fromkeys(items))
+        if not items:
+            return batch
+
+        def call(item):
+            with self._slots:
+                return fn(item)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(items))) as executor:
+            futures = {executor.submit(call, item): item for item in items}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    batch.results[item] = future.result()
+                except Exception as e:
+                    batch.errors[item] = str(e)
+                if on_done:
+                    on_done(item, batch.results.get(item), batch.errors.get(item))
+        return batch
+
+    def fetch_connectors(self, cp_ids):
+        """
+        Connectors of many chargepoints: results are {cp_id: [{"connector_number": ...}]}.
+        """
+        return self.map(
+            lambda cp_id: request_chargepoint_connectors(self.base_url, self.api_key, cp_id, self.session),
+            cp_ids,
+        )
+
+    def push_tariffs(self, payloads, on_done=None):
+        """
+        Pushes many tariff payloads.
+
+        Args:
+            payloads (dict): key -> payload from build_tariff_payload.
+
+        Returns:
+            BatchResult keyed like `payloads`, with the CMS responses as results.
+        """
+        return self.map(
+            lambda key: post_tariff_payload(self._settings, payloads[key], self.session), payloads, on_done
+        )
+
+    def post_mappings(self, chunks, on_done=None):
+        """
+        Posts many tariffChargePointMapping chunks.
+
+        Args:
+            chunks (dict): key -> list of tariffId/chargePointId/connectorId dicts.
+        """
+        return self.map(
+            lambda key: post_tariff_mappings(self.base_url, self.api_key, chunks[key], self.session),
+            chunks,
+            on_done,
+        )
+
+
+def _host_semaphore(host, limit):
+    with _host_limits_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(limit)
+        return _host_limits[host]
+
+
+@frappe.whitelist()
+def fetch_connectors_batch(cp_ids):
+    """
+    Connectors for many chargepoints in one call.
+
+    Args:
+        cp_ids (list | str): Chargepoint identifiers (JSON list from the client).
+
+    Returns:
+        dict: {"results": {cp_id: [...]}, "errors": {cp_id: message}}
+    """
+    frappe.only_for(("System Manager", "Tariff Admin"))
+
+    cp_ids = frappe.parse_json(cp_ids) if isinstance(cp_ids, str) else cp_ids
+    if len(cp_ids) > MAX_CONNECTOR_BATCH:
+        frappe.throw(f"At most {MAX_CONNECTOR_BATCH} chargepoints can be looked up at once")
+    with CMSClient.from_settings() as client:
+        return client.fetch_connectors(cp_ids).as_dict()
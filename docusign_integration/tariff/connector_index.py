@@ -0,0 +1,54 @@
+"""
+Cached index of chargepoint connectors.
+
+Connector layouts almost never change, so bulk operations read them from Redis
+and only ask the CMS for chargepoints that are missing from the cache. Misses are
+fetched concurrently through CMSClient.
+"""
+
+import frappe
+
+from docusign_integration.tariff.cms_client import CMSClient
+
+CACHE_KEY = "docusign_integration:connectors:{}"
+CACHE_TTL_SECONDS = 6 * 60 * 60
+DEFAULT_MAX_WORKERS = 8
+
+
+def get_connector_index(cp_ids, max_workers=DEFAULT_MAX_WORKERS, refresh=False):
+    """
+    Connector numbers for many chargepoints.
+
+    Args:
+        cp_ids (list): CMS chargepoint identifiers.
+        max_workers (int): Concurrent CMS requests for cache misses.
+        refresh (bool): Ignore cached entries.
+
+    Returns:
+        tuple: ({cp_id: [connector_number, ...]}, {cp_id: error message}) -
+        chargepoints that could not be fetched are only in the second dict.
+    """
+    cache = frappe.cache()
+    index = {}
+    if not refresh:
+        for cp_id in cp_ids:
+            cached = cache.get_value(CACHE_KEY.format(cp_id))
+            if cached is not None:
+                index[cp_id] = cached
+
+    misses = [cp_id for cp_id in cp_ids if cp_id not in index]
+    if not misses:
+        return index, {}
+
+    with CMSClient.from_settings(max_concurrency=max_workers) as client:
+        batch = client.fetch_connectors(misses)
+
+    for cp_id, connectors in batch.results.items():
+        index[cp_id] = [c["connector_number"] for c in connectors]
+        cache.set_value(CACHE_KEY.format(cp_id), index[cp_id], expires_in_sec=CACHE_TTL_SECONDS)
+
+    return index, batch.errors
+
+
+def invalidate_connectors(cp_id):
+    frappe.cache().delete_value(CACHE_KEY.format(cp_id))
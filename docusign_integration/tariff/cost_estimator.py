@@ -0,0 +1,207 @@
+"""
+Charging-session cost estimation from Tariff documents.
+
+Costs are computed with NumPy over whole arrays of sessions, so previewing the
+revenue impact of a tariff change over millions of historical sessions takes
+seconds:
+
+    energy      = rate × kWh              (Energy tariffs)
+                  rate × minutes          (Duration tariffs)
+    service_fee = flat fee per session
+    tax         = (energy + service_fee) × tax rate
+    total       = energy + service_fee + tax
+
+Amounts are rounded per session, as they would be on an invoice, before they are
+summed. Sessions are read from a CSV with `kwh`, `connector_id` and (for Duration
+tariffs) `duration_minutes` columns, or passed in as arrays.
+"""
+
+import time
+
+import frappe
+import numpy as np
+from frappe.utils import flt
+
+from docusign_integration.utils.cache import get_reference_list
+
+TARIFF_FIELDS = ["name", "tariff_name", "type", "value", "service_fee", "currency", "tax_identifier"]
+# Per-connector breakdowns returned by the API are limited to the highest-revenue connectors
+DEFAULT_TOP_CONNECTORS = 50
+
+
+def load_tariff_rates(tariffs, tax_rates=None):
+    """
+    Rates of the given Tariff documents, read in one query.
+
+    Args:
+        tariffs (list): Tariff names.
+        tax_rates (dict, optional): tax_identifier -> percentage; overrides the CMS tax list.
+
+    Returns:
+        dict: tariff name -> dict with type, value, service_fee, tax_rate (fraction), currency.
+    """
+    rows = frappe.get_all("Tariff", filters={"name": ("in", list(tariffs))}, fields=TARIFF_FIELDS)
+    missing = set(tariffs) - {row.name for row in rows}
+    if missing:
+        frappe.throw(f"Tariff not found: {', '.join(sorted(missing))}")
+
+    known_rates = {tax["identifier"]: tax.get("rate") for tax in get_reference_list("taxes")}
+    known_rates.update(tax_rates or {})
+
+    return {
+        row.name: {
+            "type": row.type or "Energy",
+            "value": flt(row.value),
+            "service_fee": flt(row.service_fee),
+            "tax_rate": flt(known_rates.get(row.tax_identifier)) / 100,
+            "tax_known": known_rates.get(row.tax_identifier) is not None or not row.tax_identifier,
+            "currency": row.currency,
+        }
+        for row in rows
+    }
+
+
+def estimate_session_costs(rates, kwh, duration_minutes=None, precision=2):
+    """
+    Per-session cost arrays for one tariff.
+
+    Args:
+        rates (dict): One entry of load_tariff_rates().
+        kwh (np.ndarray): Energy per session.
+        duration_minutes (np.ndarray, optional): Required for Duration tariffs.
+
+    Returns:
+        dict of np.ndarray: energy, service_fee, tax, total.
+    """
+    kwh = np.asarray(kwh, dtype=np.float64)
+
+    if rates["type"] == "Duration":
+        if duration_minutes is None:
+            frappe.throw("Duration tariffs need session durations")
+        usage = np.asarray(duration_minutes, dtype=np.float64)
+    else:
+        usage = kwh
+
+    energy = np.round(usage * rates["value"], precision)
+    service_fee = np.full(kwh.shape, round(rates["service_fee"], precision))
+    tax = np.round((energy + service_fee) * rates["tax_rate"], precision)
+
+    return {"energy": energy, "service_fee": service_fee, "tax": tax, "total": energy + service_fee + tax}
+
+
+def estimate_costs(tariffs, kwh, connector_ids=None, duration_minutes=None, tax_rates=None,
+                   top_connectors=DEFAULT_TOP_CONNECTORS):
+    """
+    Totals, and per-connector totals, for the same sessions under each tariff.
+
+    Args:
+        tariffs (list): Tariff names to compare.
+        kwh (array-like): Energy per session.
+        connector_ids (array-like, optional): Connector of each session, e.g. "CP-123:2".
+        duration_minutes (array-like, optional): Session durations.
+        tax_rates (dict, optional): tax_identifier -> percentage overrides.
+        top_connectors (int): Connectors listed per tariff, highest total first; 0 for all.
+
+    Returns:
+        dict: sessions, elapsed_ms and a summary per tariff.
+    """
+    started = time.perf_counter()
+    kwh = np.asarray(kwh, dtype=np.float64)
+    durations = None if duration_minutes is None else np.asarray(duration_minutes, dtype=np.float64)
+
+    connectors = inverse = None
+    if connector_ids is not None:
+        # Group once; every tariff then reuses the same integer connector codes
+        connectors, inverse = np.unique(np.asarray(connector_ids).astype(str), return_inverse=True)
+
+    result = {"sessions": int(kwh.size), "tariffs": {}}
+    for name, rates in load_tariff_rates(tariffs, tax_rates).items():
+        costs = estimate_session_costs(rates, kwh, durations)
+        summary = {
+            "currency": rates["currency"],
+            "tax_rate_known": rates["tax_known"],
+            **{key: round(float(values.sum()), 2) for key, values in costs.items()},
+        }
+
+        if connectors is not None:
+            per_connector = np.bincount(inverse, weights=costs["total"], minlength=connectors.size)
+            order = np.argsort(per_connector)[::-1]
+            if top_connectors:
+                order = order[:int(top_connectors)]
+            summary["connectors"] = [
+                {"connector": str(connectors[i]), "total": round(float(per_connector[i]), 2)} for i in order
+            ]
+
+        result["tariffs"][name] = summary
+
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def load_sessions_csv(path):
+    """
+    Reads kwh, connector_id and optional duration_minutes columns from a CSV file.
+
+    Returns:
+        tuple: (kwh, connector_ids or None, duration_minutes or None) as NumPy arrays.
+    """
+    data = np.genfromtxt(path, delimiter=",", names=True, dtype=None, encoding="utf-8", autostrip=True)
+    columns = data.dtype.names or ()
+    if "kwh" not in columns:
+        frappe.throw("Sessions CSV needs a kwh column")
+
+    return (
+        np.atleast_1d(data["kwh"]).astype(np.float64),
+        np.atleast_1d(data["connector_id"]).astype(str) if "connector_id" in columns else None,
+        np.atleast_1d(data["duration_minutes"]).astype(np.float64) if "duration_minutes" in columns else None,
+    )
+
+
+def synthetic_sessions(count, connectors=1000, seed=0):
+    """
+    Random but plausible sessions for previews and benchmarks.
+    """
+    rng = np.random.default_rng(seed)
+    kwh = rng.gamma(shape=2.0, scale=12.0, size=count).round(3)
+    durations = (kwh / rng.uniform(3.3, 50, size=count) * 60).round(1)
+    connector_ids = np.char.add("CP-", rng.integers(0, connectors, size=count).astype(str))
+    return kwh, connector_ids, durations
+
+
+@frappe.whitelist()
+def estimate_tariff_costs(tariffs, file_url=None, kwh=None, connector_ids=None, duration_minutes=None,
+                          tax_rates=None, top_connectors=DEFAULT_TOP_CONNECTORS):
+    """
+    Previews what one or more tariffs would charge for a set of sessions.
+
+    Sessions come from an uploaded CSV (`file_url`) or from JSON arrays.
+
+    Args:
+        tariffs (list | str): Tariff names (JSON list from the client).
+        file_url (str, optional): File with kwh, connector_id and duration_minutes columns.
+        kwh, connector_ids, duration_minutes (list | str, optional): Session arrays.
+        tax_rates (dict | str, optional): tax_identifier -> percentage overrides.
+    """
+    frappe.only_for(("System Manager", "Tariff Admin", "Tariff Approver"))
+
+    if isinstance(tariffs, str):
+        tariffs = frappe.parse_json(tariffs) if tariffs.lstrip().startswith("[") else [tariffs]
+
+    if file_url:
+        path = frappe.get_doc("File", {"file_url": file_url}).get_full_path()
+        kwh, connector_ids, duration_minutes = load_sessions_csv(path)
+    elif kwh is not None:
+        kwh = frappe.parse_json(kwh)
+        connector_ids = frappe.parse_json(connector_ids) if connector_ids else None
+        duration_minutes = frappe.parse_json(duration_minutes) if duration_minutes else None
+    else:
+        frappe.throw("Pass a sessions file or kwh values")
+
+    return estimate_costs(
+        tariffs,
+        kwh,
+        connector_ids=connector_ids,
+        duration_minutes=duration_minutes,
+        tax_rates=frappe.parse_json(tax_rates) if tax_rates else None,
+        top_connectors=top_connectors,
+    )
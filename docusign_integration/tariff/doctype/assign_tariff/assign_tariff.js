@@ -2,18 +2,21 @@ console.log("=== ASSIGN TARIFF JS FILE LOADED ===");
 
 frappe.ui.form.on('Assign Tariff', {
     setup(frm) {
-        frm.chargepoints_loaded = false;
-
-        // ✅ Show only Active tariffs
-
+        // ✅ Search the local chargepoint index page by page instead of loading the whole fleet
+        frm.set_query('charge_point', function() {
+            return {
+                query: 'docusign_integration.tariff.chargepoint_index.search_chargepoints'
+            };
+        });
     },
 
     refresh(frm) {
-        if (!frm.chargepoints_loaded) {
-            load_chargepoints(frm);
+        if (frappe.user.has_role(['System Manager', 'Tariff Admin'])) {
+            frm.add_custom_button(__('Sync Charge Points'), () => sync_chargepoints());
         }
         hide_grid_buttons(frm);
         set_tariff_filter(frm);
+        check_stale_tariffs(frm);
     },
       
     onload: function(frm) {
@@ -26,21 +29,11 @@ frappe.ui.form.on('Assign Tariff', {
     charge_point(frm) {
         console.log('Charge point changed:', frm.doc.charge_point);
 
-        // clear dependent fields
-        frm.set_value('charge_point_name', null);
+        // charge_point links to CMS Chargepoint, which is named by the CMS identifier
+        frm.set_value('charge_point_name', frm.doc.charge_point || null);
 
         if (!frm.doc.charge_point) return;
 
-        // set charge point name
-        if (frm.chargepoint_list) {
-            const selected = frm.chargepoint_list.find(
-                cp => cp.name === frm.doc.charge_point
-            );
-            if (selected?.identifier) {
-                frm.set_value('charge_point_name', selected.identifier);
-            }
-        }
-
         // 🔥 Fetch connectors
         fetch_connectors(frm);
     }
@@ -52,20 +45,8 @@ frappe.ui.form.on('Assign Tariff Connector', {
         let row = locals[cdt][cdn];
         
         if (row.tariff) {
-            // Fetch cms_tariff_id from the selected Tariff
-            frappe.db.get_value('Tariff', row.tariff, ['cms_tariff_id', 'status'], function(r) {
-                if (r) {
-                    // Check if tariff is active
-                    if (r.status !== 'Active') {
-                        frappe.model.set_value(cdt, cdn, 'tariff', '');
-                        frappe.throw(__('Please select a tariff with Active status'));
-                        return;
-                    }
-                    
-                    // Store cms_tariff_id in the child table row
-                    frappe.model.set_value(cdt, cdn, 'cms_tariff_id', r.cms_tariff_id);
-                }
-            });
+            // Resolved together with every other row changed in the same tick
+            queue_tariff_resolution(frm, cdn);
             
             // Auto-close the row after selection (optional)
             let grid_row = frm.fields_dict.connectors.grid.grid_rows_by_docname[cdn];
@@ -74,6 +55,8 @@ frappe.ui.form.on('Assign Tariff Connector', {
                     grid_row.toggle_view(false);
                 }, 300);
             }
+        } else {
+            frappe.model.set_value(cdt, cdn, 'cms_tariff_id', '');
         }
     },
     form_render: function(frm, cdt, cdn) {
@@ -89,25 +72,71 @@ frappe.ui.form.on('Assign Tariff Connector', {
 });
 
 
-function load_chargepoints(frm) {
-    if (frm.loading_chargepoints) return;
+// Connector rows whose tariff changed and still need its CMS ID, flushed in one call
+let pending_tariff_rows = [];
 
-    frm.loading_chargepoints = true;
+function queue_tariff_resolution(frm, cdn) {
+    pending_tariff_rows.push(cdn);
+    if (pending_tariff_rows.length > 1) return;
 
-    frappe.call({
-        method: "docusign_integration.tariff.api.fetch_chargepoint_list",
-        callback(r) {
-            frm.loading_chargepoints = false;
+    setTimeout(() => {
+        let cdns = pending_tariff_rows;
+        pending_tariff_rows = [];
+        let rows = cdns.map(name => locals['Assign Tariff Connector'][name]).filter(row => row && row.tariff);
+
+        get_tariff_details(rows.map(row => row.tariff)).then(tariffs => {
+            let rejected = [];
+            rows.forEach(row => {
+                let tariff = tariffs[row.tariff];
+                if (!tariff || tariff.status !== 'Active') {
+                    rejected.push(row.tariff);
+                    frappe.model.set_value(row.doctype, row.name, 'tariff', '');
+                    return;
+                }
+                // Store cms_tariff_id in the child table row
+                frappe.model.set_value(row.doctype, row.name, 'cms_tariff_id', tariff.cms_tariff_id);
+            });
+            if (rejected.length) {
+                frappe.msgprint(__('Please select a tariff with Active status: {0}', [rejected.join(', ')]));
+            }
+        });
+    }, 0);
+}
+
+function check_stale_tariffs(frm) {
+    // Saved rows are re-resolved on the server when saving; flag stale ones up front
+    let rows = (frm.doc.connectors || []).filter(row => row.tariff);
+    if (frm.is_new() || !rows.length) return;
 
-            if (Array.isArray(r.message)) {
-                frm.chargepoint_list = r.message;
+    get_tariff_details(rows.map(row => row.tariff)).then(tariffs => {
+        let stale = rows.filter(row => {
+            let tariff = tariffs[row.tariff];
+            return !tariff || tariff.status !== 'Active' || tariff.cms_tariff_id !== row.cms_tariff_id;
+        });
+        if (stale.length) {
+            frm.dashboard.set_headline_alert(
+                __('Tariffs changed since this assignment was saved (rows {0}). Review them and save again.',
+                    [stale.map(row => row.idx).join(', ')]),
+                'orange'
+            );
+        }
+    });
+}
 
-                const options = r.message.map(cp => cp.name).join('\n');
-                frm.set_df_property('charge_point', 'options', options);
-                frm.refresh_field('charge_point');
+function get_tariff_details(tariffs) {
+    return frappe.xcall('docusign_integration.tariff.tariff_lookup.get_tariff_details', {
+        tariffs: [...new Set(tariffs)]
+    });
+}
 
-                frm.chargepoints_loaded = true;
-            }
+function sync_chargepoints() {
+    frappe.call({
+        method: "docusign_integration.tariff.chargepoint_index.enqueue_chargepoint_sync",
+        callback() {
+            frappe.show_alert({
+                message: __('Charge point sync started in the background'),
+                indicator: 'blue'
+            });
         }
     });
 }
@@ -119,7 +148,7 @@ function fetch_connectors(frm) {
     frappe.call({
         method: "docusign_integration.tariff.api.fetch_chargepoint_connectors",
         args: {
-            cp_id: frm.doc.charge_point_name   // ✅ MUST be cp_id
+            cp_id: frm.doc.charge_point   // ✅ MUST be cp_id
         },
         callback(r) {
             console.log('Connectors:', r);
@@ -2,6 +2,14 @@ import frappe
 from frappe.model.document import Document
 
 class AssignTariff(Document):
+    def validate(self):
+        # Refresh every connector's CMS tariff ID in one query and reject stale tariffs
+        from docusign_integration.tariff.tariff_lookup import resolve_connector_tariffs
+
+        errors = resolve_connector_tariffs(self.connectors)
+        if errors:
+            frappe.throw("<br>".join(errors), title="Invalid connector tariffs")
+
     def on_update(self):
         # Log everything to see what's happening
         frappe.log_error(
@@ -23,13 +31,10 @@ class AssignTariff(Document):
                 title="AssignTariff - Condition Matched",
                 message=f"Triggering API for {self.name}"
             )
-            try:
-                from docusign_integration.tariff.api import assign_tariff_to_cms
-                assign_tariff_to_cms(self.name)
-                frappe.msgprint("Tariff assigned to CMS successfully", indicator="green")
-            except Exception as e:
-                frappe.log_error(f"Error in AssignTariff.on_update: {str(e)}")
-                frappe.throw(f"Failed to assign tariff: {str(e)}")
+            # Queued in the outbox and sent to the CMS after this save commits
+            from docusign_integration.tariff.outbox import ASSIGN_TARIFF, enqueue_cms_push
+            enqueue_cms_push(self, ASSIGN_TARIFF)
+            frappe.msgprint("Tariff assignment queued for the CMS", indicator="blue")
         else:
             frappe.log_error(
                 title="AssignTariff - Condition NOT Matched",
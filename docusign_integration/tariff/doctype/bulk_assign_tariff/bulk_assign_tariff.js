@@ -0,0 +1,54 @@
+// Copyright (c) 2026, nithin and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Bulk Assign Tariff', {
+    setup(frm) {
+        frm.set_query('tariff', () => ({ filters: { status: 'Active' } }));
+        frm.set_query('charge_point', 'chargepoints', () => ({
+            query: 'docusign_integration.tariff.chargepoint_index.search_chargepoints'
+        }));
+    },
+
+    refresh(frm) {
+        if (frm.doc.docstatus === 0 && frm.doc.target === 'Name Filter') {
+            frm.add_custom_button(__('Load Charge Points'), () => load_matching_chargepoints(frm));
+        }
+
+        if (frm.doc.docstatus === 1 && ['Completed with Errors', 'Not Started'].includes(frm.doc.run_status)) {
+            frm.add_custom_button(__('Resume'), () => {
+                frappe.call({
+                    method: 'docusign_integration.tariff.bulk_assign.resume_bulk_assignment',
+                    args: { name: frm.doc.name },
+                    callback() {
+                        frappe.show_alert({ message: __('Bulk assignment queued'), indicator: 'blue' });
+                        frm.reload_doc();
+                    }
+                });
+            });
+        }
+    }
+});
+
+
+function load_matching_chargepoints(frm) {
+    if (!frm.doc.chargepoint_filter) {
+        frappe.msgprint(__('Enter a charge point filter first'));
+        return;
+    }
+
+    frappe.call({
+        method: 'docusign_integration.tariff.bulk_assign.get_matching_chargepoints',
+        args: { pattern: frm.doc.chargepoint_filter },
+        callback(r) {
+            frm.clear_table('chargepoints');
+            (r.message || []).forEach(cp => {
+                frm.add_child('chargepoints', { charge_point: cp.name });
+            });
+            frm.refresh_field('chargepoints');
+            frappe.show_alert({
+                message: __('{0} charge points loaded', [(r.message || []).length]),
+                indicator: 'green'
+            });
+        }
+    });
+}
@@ -0,0 +1,34 @@
+# Copyright (c) 2026, nithin and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+from docusign_integration.tariff.bulk_assign import enqueue_bulk_assignment, get_matching_chargepoints
+
+
+class BulkAssignTariff(Document):
+	def validate(self):
+		if frappe.db.get_value("Tariff", self.tariff, "status") != "Active":
+			frappe.throw("Please select a tariff with Active status")
+
+		if self.target == "Name Filter" and not self.chargepoints:
+			for cp in get_matching_chargepoints(self.chargepoint_filter):
+				self.append("chargepoints", {"charge_point": cp.name})
+
+		# The same chargepoint twice would only double the CMS calls
+		seen = set()
+		duplicates = [row for row in self.chargepoints if row.charge_point in seen or seen.add(row.charge_point)]
+		for row in duplicates:
+			self.remove(row)
+
+		if not self.chargepoints:
+			frappe.throw("No charge points selected")
+
+	def on_submit(self):
+		if self.status == "Active":
+			enqueue_bulk_assignment(self.name)
+			frappe.msgprint(
+				f"Tariff assignment to {len(self.chargepoints)} charge points queued for the CMS",
+				indicator="blue",
+			)
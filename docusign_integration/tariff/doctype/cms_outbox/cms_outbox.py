@@ -0,0 +1,15 @@
+# Copyright (c) 2026, nithin and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class CMSOutbox(Document):
+	pass
+
+
+def on_doctype_update():
+	# The drain query filters on status + next_attempt_at; collapsing looks up by reference
+	frappe.db.add_index("CMS Outbox", ["status", "next_attempt_at"])
+	frappe.db.add_index("CMS Outbox", ["reference_doctype", "reference_name", "operation"])
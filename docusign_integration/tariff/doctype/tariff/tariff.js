@@ -3,6 +3,10 @@ frappe.ui.form.on('Tariff', {
         if (!frm.taxes_loaded) {
             load_taxes(frm);
         }
+
+        if (frappe.user.has_role(['System Manager', 'Tariff Admin'])) {
+            frm.add_custom_button(__('Refresh Taxes'), () => load_taxes(frm, true));
+        }
     },
 
     tax(frm) {
@@ -22,14 +26,19 @@ frappe.ui.form.on('Tariff', {
 });
 
 
-function load_taxes(frm) {
+function load_taxes(frm, force_refresh) {
     if (frm.loading_taxes) return;
 
     frm.loading_taxes = true;
     console.log("Loading taxes...");
 
+    // Taxes are served from the server-side cache; a forced refresh goes to the CMS
     frappe.call({
-        method: "docusign_integration.tariff.api.fetch_tax_list",
+        method: force_refresh
+            ? "docusign_integration.utils.cache.refresh_reference_data"
+            : "docusign_integration.tariff.api.fetch_tax_list",
+        args: force_refresh ? { name: "taxes" } : {},
+        freeze: force_refresh,
         callback(r) {
             frm.loading_taxes = false;
             console.log("Taxes loaded", r.message); 
@@ -6,11 +6,13 @@ from frappe.model.document import Document
 
 
 import frappe
-from docusign_integration.tariff.api import push_tariff_to_cms
+from docusign_integration.tariff.api import tariff_needs_push
+from docusign_integration.tariff.outbox import PUSH_TARIFF, enqueue_cms_push
 
 class Tariff(Document):
 
     def on_update(self):
-        # Detect transition to Active
-        if self.status == "Active" and not self.get("__pushed_to_cms"):
-            push_tariff_to_cms(self)
+        # Push Active tariffs only when the CMS payload actually changed.
+        # The push is queued in the outbox and sent after this save commits.
+        if self.status == "Active" and tariff_needs_push(self):
+            enqueue_cms_push(self, PUSH_TARIFF)
@@ -0,0 +1,18 @@
+# Copyright (c) 2026, nithin and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class TariffConnectorMapping(Document):
+	pass
+
+
+def on_doctype_update():
+	# tariff -> connectors (impact analysis) and chargepoint -> connector -> tariff lookups
+	frappe.db.add_index("Tariff Connector Mapping", ["cms_tariff_id", "charge_point"])
+	frappe.db.add_index("Tariff Connector Mapping", ["tariff", "charge_point"])
+	frappe.db.add_unique(
+		"Tariff Connector Mapping", ["charge_point", "connector_number"], constraint_name="unique_cp_connector"
+	)
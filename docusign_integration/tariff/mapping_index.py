@@ -0,0 +1,247 @@
+"""
+Local mirror of the CMS tariff ↔ connector mappings.
+
+Every successful tariffChargePointMapping push is recorded in Tariff Connector
+Mapping (one row per chargepoint connector), and the CMS mapping list is synced
+in periodically to pick up changes made elsewhere. Indexes in both directions
+turn "which connectors use tariff X" and "what tariff is on CP-123 connector 2"
+into local queries.
+"""
+
+import frappe
+from frappe.utils import cint, now_datetime
+
+from docusign_integration.utils.circuit_breaker import get_session
+
+DOCTYPE = "Tariff Connector Mapping"
+BATCH_SIZE = 1000
+# Stored with frappe.db.set_global; the next incremental sync asks the CMS for changes since then
+WATERMARK_KEY = "docusign_tariff_mapping_synced_on"
+
+INSERT_FIELDS = [
+    "name", "charge_point", "connector_number", "tariff", "cms_tariff_id",
+    "source_doctype", "source_name", "assigned_on", "last_synced_on",
+    "creation", "modified", "owner", "modified_by", "docstatus",
+]
+
+
+def mapping_name(charge_point, connector_number):
+    return f"{charge_point}:{connector_number}"
+
+
+def record_mappings(tariff_mappings, source_doctype=None, source_name=None):
+    """
+    Upserts mappings that were just accepted by the CMS.
+
+    Args:
+        tariff_mappings (list): Dicts with tariffId, chargePointId and connectorId,
+            as posted to tariffChargePointMapping.
+        source_doctype, source_name: The document that made the assignment.
+    """
+    rows = {
+        mapping_name(m["chargePointId"], m["connectorId"]): m
+        for m in tariff_mappings
+        if m.get("chargePointId") and m.get("connectorId") and m.get("tariffId")
+    }
+    _write_rows(rows, source_doctype, source_name, assigned=True)
+
+
+def sync_mapping_index(full=False):
+    """
+    Pulls mappings from the CMS and writes only the differences.
+
+    Incremental runs pass the previous sync time as `updatedAfter`; a full run reads
+    every mapping and also removes local rows the CMS no longer has.
+
+    Returns:
+        dict: Counts of upserted and removed rows.
+    """
+    settings = frappe.get_cached_doc("DocuSign Settings", "DocuSign Settings")
+    watermark = None if full else frappe.db.get_global(WATERMARK_KEY)
+    started_at = now_datetime()
+
+    remote = {
+        mapping_name(m["chargePointId"], m["connectorId"]): m
+        for m in fetch_cms_mappings(settings, updated_after=watermark)
+        if m.get("chargePointId") and m.get("connectorId") and m.get("tariffId")
+    }
+
+    local = {
+        row.name: row.cms_tariff_id
+        for row in frappe.get_all(DOCTYPE, fields=["name", "cms_tariff_id"])
+    }
+    changed = {name: m for name, m in remote.items() if local.get(name) != m["tariffId"]}
+    # Changed in the CMS directly, so there is no local source document
+    _write_rows(changed, None, None, assigned=False)
+
+    removed = []
+    if full:
+        removed = [name for name in local if name not in remote]
+        for start in range(0, len(removed), BATCH_SIZE):
+            frappe.db.delete(DOCTYPE, {"name": ("in", removed[start:start + BATCH_SIZE])})
+
+    frappe.db.set_global(WATERMARK_KEY, str(started_at))
+    frappe.db.commit()
+
+    return {"upserted": len(changed), "removed": len(removed)}
+
+
+def fetch_cms_mappings(settings, updated_after=None):
+    """
+    Mappings currently stored in the CMS; raises on failure.
+    """
+    params = {"numotype": "ocpp"}
+    if updated_after:
+        params["updatedAfter"] = updated_after
+
+    resp = get_session("cms").get(
+        f"{settings.cms_base_url.rstrip('/')}/frapeetariff/api/tariffChargePointMapping",
+        params=params,
+        headers={"x-api-key": settings.cms_api_key, "Accept": "application/json"},
+        timeout=60,
+    )
+    resp.raise_for_status()
+    data = resp.json()
+
+    # CMS list endpoints answer either with a bare list or wrapped in "Document"
+    if isinstance(data, dict):
+        data = data.get("Document") or data.get("tariff") or []
+
+    return data
+
+
+def _write_rows(rows, source_doctype, source_name, assigned):
+    if not rows:
+        return
+
+    tariff_by_cms_id = dict(
+        frappe.get_all(
+            "Tariff",
+            filters={"cms_tariff_id": ("in", list({m["tariffId"] for m in rows.values()}))},
+            fields=["cms_tariff_id", "name"],
+            as_list=True,
+        )
+    )
+    now = now_datetime()
+    user = frappe.session.user
+    names = list(rows)
+
+    for start in range(0, len(names), BATCH_SIZE):
+        batch = names[start:start + BATCH_SIZE]
+        # Delete + insert is one round trip each per batch instead of one per row
+        frappe.db.delete(DOCTYPE, {"name": ("in", batch)})
+        frappe.db.bulk_insert(
+            DOCTYPE,
+            fields=INSERT_FIELDS,
+            values=[
+                (
+                    name,
+                    rows[name]["chargePointId"],
+                    str(rows[name]["connectorId"]),
+                    tariff_by_cms_id.get(rows[name]["tariffId"]),
+                    rows[name]["tariffId"],
+                    source_doctype,
+                    source_name,
+                    now if assigned else None,
+                    now,
+                    now, now, user, user, 0,
+                )
+                for name in batch
+            ],
+        )
+
+
+def scheduled_sync():
+    """
+    Scheduler entry point; failures are logged and retried on the next run.
+    """
+    try:
+        sync_mapping_index()
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(title="Tariff mapping sync failed", message=frappe.get_traceback())
+
+
+def scheduled_full_sync():
+    try:
+        sync_mapping_index(full=True)
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(title="Tariff mapping full sync failed", message=frappe.get_traceback())
+
+
+@frappe.whitelist()
+def enqueue_mapping_sync(full=False):
+    frappe.only_for(("System Manager", "Tariff Admin"))
+    frappe.enqueue(
+        "docusign_integration.tariff.mapping_index.scheduled_full_sync"
+        if cint(full)
+        else "docusign_integration.tariff.mapping_index.scheduled_sync",
+        queue="long",
+        job_id="docusign_integration_tariff_mapping_sync",
+        deduplicate=True,
+    )
+    return {"queued": True}
+
+
+@frappe.whitelist()
+def get_tariff_connectors(tariff=None, cms_tariff_id=None):
+    """
+    Connectors currently on a tariff.
+
+    Args:
+        tariff (str): Tariff name, or
+        cms_tariff_id (str): CMS identifier of the tariff.
+
+    Returns:
+        list: Dicts with charge_point and connector_number.
+    """
+    if not (tariff or cms_tariff_id):
+        frappe.throw("Pass a tariff or a CMS tariff ID")
+
+    filters = {"tariff": tariff} if tariff else {"cms_tariff_id": cms_tariff_id}
+    return frappe.get_list(
+        DOCTYPE,
+        filters=filters,
+        fields=["charge_point", "connector_number"],
+        order_by="charge_point asc, connector_number asc",
+        limit_page_length=0,
+    )
+
+
+@frappe.whitelist()
+def get_chargepoint_tariffs(charge_point, connector_number=None):
+    """
+    Tariff on each connector of a chargepoint, or on one connector.
+
+    Returns:
+        list: Dicts with connector_number, tariff and cms_tariff_id.
+    """
+    filters = {"charge_point": charge_point}
+    if connector_number:
+        filters["connector_number"] = str(connector_number)
+    return frappe.get_list(
+        DOCTYPE,
+        filters=filters,
+        fields=["connector_number", "tariff", "cms_tariff_id", "assigned_on"],
+        order_by="connector_number asc",
+        limit_page_length=0,
+    )
+
+
+@frappe.whitelist()
+def get_tariff_impact(tariff):
+    """
+    How many chargepoints and connectors a change to `tariff` would affect.
+    """
+    frappe.has_permission(DOCTYPE, throw=True)
+    row = frappe.db.sql(
+        """
+        SELECT COUNT(DISTINCT charge_point) AS chargepoints, COUNT(*) AS connectors
+        FROM `tabTariff Connector Mapping`
+        WHERE tariff = %(tariff)s
+        """,
+        {"tariff": tariff},
+        as_dict=True,
+    )[0]
+    return {"tariff": tariff, "chargepoints": row.chargepoints, "connectors": row.connectors}
@@ -0,0 +1,240 @@
+"""
+Transactional outbox for CMS pushes.
+
+Tariff and Assign Tariff saves no longer call the CMS inline. They write a CMS
+Outbox row in the same database transaction as the save, and a background worker
+drains the outbox with retries and exponential backoff. Repeated saves of the
+same document collapse into the one pending row, so the CMS sees a single push
+carrying the latest state.
+"""
+
+from datetime import timedelta
+
+import frappe
+from frappe.utils import now_datetime
+from redis.exceptions import LockError
+
+from docusign_integration.tariff.api import (
+    assign_tariff_to_cms,
+    build_tariff_payload,
+    mark_tariff_pushed,
+    post_tariff_payload,
+    tariff_fingerprint,
+    tariff_needs_push,
+)
+
+OUTBOX_DOCTYPE = "CMS Outbox"
+
+PUSH_TARIFF = "Push Tariff"
+ASSIGN_TARIFF = "Assign Tariff"
+
+MAX_ATTEMPTS = 10
+BASE_BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 60 * 60
+DRAIN_BATCH_SIZE = 100
+DRAIN_LOCK_KEY = "docusign_integration:cms_outbox_drain"
+# Renewed before every entry; comfortably longer than one entry's CMS calls
+DRAIN_LOCK_TIMEOUT = 5 * 60
+DONE_RETENTION_DAYS = 7
+# Entries the drain will still process
+OPEN_STATUSES = ("Pending", "Processing")
+
+
+def enqueue_cms_push(doc, operation):
+    """
+    Records that `doc` must be pushed to the CMS. Must be called inside the save
+    transaction; nothing is sent until that transaction commits.
+
+    Args:
+        doc (Document): The Tariff or Assign Tariff document.
+        operation (str): PUSH_TARIFF or ASSIGN_TARIFF.
+    """
+    now = now_datetime()
+    pending = frappe.db.get_value(
+        OUTBOX_DOCTYPE,
+        {
+            "reference_doctype": doc.doctype,
+            "reference_name": doc.name,
+            "operation": operation,
+            "status": "Pending",
+        },
+        "name",
+    )
+
+    if pending:
+        # Collapse: the worker always pushes the latest state of the document
+        frappe.db.set_value(OUTBOX_DOCTYPE, pending, "next_attempt_at", now, update_modified=False)
+    else:
+        frappe.get_doc({
+            "doctype": OUTBOX_DOCTYPE,
+            "reference_doctype": doc.doctype,
+            "reference_name": doc.name,
+            "operation": operation,
+            "status": "Pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+        }).insert(ignore_permissions=True)
+
+    # Drain right after commit instead of waiting for the next scheduler tick
+    frappe.enqueue(
+        "docusign_integration.tariff.outbox.process_outbox",
+        queue="short",
+        enqueue_after_commit=True,
+        job_id="docusign_integration_cms_outbox",
+        deduplicate=True,
+    )
+
+
+def get_queued_references(reference_doctype, operation):
+    """
+    Names of the `reference_doctype` documents with an open `operation` entry.
+    """
+    return set(
+        frappe.get_all(
+            OUTBOX_DOCTYPE,
+            filters={
+                "reference_doctype": reference_doctype,
+                "operation": operation,
+                "status": ("in", OPEN_STATUSES),
+            },
+            pluck="reference_name",
+        )
+    )
+
+
+def process_outbox(limit=DRAIN_BATCH_SIZE):
+    """
+    Drains due outbox entries. Only one drain runs at a time across workers.
+
+    Returns:
+        dict: Counts of done, retried and failed entries, or None if another drain is running.
+    """
+    lock = frappe.cache().lock(frappe.cache().make_key(DRAIN_LOCK_KEY), timeout=DRAIN_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return None
+
+    result = {"done": 0, "retried": 0, "failed": 0}
+    try:
+        # Drains are serialized, so anything still Processing was orphaned by a crashed worker
+        frappe.db.set_value(OUTBOX_DOCTYPE, {"status": "Processing"}, "status", "Pending", update_modified=False)
+        frappe.db.commit()
+
+        entries = frappe.get_all(
+            OUTBOX_DOCTYPE,
+            filters={"status": "Pending", "next_attempt_at": ("<=", now_datetime())},
+            fields=["name", "reference_doctype", "reference_name", "operation", "attempts"],
+            order_by="next_attempt_at asc",
+            limit=int(limit),
+        )
+        for entry in entries:
+            # A slow CMS must not let the lock expire under a running drain
+            try:
+                lock.reacquire()
+            except LockError:
+                # Lost it anyway: another drain may own the rest of the batch by now
+                break
+            result[_process_entry(entry)] += 1
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # Expired during the last entry; the next drain resets anything left Processing
+            pass
+
+    return result
+
+
+def _process_entry(entry):
+    frappe.db.set_value(OUTBOX_DOCTYPE, entry.name, "status", "Processing", update_modified=False)
+    frappe.db.commit()
+
+    try:
+        _dispatch(entry)
+    except Exception as e:
+        frappe.db.rollback()
+        attempts = entry.attempts + 1
+        failed = attempts >= MAX_ATTEMPTS
+        backoff = min(BASE_BACKOFF_SECONDS * (2 ** (attempts - 1)), MAX_BACKOFF_SECONDS)
+        frappe.db.set_value(
+            OUTBOX_DOCTYPE,
+            entry.name,
+            {
+                "status": "Failed" if failed else "Pending",
+                "attempts": attempts,
+                "next_attempt_at": now_datetime() + timedelta(seconds=backoff),
+                "last_error": str(e) or frappe.get_traceback(),
+            },
+        )
+        if failed:
+            frappe.log_error(
+                title=f"CMS push gave up: {entry.operation} {entry.reference_name}",
+                message=frappe.get_traceback(),
+            )
+        frappe.db.commit()
+        return "failed" if failed else "retried"
+
+    frappe.db.set_value(
+        OUTBOX_DOCTYPE,
+        entry.name,
+        {"status": "Done", "attempts": entry.attempts + 1, "processed_on": now_datetime(), "last_error": None},
+    )
+    frappe.db.commit()
+    return "done"
+
+
+def _dispatch(entry):
+    """
+    Pushes the current state of the referenced document; raises on failure so the entry is retried.
+    """
+    if not frappe.db.exists(entry.reference_doctype, entry.reference_name):
+        return
+
+    doc = frappe.get_doc(entry.reference_doctype, entry.reference_name)
+
+    if entry.operation == PUSH_TARIFF:
+        if doc.status != "Active" or not tariff_needs_push(doc):
+            return
+        settings = frappe.get_cached_doc("DocuSign Settings", "DocuSign Settings")
+        payload = build_tariff_payload(doc)
+        resp_data = post_tariff_payload(settings, payload)
+        mark_tariff_pushed(doc, resp_data.get("identifier"), tariff_fingerprint(payload))
+
+    elif entry.operation == ASSIGN_TARIFF:
+        if doc.status != "Active" or doc.pushed_to_cms:
+            return
+        result = assign_tariff_to_cms(doc.name)
+        if not result.get("success"):
+            raise Exception(result.get("message"))
+
+
+def clear_processed_entries():
+    """
+    Daily cleanup of delivered entries; failed ones are kept for inspection.
+    """
+    frappe.db.delete(
+        OUTBOX_DOCTYPE,
+        {"status": "Done", "processed_on": ("<", now_datetime() - timedelta(days=DONE_RETENTION_DAYS))},
+    )
+
+
+@frappe.whitelist()
+def retry_failed_entries():
+    """
+    Puts entries that exhausted their retries back in the queue.
+    """
+    frappe.only_for(("System Manager", "Tariff Admin"))
+
+    names = frappe.get_all(OUTBOX_DOCTYPE, filters={"status": "Failed"}, pluck="name")
+    for name in names:
+        frappe.db.set_value(
+            OUTBOX_DOCTYPE, name, {"status": "Pending", "attempts": 0, "next_attempt_at": now_datetime()}
+        )
+    if names:
+        frappe.enqueue(
+            "docusign_integration.tariff.outbox.process_outbox",
+            queue="short",
+            enqueue_after_commit=True,
+            job_id="docusign_integration_cms_outbox",
+            deduplicate=True,
+        )
+    return {"requeued": len(names)}
@@ -0,0 +1,162 @@
+"""
+Tariff catalogue reconciliation between Frappe and the CMS.
+
+Every Active Tariff's CMS payload is fingerprinted and compared with the tariff
+the CMS currently holds under the same identifier; only tariffs that are missing
+or differ are pushed, in concurrent batches. This repairs failed pushes and edits made
+directly in the CMS.
+
+Tariffs with an open CMS Outbox push (pending, in backoff or being processed) are
+left to the outbox, which pushes their latest state anyway; pushing them here as
+well could create the same tariff twice in the CMS.
+"""
+
+import frappe
+
+from docusign_integration.tariff.api import (
+    build_tariff_payload,
+    mark_tariff_pushed,
+    tariff_fingerprint,
+)
+from docusign_integration.tariff.cms_client import CMSClient
+from docusign_integration.tariff.outbox import PUSH_TARIFF, get_queued_references
+from docusign_integration.utils.circuit_breaker import get_session
+
+DEFAULT_BATCH_SIZE = 50
+
+TARIFF_FIELDS = [
+    "name",
+    "tariff_name",
+    "type",
+    "currency",
+    "value",
+    "service_fee",
+    "tax_identifier",
+    "status",
+    "pushed_to_cms",
+    "cms_tariff_id",
+    "cms_payload_hash",
+]
+
+
+def reconcile_tariffs(batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Pushes every Active tariff whose CMS copy is missing or out of date.
+
+    Args:
+        batch_size (int): Tariffs pushed concurrently per batch; each batch is committed on its own.
+        dry_run (bool): Only report the differences.
+
+    Returns:
+        dict: Counts of checked, unchanged, pushed, failed and outbox-queued tariffs,
+        plus the names that failed.
+    """
+    settings = frappe.get_cached_doc("DocuSign Settings", "DocuSign Settings")
+    tariffs = frappe.get_all("Tariff", filters={"status": "Active"}, fields=TARIFF_FIELDS)
+    remote = fetch_cms_tariff_fingerprints(settings)
+    queued = get_queued_references("Tariff", PUSH_TARIFF)
+
+    pending = []
+    in_outbox = 0
+    for tariff in tariffs:
+        if tariff.name in queued:
+            in_outbox += 1
+            continue
+        payload = build_tariff_payload(tariff)
+        fingerprint = tariff_fingerprint(payload)
+        if remote is None:
+            # CMS state unavailable: fall back to what we last pushed
+            in_sync = tariff.pushed_to_cms and tariff.cms_payload_hash == fingerprint
+        else:
+            in_sync = tariff.cms_tariff_id and remote.get(tariff.cms_tariff_id) == fingerprint
+        if not in_sync:
+            pending.append((tariff, payload, fingerprint))
+
+    result = {
+        "checked": len(tariffs),
+        "unchanged": len(tariffs) - len(pending) - in_outbox,
+        "in_outbox": in_outbox,
+        "pushed": 0,
+        "failed": 0,
+        "failed_tariffs": [],
+        "cms_state_available": remote is not None,
+    }
+    if dry_run:
+        result["pending"] = [tariff.name for tariff, _, _ in pending]
+        return result
+
+    batch_size = int(batch_size) or DEFAULT_BATCH_SIZE
+    with CMSClient.from_settings() as client:
+        for start in range(0, len(pending), batch_size):
+            batch = {
+                tariff.name: (payload, fingerprint)
+                for tariff, payload, fingerprint in pending[start:start + batch_size]
+            }
+            pushed = client.push_tariffs({name: payload for name, (payload, _) in batch.items()})
+
+            for name, resp_data in pushed.results.items():
+                mark_tariff_pushed(frappe.get_doc("Tariff", name), resp_data.get("identifier"), batch[name][1])
+                result["pushed"] += 1
+            for name, error in pushed.errors.items():
+                result["failed"] += 1
+                result["failed_tariffs"].append(name)
+                frappe.log_error(title=f"Tariff reconciliation failed: {name}", message=error)
+            frappe.db.commit()
+
+    return result
+
+
+def fetch_cms_tariff_fingerprints(settings):
+    """
+    Fingerprints of the tariffs currently stored in the CMS, keyed by identifier.
+
+    Returns:
+        dict, or None when the CMS tariff list cannot be read.
+    """
+    url = f"{settings.cms_base_url.rstrip('/')}/frapeetariff/api/tariff"
+    headers = {"x-api-key": settings.cms_api_key, "Accept": "application/json"}
+    try:
+        resp = get_session("cms").get(url, params={"numotype": "ocpp"}, headers=headers, timeout=30)
+        resp.raise_for_status()
+        data = resp.json()
+    except Exception:
+        frappe.log_error(title="CMS tariff list fetch failed", message=frappe.get_traceback())
+        return None
+
+    # CMS list endpoints answer either with a bare list or wrapped in "Document"
+    if isinstance(data, dict):
+        data = data.get("Document") or []
+
+    return {t.get("identifier"): tariff_fingerprint(t) for t in data if t.get("identifier")}
+
+
+def scheduled_reconciliation():
+    """
+    Scheduler entry point.
+    """
+    result = reconcile_tariffs()
+    if result["failed"]:
+        frappe.log_error(
+            title="Tariff reconciliation finished with failures",
+            message=frappe.as_json(result),
+        )
+
+
+@frappe.whitelist()
+def run_tariff_reconciliation(dry_run=False):
+    """
+    Runs reconciliation on demand. A dry run returns the pending differences directly,
+    otherwise the push is queued in the background.
+    """
+    frappe.only_for(("System Manager", "Tariff Admin"))
+
+    if frappe.utils.cint(dry_run):
+        return reconcile_tariffs(dry_run=True)
+
+    frappe.enqueue(
+        "docusign_integration.tariff.reconciliation.scheduled_reconciliation",
+        queue="long",
+        job_id="docusign_integration_tariff_reconciliation",
+        deduplicate=True,
+    )
+    return {"queued": True}
@@ -0,0 +1,77 @@
+"""
+Batched tariff resolution for Assign Tariff connector rows.
+
+Connector rows copy the CMS ID of their tariff. The copy goes stale when the
+tariff is re-pushed (new CMS ID) or deactivated after it was picked. All rows are
+therefore resolved together, with one query on Tariff's primary key, when the
+document is validated and again right before the assignment is pushed to the
+CMS. The form uses get_tariff_details to do the same for any number of rows in
+one call.
+"""
+
+import frappe
+
+DOCTYPE = "Tariff"
+FIELDS = ["name", "cms_tariff_id", "status"]
+
+
+def resolve_tariffs(names, as_list=False):
+    """
+    cms_tariff_id and status of the tariffs `names`, in one query.
+
+    Args:
+        names (iterable): Tariff names; blanks and duplicates are ignored.
+        as_list (bool): Apply the session user's permissions (frappe.get_list).
+
+    Returns:
+        dict: {tariff name: frappe._dict(name, cms_tariff_id, status)}; unknown names are missing.
+    """
+    names = sorted({name for name in names if name})
+    if not names:
+        return {}
+
+    query = frappe.get_list if as_list else frappe.get_all
+    rows = query(DOCTYPE, filters={"name": ["in", names]}, fields=FIELDS, limit_page_length=0)
+    return {row.name: row for row in rows}
+
+
+def resolve_connector_tariffs(connectors):
+    """
+    Refreshes cms_tariff_id on every connector row from its tariff.
+
+    Rows without a tariff are cleared. Rows whose tariff is missing, not Active or
+    not yet pushed to the CMS are left unchanged and reported.
+
+    Returns:
+        list: One message per rejected row, empty when every row is valid.
+    """
+    tariffs = resolve_tariffs(row.tariff for row in connectors)
+    errors = []
+    for row in connectors:
+        if not row.tariff:
+            row.cms_tariff_id = None
+            continue
+
+        tariff = tariffs.get(row.tariff)
+        if not tariff:
+            errors.append(f"Row {row.idx}: Tariff {row.tariff} does not exist")
+        elif tariff.status != "Active":
+            errors.append(f"Row {row.idx}: Tariff {row.tariff} is {tariff.status or 'not Active'}")
+        elif not tariff.cms_tariff_id:
+            errors.append(f"Row {row.idx}: Tariff {row.tariff} has not been pushed to the CMS yet")
+        else:
+            row.cms_tariff_id = tariff.cms_tariff_id
+    return errors
+
+
+@frappe.whitelist()
+def get_tariff_details(tariffs):
+    """
+    cms_tariff_id and status for a list of tariff names, for the Assign Tariff form.
+
+    Args:
+        tariffs (list or str): Tariff names, or a JSON list of them.
+    """
+    if isinstance(tariffs, str):
+        tariffs = frappe.parse_json(tariffs)
+    return resolve_tariffs(tariffs or [], as_list=True)
@@ -0,0 +1,168 @@
+"""
+Local mirror of the CMS `tariff_rules` document with optimistic concurrency.
+
+The CMS keeps all group tariff rules in one document that can only be replaced
+as a whole. The last known copy is mirrored in Redis together with its version
+(the CMS ETag when it sends one, otherwise a content hash). A rule change is
+applied to the mirror as a single upsert keyed by tariffId and written back with
+`If-Match`; a 409/412 answer means someone else changed the rules, so the mirror
+is refreshed and the upsert is reapplied. Writers on this site are serialized
+with a Redis lock so two sends can no longer overwrite each other's rules.
+
+With an ETag the mirror is only revalidated with a conditional GET. Without one
+nothing guards the write against rules changed in the CMS or by another site,
+so the rules are read afresh before every write.
+"""
+
+import hashlib
+import json
+import time
+
+import frappe
+
+from docusign_integration.utils.circuit_breaker import get_session
+
+MIRROR_KEY = "docusign_integration:tariff_rules_mirror"
+WRITE_LOCK_KEY = "docusign_integration:tariff_rules_write"
+MAX_CONFLICT_RETRIES = 3
+CONFLICT_STATUS_CODES = (409, 412)
+
+
+class TariffRulesConflict(Exception):
+    pass
+
+
+def upsert_tariff_rule(settings, rule):
+    """
+    Adds `rule` at the front of the CMS rules, replacing any existing rule for the same tariffId.
+
+    Args:
+        settings: DocuSign Settings document (CMS URL and API key).
+        rule (dict): Rule in CMS format; must contain "tariffId".
+
+    Returns:
+        str: Identifier of the CMS rules document.
+    """
+    cache = frappe.cache()
+    with cache.lock(cache.make_key(WRITE_LOCK_KEY), timeout=120, blocking_timeout=60):
+        mirror = get_tariff_rules_mirror(settings)
+        for attempt in range(MAX_CONFLICT_RETRIES + 1):
+            rules = [r for r in mirror["rules"] if r.get("tariffId") != rule.get("tariffId")]
+            rules.insert(0, rule)
+            try:
+                return _write_rules(settings, mirror, rules)
+            except TariffRulesConflict:
+                if attempt == MAX_CONFLICT_RETRIES:
+                    raise
+                frappe.log_error(
+                    title="Tariff rules conflict",
+                    message=f"CMS rules changed concurrently, retrying ({attempt + 1}/{MAX_CONFLICT_RETRIES})",
+                )
+                mirror = get_tariff_rules_mirror(settings, force=True)
+
+
+def get_tariff_rules_mirror(settings, force=False):
+    """
+    Returns the rules document to base a write on. The mirror is only used when it
+    has an ETag, so If-Match can reject the write if the CMS rules changed since;
+    otherwise (or when forced) the rules are re-read from the CMS.
+    """
+    mirror = frappe.cache().get_value(MIRROR_KEY)
+    if mirror and mirror.get("etag") and not force:
+        return _revalidate(settings, mirror)
+    return _fetch_rules(settings)
+
+
+def _revalidate(settings, mirror):
+    # Conditional GET: a 304 costs the same regardless of how many rules there are
+    resp = get_session("cms").get(
+        _rules_url(settings),
+        params={"numotype": "ocpp"},
+        headers=_headers(settings, {"If-None-Match": mirror["etag"]}),
+        timeout=15,
+    )
+    if resp.status_code == 304:
+        return mirror
+    return _store_fetched(resp)
+
+
+def _fetch_rules(settings):
+    resp = get_session("cms").get(_rules_url(settings), params={"numotype": "ocpp"}, headers=_headers(settings), timeout=15)
+    return _store_fetched(resp)
+
+
+def _store_fetched(resp):
+    if resp.status_code != 200:
+        frappe.log_error(resp.text, "Fetch Rules Failed")
+        frappe.throw(f"Error fetching tariff rules: {resp.text}")
+
+    # CMS returns either a single object or list; handle both
+    rules_json = resp.json()
+    rules_data = rules_json[0] if isinstance(rules_json, list) and rules_json else rules_json
+    if not isinstance(rules_data, dict):
+        rules_data = {}
+
+    rules = rules_data.get("rules") or []
+    mirror = {
+        "identifier": rules_data.get("identifier") or frappe.generate_hash(),
+        "numotype": rules_data.get("numotype", "ocpp"),
+        "rules": rules,
+        "etag": resp.headers.get("ETag"),
+        "version": resp.headers.get("ETag") or _content_version(rules),
+        "fetched_at": time.time(),
+    }
+    frappe.cache().set_value(MIRROR_KEY, mirror)
+    return mirror
+
+
+def _write_rules(settings, mirror, rules):
+    payload = {"numotype": mirror["numotype"], "rules": rules, "identifier": mirror["identifier"]}
+    extra_headers = {"If-Match": mirror["etag"]} if mirror.get("etag") else {}
+
+    resp = get_session("cms").post(_rules_url(settings), json=payload, headers=_headers(settings, extra_headers), timeout=30)
+
+    if resp.status_code in CONFLICT_STATUS_CODES:
+        raise TariffRulesConflict(resp.text)
+    if resp.status_code != 200:
+        frappe.log_error(resp.text, "Push Rules Failed")
+        frappe.throw(f"Error posting updated rules: {resp.text}")
+
+    etag = resp.headers.get("ETag")
+    frappe.cache().set_value(MIRROR_KEY, {
+        **mirror,
+        "rules": rules,
+        "etag": etag,
+        "version": etag or _content_version(rules),
+        # A write without an ETag back means the next write re-reads the rules
+        "fetched_at": time.time(),
+    })
+    return mirror["identifier"]
+
+
+def _content_version(rules):
+    return hashlib.sha256(json.dumps(rules, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _rules_url(settings):
+    return f"{settings.cms_base_url.rstrip('/')}/frapeetariff/api/tariff_rules"
+
+
+def _headers(settings, extra=None):
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "x-api-key": settings.cms_api_key,
+    }
+    headers.update(extra or {})
+    return headers
+
+
+@frappe.whitelist()
+def refresh_tariff_rules_mirror():
+    """
+    Re-reads the rules document from the CMS, e.g. after editing rules in the CMS directly.
+    """
+    frappe.only_for(("System Manager", "Tariff Admin"))
+    settings = frappe.get_cached_doc("DocuSign Settings", "DocuSign Settings")
+    mirror = get_tariff_rules_mirror(settings, force=True)
+    return {"identifier": mirror["identifier"], "rules": len(mirror["rules"]), "version": mirror["version"]}
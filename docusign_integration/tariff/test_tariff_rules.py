@@ -0,0 +1,79 @@
+# Copyright (c) 2026, nithin and Contributors
+# See license.txt
+
+import time
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from docusign_integration.tariff.tariff_rules import MIRROR_KEY, upsert_tariff_rule
+
+SETTINGS = frappe._dict(cms_base_url="https://cms.example", cms_api_key="test-key")
+
+
+def response(status_code=200, body=None, headers=None):
+	resp = MagicMock(status_code=status_code, headers=headers or {}, text="")
+	resp.json.return_value = body
+	return resp
+
+
+class TestTariffRules(FrappeTestCase):
+	def setUp(self):
+		frappe.cache().delete_value(MIRROR_KEY)
+
+	def tearDown(self):
+		frappe.cache().delete_value(MIRROR_KEY)
+
+	def test_write_without_etag_rereads_rules(self):
+		# A fresh mirror without an ETag, missing a rule another site added since
+		frappe.cache().set_value(
+			MIRROR_KEY,
+			{
+				"identifier": "rules-1",
+				"numotype": "ocpp",
+				"rules": [{"tariffId": "t-old"}],
+				"etag": None,
+				"version": "v1",
+				"fetched_at": time.time(),
+			},
+		)
+		session = MagicMock()
+		session.get.return_value = response(
+			body={"identifier": "rules-1", "rules": [{"tariffId": "t-other-site"}, {"tariffId": "t-old"}]}
+		)
+		session.post.return_value = response()
+
+		with patch("docusign_integration.tariff.tariff_rules.get_session", return_value=session):
+			self.assertEqual(upsert_tariff_rule(SETTINGS, {"tariffId": "t-new"}), "rules-1")
+
+		session.get.assert_called_once()
+		posted = session.post.call_args.kwargs
+		self.assertEqual(
+			[r["tariffId"] for r in posted["json"]["rules"]], ["t-new", "t-other-site", "t-old"]
+		)
+		self.assertNotIn("If-Match", posted["headers"])
+
+	def test_write_with_etag_uses_revalidated_mirror(self):
+		frappe.cache().set_value(
+			MIRROR_KEY,
+			{
+				"identifier": "rules-1",
+				"numotype": "ocpp",
+				"rules": [{"tariffId": "t-old"}],
+				"etag": '"v1"',
+				"version": '"v1"',
+				"fetched_at": time.time(),
+			},
+		)
+		session = MagicMock()
+		session.get.return_value = response(status_code=304)
+		session.post.return_value = response(headers={"ETag": '"v2"'})
+
+		with patch("docusign_integration.tariff.tariff_rules.get_session", return_value=session):
+			upsert_tariff_rule(SETTINGS, {"tariffId": "t-new"})
+
+		self.assertEqual(session.get.call_args.kwargs["headers"]["If-None-Match"], '"v1"')
+		posted = session.post.call_args.kwargs
+		self.assertEqual([r["tariffId"] for r in posted["json"]["rules"]], ["t-new", "t-old"])
+		self.assertEqual(posted["headers"]["If-Match"], '"v1"')
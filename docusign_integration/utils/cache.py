@@ -0,0 +1,151 @@
+"""
+Redis-backed stale-while-revalidate cache for CMS reference lists.
+
+Reference lists (taxes, groups) change rarely but were fetched from
+the CMS on every form load. Each list is kept in Redis together with the time it
+was fetched:
+
+- fresh copy: returned as-is
+- stale copy (older than the list's TTL): returned immediately and a background
+  refresh is enqueued
+- no copy yet: fetched synchronously once
+- failed refresh: the last good copy stays in place and keeps being served
+"""
+
+import time
+
+import frappe
+
+# name -> fetcher (dotted path, must raise on failure), TTL in seconds, error log title
+REFERENCE_LISTS = {
+    "taxes": {
+        "fetcher": "docusign_integration.tariff.api.get_taxes_from_cms",
+        "ttl": 6 * 60 * 60,
+        "error_title": "Tax fetch failed",
+    },
+    "groups": {
+        "fetcher": "docusign_integration.docusign_integration.api.get_groups_from_cms",
+        "ttl": 60 * 60,
+        "error_title": "Group fetch failed",
+    },
+}
+
+CACHE_KEY = "docusign_integration:reference_list:{}"
+REFRESH_LOCK_KEY = "docusign_integration:reference_list_refreshing:{}"
+REFRESH_LOCK_SECONDS = 120
+
+
+def get_reference_list(name):
+    """
+    Returns the cached reference list `name`, refreshing it in the background when stale.
+
+    Args:
+        name (str): Key of REFERENCE_LISTS.
+
+    Returns:
+        list: The cached list, or [] if it has never been fetched successfully.
+    """
+    entry = frappe.cache().get_value(CACHE_KEY.format(name))
+
+    if not entry:
+        # Cold cache: the first caller has to wait for the CMS once
+        return refresh_reference_list(name) or []
+
+    if time.time() - entry.get("fetched_at", 0) > get_ttl(name):
+        enqueue_refresh(name)
+
+    return entry.get("data") or []
+
+
+def refresh_reference_list(name, lock_token=None):
+    """
+    Fetches `name` from the CMS and stores it. On failure the previous copy is kept.
+
+    Args:
+        lock_token (str, optional): Token of the refresh lock taken by enqueue_refresh,
+            released when done. Callers that did not take the lock pass nothing.
+
+    Returns:
+        list: The freshly fetched list, or None if the fetch failed.
+    """
+    config = REFERENCE_LISTS[name]
+    try:
+        data = frappe.get_attr(config["fetcher"])()
+    except Exception:
+        frappe.log_error(title=config["error_title"], message=frappe.get_traceback())
+        return None
+    finally:
+        if lock_token:
+            _release_refresh_lock(name, lock_token)
+
+    frappe.cache().set_value(CACHE_KEY.format(name), {"data": data, "fetched_at": time.time()})
+    return data
+
+
+def enqueue_refresh(name):
+    """
+    Enqueues a background refresh of `name` unless one is already pending.
+    """
+    cache = frappe.cache()
+    token = frappe.generate_hash(length=10)
+    if not cache.set(cache.make_key(REFRESH_LOCK_KEY.format(name)), token, nx=True, ex=REFRESH_LOCK_SECONDS):
+        return
+
+    frappe.enqueue(
+        "docusign_integration.utils.cache.refresh_reference_list",
+        queue="short",
+        name=name,
+        lock_token=token,
+        job_id=f"docusign_integration_refresh_{name}",
+        deduplicate=True,
+    )
+
+
+def refresh_stale_reference_lists():
+    """
+    Scheduler entry point: keeps every list warm so form loads never hit a cold cache.
+    """
+    for name in REFERENCE_LISTS:
+        entry = frappe.cache().get_value(CACHE_KEY.format(name))
+        if not entry or time.time() - entry.get("fetched_at", 0) > get_ttl(name):
+            refresh_reference_list(name)
+
+
+@frappe.whitelist()
+def refresh_reference_data(name=None):
+    """
+    Manually refreshes one reference list (or all of them) from the CMS.
+
+    Args:
+        name (str, optional): Key of REFERENCE_LISTS; all lists when omitted.
+
+    Returns:
+        The refreshed list when `name` is given, otherwise a dict of list name -> item count.
+    """
+    frappe.only_for(("System Manager", "Tariff Admin"))
+    if name and name not in REFERENCE_LISTS:
+        frappe.throw(f"Unknown reference list: {name}")
+
+    if name:
+        data = refresh_reference_list(name)
+        if data is None:
+            frappe.throw("CMS refresh failed, showing the last cached copy. Check error logs.")
+        return data
+
+    return {n: len(refresh_reference_list(n) or []) for n in REFERENCE_LISTS}
+
+
+def get_ttl(name):
+    """
+    TTL for `name`, overridable per site via `docusign_reference_ttl` in site_config.json.
+    """
+    overrides = frappe.conf.get("docusign_reference_ttl") or {}
+    return int(overrides.get(name) or REFERENCE_LISTS[name]["ttl"])
+
+
+def _release_refresh_lock(name, token):
+    # Only while we still hold it: once expired, the lock may belong to another refresh
+    cache = frappe.cache()
+    key = cache.make_key(REFRESH_LOCK_KEY.format(name))
+    if (cache.get(key) or b"").decode() == token:
+        cache.delete(key)
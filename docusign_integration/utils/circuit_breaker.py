@@ -0,0 +1,302 @@
+"""
+Circuit breakers and bulkheads for the CMS and DocuSign, shared through Redis.
+
+Every call to an upstream goes through its CircuitBreaker:
+
+- bulkhead: at most `max_concurrent` calls per upstream are in flight across all
+  workers of the site; extra calls fail immediately instead of queueing behind a
+  slow upstream
+- closed: outcomes are counted in 10 s buckets; when at least `min_requests`
+  calls in the last `window` seconds failed at `failure_rate` or worse, the
+  breaker opens
+- open: calls fail immediately with UpstreamUnavailable for `open_seconds`
+- half-open: a single probe call is let through; success closes the breaker,
+  failure opens it again
+
+Only transport errors, timeouts, HTTP 5xx and 429 count as failures. A 4xx is the
+caller's problem, not a sick upstream.
+
+HTTP calls use get_session(upstream), a pooled requests.Session that applies the
+breaker, the upstream's rate limiter (if any) and a default timeout. Idempotent
+reads use its hedged_get for adaptive timeouts and hedging (utils/latency.py).
+SDK calls are wrapped in `upstream_call(upstream)`. Keys are resolved when the breaker is
+created, so a session built on the request thread can be used from worker threads.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import frappe
+import requests
+from requests.adapters import HTTPAdapter
+
+from docusign_integration.utils.latency import LatencyTracker, hedged_get
+from docusign_integration.utils.rate_limiter import RateLimiter, current_account
+
+UPSTREAMS = {
+    "cms": {
+        "failure_rate": 0.5,
+        "min_requests": 10,
+        "window": 60,
+        "open_seconds": 30,
+        "max_concurrent": 20,
+        # (connect, read) seconds, used when the caller passes no timeout
+        "timeout": (5, 20),
+        # hedged_get: read timeouts follow observed latency; slow reads get a second request
+        "adaptive_timeout": 1,
+        "hedge": 1,
+    },
+    "docusign": {
+        "failure_rate": 0.5,
+        "min_requests": 5,
+        "window": 60,
+        "open_seconds": 30,
+        "max_concurrent": 10,
+        "timeout": (5, 30),
+        "adaptive_timeout": 1,
+        # Hedges would spend DocuSign API quota
+        "hedge": 0,
+        # Calls also take a token from the shared DocuSign quota bucket (utils/rate_limiter.py)
+        "rate_limited": True,
+    },
+}
+
+BUCKET_SECONDS = 10
+KEY_PREFIX = "docusign_integration:upstream:{}"
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class UpstreamUnavailable(frappe.ValidationError):
+    http_status_code = 503
+
+
+def get_upstream_config(upstream):
+    """
+    Defaults from UPSTREAMS, overridable per site via `docusign_integration_upstreams`
+    in site_config.json, e.g. {"cms": {"max_concurrent": 40}}.
+    """
+    overrides = (frappe.conf.get("docusign_integration_upstreams") or {}).get(upstream) or {}
+    return {**UPSTREAMS[upstream], **overrides}
+
+
+class CircuitBreaker:
+    def __init__(self, upstream):
+        self.upstream = upstream
+        self.config = get_upstream_config(upstream)
+        self.redis = frappe.cache()
+
+        prefix = self.redis.make_key(KEY_PREFIX.format(upstream))
+        if isinstance(prefix, bytes):
+            prefix = prefix.decode()
+        self.key_prefix = prefix
+        self.open_key = f"{prefix}:open"
+        self.half_open_key = f"{prefix}:half_open"
+        self.probe_key = f"{prefix}:probe"
+        self.inflight_key = f"{prefix}:inflight"
+        self.bucket_key = f"{prefix}:{{}}:{{}}"
+
+    @contextmanager
+    def guard(self):
+        """
+        Runs the block as one upstream call. Raises UpstreamUnavailable without
+        running it when the breaker is open or the bulkhead is full.
+
+        Yields an object whose `failed` attribute can be set to record a failure
+        that did not raise (e.g. an HTTP 503 response).
+        """
+        probe = self._admit()
+        self._acquire_slot(probe)
+        call = _Call()
+        try:
+            yield call
+        except Exception as e:
+            self._record(not is_upstream_failure(e), probe)
+            raise
+        else:
+            self._record(not call.failed, probe)
+        finally:
+            self.redis.decr(self.inflight_key)
+
+    def state(self):
+        if self.redis.get(self.open_key):
+            return "open"
+        if self.redis.get(self.half_open_key):
+            return "half-open"
+        return "closed"
+
+    def _admit(self):
+        if self.redis.get(self.open_key):
+            raise UpstreamUnavailable(f"{self.upstream} is unavailable (circuit open), try again shortly")
+        if self.redis.get(self.half_open_key):
+            # Exactly one probe at a time; everyone else keeps failing fast until it reports back
+            if not self.redis.set(self.probe_key, 1, nx=True, ex=max(self.config["timeout"]) + 5):
+                raise UpstreamUnavailable(f"{self.upstream} is recovering, try again shortly")
+            return True
+        return False
+
+    def _acquire_slot(self, probe):
+        inflight = self.redis.incr(self.inflight_key)
+        # Slots leaked by killed workers expire with the counter
+        self.redis.expire(self.inflight_key, max(self.config["timeout"]) * 4)
+        if inflight > int(self.config["max_concurrent"]):
+            self.redis.decr(self.inflight_key)
+            if probe:
+                self.redis.delete(self.probe_key)
+            raise UpstreamUnavailable(f"Too many concurrent calls to {self.upstream}, try again shortly")
+
+    def _record(self, success, probe):
+        if probe:
+            if success:
+                self.redis.delete(self.half_open_key, self.probe_key)
+            else:
+                self._trip()
+            return
+
+        bucket = int(time.time() // BUCKET_SECONDS)
+        pipe = self.redis.pipeline()
+        pipe.incr(self.bucket_key.format("total", bucket))
+        pipe.expire(self.bucket_key.format("total", bucket), self.config["window"] + BUCKET_SECONDS)
+        if not success:
+            pipe.incr(self.bucket_key.format("failed", bucket))
+            pipe.expire(self.bucket_key.format("failed", bucket), self.config["window"] + BUCKET_SECONDS)
+        pipe.execute()
+
+        if not success and self._failure_rate_exceeded(bucket):
+            self._trip()
+
+    def _failure_rate_exceeded(self, bucket):
+        buckets = range(bucket - self.config["window"] // BUCKET_SECONDS + 1, bucket + 1)
+        totals = self.redis.mget([self.bucket_key.format("total", b) for b in buckets])
+        failures = self.redis.mget([self.bucket_key.format("failed", b) for b in buckets])
+        total = sum(int(v or 0) for v in totals)
+        failed = sum(int(v or 0) for v in failures)
+        return total >= int(self.config["min_requests"]) and failed / total >= float(self.config["failure_rate"])
+
+    def _trip(self):
+        open_seconds = int(self.config["open_seconds"])
+        pipe = self.redis.pipeline()
+        pipe.set(self.open_key, 1, ex=open_seconds)
+        # Half-open outlives the open period; it is cleared by a successful probe
+        pipe.set(self.half_open_key, 1, ex=open_seconds * 20)
+        pipe.delete(self.probe_key)
+        # Start counting afresh once the breaker closes again
+        bucket = int(time.time() // BUCKET_SECONDS)
+        for b in range(bucket - self.config["window"] // BUCKET_SECONDS, bucket + 1):
+            pipe.delete(self.bucket_key.format("total", b), self.bucket_key.format("failed", b))
+        pipe.execute()
+
+
+class _Call:
+    failed = False
+
+
+class GuardedSession(requests.Session):
+    """
+    requests.Session that sends every request through a CircuitBreaker (and a
+    RateLimiter, when given) and applies the upstream's default timeout.
+    """
+
+    def __init__(self, breaker, pool_maxsize=None, limiter=None):
+        super().__init__()
+        self.breaker = breaker
+        self.limiter = limiter
+        self.latency = LatencyTracker(breaker.redis, breaker.key_prefix)
+        adapter = HTTPAdapter(pool_maxsize=pool_maxsize or int(breaker.config["max_concurrent"]))
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", tuple(self.breaker.config["timeout"]))
+        # Wait for quota before taking a bulkhead slot, so throttled calls don't hold one
+        if self.limiter:
+            self.limiter.acquire()
+        with self.breaker.guard() as call:
+            resp = super().request(method, url, *args, **kwargs)
+            call.failed = resp.status_code >= 500 or resp.status_code == 429
+        if self.limiter:
+            self.limiter.observe(resp.headers)
+        return resp
+
+    def hedged_get(self, url, endpoint, **kwargs):
+        """
+        GET with an adaptive timeout and optional hedging; only for requests that
+        are safe to send twice. See utils/latency.py.
+        """
+        return hedged_get(self, url, endpoint, **kwargs)
+
+
+def is_upstream_failure(exc):
+    """
+    True for errors that say something about the upstream's health.
+    """
+    if isinstance(exc, requests.HTTPError):
+        status = exc.response.status_code if exc.response is not None else None
+        return status is None or status >= 500 or status == 429
+    if isinstance(exc, requests.RequestException):
+        return True
+    # docusign_esign.ApiException carries the HTTP status (0/None for transport errors)
+    if type(exc).__name__ == "ApiException":
+        status = getattr(exc, "status", None)
+        return not status or status >= 500 or status == 429
+    return False
+
+
+def breaker(upstream):
+    return CircuitBreaker(upstream)
+
+
+def get_limiter(upstream):
+    """
+    Rate limiter of the account the current block is charged to (see rate_account).
+    """
+    if not UPSTREAMS[upstream].get("rate_limited"):
+        return None
+    account, hourly_quota = current_account()
+    return RateLimiter(account, hourly_quota=hourly_quota)
+
+
+@contextmanager
+def upstream_call(upstream):
+    """
+    Guards one non-HTTP (SDK) call: takes a rate-limit token if the upstream has a
+    limiter, then runs the block under the upstream's breaker and bulkhead.
+    """
+    limiter = get_limiter(upstream)
+    if limiter:
+        limiter.acquire()
+    with CircuitBreaker(upstream).guard() as call:
+        yield call
+
+
+def get_session(upstream):
+    """
+    Pooled, guarded session for `upstream`, reused across requests of this site.
+    Rate-limited upstreams get one session per account, sharing the breaker.
+    """
+    key = (frappe.local.site, upstream)
+    if UPSTREAMS[upstream].get("rate_limited"):
+        key += current_account()
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = GuardedSession(CircuitBreaker(upstream), limiter=get_limiter(upstream))
+        return _sessions[key]
+
+
+@frappe.whitelist()
+def get_upstream_status():
+    """
+    Breaker state and in-flight calls per upstream, for monitoring.
+    """
+    frappe.only_for("System Manager")
+    status = {}
+    for upstream in UPSTREAMS:
+        b = CircuitBreaker(upstream)
+        status[upstream] = {
+            "state": b.state(),
+            "inflight": int(b.redis.get(b.inflight_key) or 0),
+            "max_concurrent": int(b.config["max_concurrent"]),
+        }
+    return status
@@ -0,0 +1,167 @@
+"""
+Adaptive timeouts and request hedging for idempotent upstream GETs.
+
+Latencies are recorded per endpoint (e.g. "taxes") in a capped Redis list shared
+by all workers of the site. Once an endpoint has MIN_SAMPLES samples:
+
+- adaptive timeout: the read timeout becomes TIMEOUT_FACTOR x the endpoint's p99,
+  but at least MIN_READ_TIMEOUT and at most the caller's timeout. A stuck response
+  fails after a few typical response times instead of the full fixed timeout.
+- hedging: on upstreams with `hedge` on, a second identical request goes out when
+  the first has not answered by the endpoint's p95, and whichever answers first
+  is used. Only the slowest ~5% of calls are hedged, so the extra upstream load
+  stays around 5%.
+
+Only GETs that are safe to send twice may use this, through
+GuardedSession.hedged_get. Both requests of a hedged call pass through the
+upstream's breaker, bulkhead and rate limiter. A request that times out is
+recorded at its timeout, so a slow spell widens the timeouts again instead of
+failing every call.
+
+Percentiles are re-read from Redis at most every REFRESH_SECONDS per process.
+Keys are namespaced when the session is created and only raw Redis commands are
+used on them; RedisWrapper's list helpers would prefix them again and need a
+frappe context. So a session built on the request thread can still be used from
+worker threads.
+"""
+
+import contextvars
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+# Latest samples kept per endpoint
+SAMPLES = 500
+SAMPLE_TTL = 24 * 60 * 60
+# Fixed timeouts apply until an endpoint has this many samples
+MIN_SAMPLES = 20
+TIMEOUT_PERCENTILE = 99
+TIMEOUT_FACTOR = 2
+MIN_READ_TIMEOUT = 2
+HEDGE_PERCENTILE = 95
+REFRESH_SECONDS = 30
+# Requests of hedged calls in flight per process; when all are busy, calls go out without a hedge
+HEDGE_WORKERS = 16
+
+_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+_workers = threading.BoundedSemaphore(HEDGE_WORKERS)
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of sorted `samples`.
+    """
+    rank = math.ceil(pct / 100 * len(samples))
+    return samples[min(max(rank, 1), len(samples)) - 1]
+
+
+class LatencyTracker:
+    """
+    Latency samples and percentiles of one upstream's endpoints.
+    """
+
+    def __init__(self, redis, prefix):
+        self.redis = redis
+        self.key = f"{prefix}:latency:{{}}"
+        self._stats = {}
+
+    def record(self, endpoint, seconds):
+        key = self.key.format(endpoint)
+        pipe = self.redis.pipeline()
+        pipe.lpush(key, round(seconds, 4))
+        pipe.ltrim(key, 0, SAMPLES - 1)
+        pipe.expire(key, SAMPLE_TTL)
+        pipe.execute()
+
+    def stats(self, endpoint):
+        """
+        (p95, p99) of `endpoint` in seconds, or None while it has fewer than MIN_SAMPLES samples.
+        """
+        now = time.monotonic()
+        cached = self._stats.get(endpoint)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        # Raw LRANGE like the pipeline in record(): RedisWrapper.lrange would prefix the key again
+        samples = sorted(
+            float(v) for v in self.redis.execute_command("LRANGE", self.key.format(endpoint), 0, -1)
+        )
+        if len(samples) < MIN_SAMPLES:
+            # Not cached: the few samples are cheap to read, and the endpoint warms up sooner
+            return None
+        stats = (percentile(samples, HEDGE_PERCENTILE), percentile(samples, TIMEOUT_PERCENTILE))
+        self._stats[endpoint] = (now + REFRESH_SECONDS, stats)
+        return stats
+
+
+def hedged_get(session, url, endpoint, timeout=None, **kwargs):
+    """
+    GET `url` through a GuardedSession with an adaptive read timeout and, when the
+    session's upstream has `hedge` on, a hedge request after the endpoint's p95.
+
+    Args:
+        endpoint (str): Name the latencies of this kind of call are tracked under.
+        timeout: (connect, read) or one number for both, as for requests; it is
+            the ceiling of the adaptive read timeout. Defaults to the upstream's.
+    """
+    config = session.breaker.config
+    timeout = timeout or config["timeout"]
+    connect, read = timeout if isinstance(timeout, (tuple, list)) else (timeout, timeout)
+
+    stats = session.latency.stats(endpoint)
+    if stats and int(config.get("adaptive_timeout", 1)):
+        read = min(read, max(MIN_READ_TIMEOUT, stats[1] * TIMEOUT_FACTOR))
+    timeout = (connect, read)
+
+    primary = _submit(session, url, endpoint, timeout, kwargs) if stats and int(config.get("hedge", 0)) else None
+    if not primary:
+        return _timed_get(session, url, endpoint, timeout, kwargs)
+
+    if wait([primary], timeout=stats[0]).done:
+        return primary.result()
+    hedge = _submit(session, url, endpoint, timeout, kwargs)
+    if not hedge:
+        return primary.result()
+
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = next((future for future in done if not future.exception()), None)
+        if winner:
+            for loser in pending:
+                loser.add_done_callback(_close_response)
+            return winner.result()
+    # Both failed: raise the first request's error
+    return primary.result()
+
+
+def _submit(session, url, endpoint, timeout, kwargs):
+    """
+    Future of the GET on a hedging worker, or None when all workers are busy.
+    """
+    if not _workers.acquire(blocking=False):
+        return None
+    # Carries the rate-limit account and priority of the calling thread along
+    context = contextvars.copy_context()
+    future = _pool.submit(context.run, _timed_get, session, url, endpoint, timeout, kwargs)
+    future.add_done_callback(lambda _: _workers.release())
+    return future
+
+
+def _timed_get(session, url, endpoint, timeout, kwargs):
+    start = time.monotonic()
+    try:
+        resp = session.get(url, timeout=timeout, **kwargs)
+    except requests.Timeout:
+        session.latency.record(endpoint, timeout[1])
+        raise
+    session.latency.record(endpoint, time.monotonic() - start)
+    return resp
+
+
+def _close_response(future):
+    if not future.exception():
+        future.result().close()
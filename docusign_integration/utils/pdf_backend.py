@@ -0,0 +1,175 @@
+"""
+PDF operations behind a small backend interface.
+
+Contract sends merge the DocuSign template with the generated contract and count
+the merged pages. Both run on every send, so the engine matters for large,
+annexure-heavy contracts:
+
+    PyPDF2    pure Python, always installed; the default
+    pikepdf   bindings to qpdf (C++), several times faster with far less memory;
+              optional, `pip install pikepdf`
+
+The engine is picked with PDF Engine in DocuSign Settings. "Auto" uses pikepdf
+when it is installed. A selected engine that is not installed falls back to
+PyPDF2, so a site never breaks on a missing package.
+"""
+
+import importlib.util
+from io import BytesIO
+
+import frappe
+
+DEFAULT_ENGINE = "PyPDF2"
+
+
+class PDFBackend:
+    """
+    Every method takes and returns whole PDF documents as bytes.
+    """
+
+    name = None
+    module = None
+
+    @classmethod
+    def available(cls):
+        return importlib.util.find_spec(cls.module) is not None
+
+    def merge(self, documents):
+        """
+        Concatenates the pages of `documents` (list of bytes) in order.
+        """
+        raise NotImplementedError
+
+    def page_count(self, content):
+        raise NotImplementedError
+
+    def optimize(self, content):
+        """
+        Rewrites the document with compressed streams; the pages are unchanged.
+        """
+        raise NotImplementedError
+
+    def split(self, content, pages_per_part=1):
+        """
+        Splits the document into parts of `pages_per_part` pages (the last may be shorter).
+        """
+        raise NotImplementedError
+
+
+class PyPDF2Backend(PDFBackend):
+    name = "PyPDF2"
+    module = "PyPDF2"
+
+    def merge(self, documents):
+        from PyPDF2 import PdfReader, PdfWriter
+
+        writer = PdfWriter()
+        for content in documents:
+            for page in PdfReader(BytesIO(content)).pages:
+                writer.add_page(page)
+        return self._write(writer)
+
+    def page_count(self, content):
+        from PyPDF2 import PdfReader
+
+        return len(PdfReader(BytesIO(content)).pages)
+
+    def optimize(self, content):
+        from PyPDF2 import PdfReader, PdfWriter
+
+        writer = PdfWriter()
+        for page in PdfReader(BytesIO(content)).pages:
+            page.compress_content_streams()
+            writer.add_page(page)
+        return self._write(writer)
+
+    def split(self, content, pages_per_part=1):
+        from PyPDF2 import PdfReader, PdfWriter
+
+        pages = PdfReader(BytesIO(content)).pages
+        parts = []
+        for start in range(0, len(pages), pages_per_part):
+            writer = PdfWriter()
+            for page in pages[start:start + pages_per_part]:
+                writer.add_page(page)
+            parts.append(self._write(writer))
+        return parts
+
+    def _write(self, writer):
+        buffer = BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue()
+
+
+class PikePDFBackend(PDFBackend):
+    name = "pikepdf"
+    module = "pikepdf"
+
+    def merge(self, documents):
+        import pikepdf
+
+        merged = pikepdf.Pdf.new()
+        # Sources must stay open until the merged document is written
+        sources = [pikepdf.Pdf.open(BytesIO(content)) for content in documents]
+        try:
+            for source in sources:
+                merged.pages.extend(source.pages)
+            return self._write(merged)
+        finally:
+            for source in sources:
+                source.close()
+
+    def page_count(self, content):
+        import pikepdf
+
+        with pikepdf.Pdf.open(BytesIO(content)) as pdf:
+            return len(pdf.pages)
+
+    def optimize(self, content):
+        import pikepdf
+
+        with pikepdf.Pdf.open(BytesIO(content)) as pdf:
+            return self._write(pdf, compress_streams=True, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+
+    def split(self, content, pages_per_part=1):
+        import pikepdf
+
+        parts = []
+        with pikepdf.Pdf.open(BytesIO(content)) as pdf:
+            for start in range(0, len(pdf.pages), pages_per_part):
+                part = pikepdf.Pdf.new()
+                part.pages.extend(pdf.pages[start:start + pages_per_part])
+                parts.append(self._write(part))
+        return parts
+
+    def _write(self, pdf, **kwargs):
+        buffer = BytesIO()
+        pdf.save(buffer, **kwargs)
+        return buffer.getvalue()
+
+
+BACKENDS = {backend.name: backend for backend in (PyPDF2Backend, PikePDFBackend)}
+# Preferred order for "Auto"
+AUTO_ORDER = ("pikepdf", "PyPDF2")
+
+
+def resolve_engine(engine):
+    """
+    Name of the installed backend to use for the configured `engine`.
+    """
+    if engine == "Auto":
+        return next(name for name in AUTO_ORDER if BACKENDS[name].available())
+    if engine in BACKENDS and BACKENDS[engine].available():
+        return engine
+    return DEFAULT_ENGINE
+
+
+def get_pdf_backend(engine=None):
+    """
+    The PDF backend selected in DocuSign Settings, or `engine` when given.
+    """
+    if not engine:
+        settings = frappe.get_cached_doc("DocuSign Settings", "DocuSign Settings")
+        engine = settings.get("pdf_engine") or DEFAULT_ENGINE
+
+    return BACKENDS[resolve_engine(engine)]()
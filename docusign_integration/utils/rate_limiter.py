@@ -0,0 +1,218 @@
+"""
+Distributed token-bucket limiter for the DocuSign API quota.
+
+DocuSign enforces an hourly API quota per account. Every DocuSign call takes a
+token from one Redis bucket shared by all workers; the bucket refills
+continuously at quota / 3600 tokens per second.
+
+Calls have a priority class. Lower classes may not dip into a reserve kept for
+the classes above them, so bulk work runs out of budget first and throttles
+itself (waiting for tokens) while interactive users keep theirs:
+
+    interactive   user-facing sends and downloads; may use the whole bucket
+    normal        may not take the last 10% of the quota
+    background    reconciliation, bulk jobs; may not take the last 30%
+
+The priority defaults to interactive inside a web request and to background in
+jobs; override it with `with rate_priority("normal"):`. When DocuSign reports its
+own remaining budget (X-RateLimit-Remaining) the bucket is lowered to match.
+
+Each DocuSign account of the pool (docusign_integration/accounts.py) has its own
+bucket; calls are charged to the account set with `rate_account(...)`, or to
+"default" outside one.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import frappe
+
+PRIORITIES = ("interactive", "normal", "background")
+
+DEFAULTS = {
+    "hourly_quota": 3000,
+    # Fraction of the quota each class must leave for the classes above it
+    "reserve": {"interactive": 0.0, "normal": 0.1, "background": 0.3},
+    # Longest a call waits for a token before giving up with RateLimited
+    "max_wait": {"interactive": 5, "normal": 30, "background": 300},
+}
+
+KEY = "docusign_integration:rate_limit:{}"
+
+_priority = ContextVar("docusign_rate_priority", default=None)
+# (account name, hourly quota or None for the site default)
+_account = ContextVar("docusign_rate_account", default=("default", None))
+
+# KEYS[1]: bucket hash. ARGV: capacity, refill per second, cost, floor.
+# Returns {allowed, seconds to wait, tokens left}; floats as strings since Lua numbers are truncated.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local floor = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local wait = 0
+if tokens - cost >= floor then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (floor + cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) * 2)
+return {allowed, tostring(wait), tostring(tokens)}
+"""
+
+# Lowers the bucket to what DocuSign says is left; never raises it.
+OBSERVE_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+local remaining = tonumber(ARGV[1])
+if tokens == nil or remaining < tokens then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(remaining), 'reported', ARGV[1])
+else
+    redis.call('HSET', KEYS[1], 'reported', ARGV[1])
+end
+return 1
+"""
+
+
+class RateLimited(frappe.ValidationError):
+    http_status_code = 429
+
+
+def get_rate_limit_config():
+    """
+    DEFAULTS, overridable per site via `docusign_rate_limit` in site_config.json.
+    """
+    overrides = frappe.conf.get("docusign_rate_limit") or {}
+    config = {**DEFAULTS, **overrides}
+    config["reserve"] = {**DEFAULTS["reserve"], **(overrides.get("reserve") or {})}
+    config["max_wait"] = {**DEFAULTS["max_wait"], **(overrides.get("max_wait") or {})}
+    return config
+
+
+@contextmanager
+def rate_priority(priority):
+    """
+    Runs the block's DocuSign calls under `priority`.
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority: {priority}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    priority = _priority.get()
+    if priority:
+        return priority
+    # Worker threads without a frappe context have no request either
+    return "interactive" if getattr(frappe.local, "request", None) else "background"
+
+
+@contextmanager
+def rate_account(account, hourly_quota=None):
+    """
+    Charges the block's DocuSign calls to `account`'s bucket.
+    """
+    token = _account.set((account, hourly_quota or None))
+    try:
+        yield
+    finally:
+        _account.reset(token)
+
+
+def current_account():
+    return _account.get()
+
+
+class RateLimiter:
+    """
+    Token bucket for one DocuSign account. Keys are resolved on creation, so a
+    limiter built on the request thread can be used from worker threads.
+    """
+
+    def __init__(self, account="default", hourly_quota=None):
+        self.config = get_rate_limit_config()
+        self.account = account
+        self.capacity = float(hourly_quota or self.config["hourly_quota"])
+        self.rate = self.capacity / 3600
+        self.redis = frappe.cache()
+
+        key = self.redis.make_key(KEY.format(account))
+        self.key = key.decode() if isinstance(key, bytes) else key
+        self._take = self.redis.register_script(TAKE_SCRIPT)
+        self._observe = self.redis.register_script(OBSERVE_SCRIPT)
+
+    def acquire(self, priority=None, cost=1):
+        """
+        Takes `cost` tokens, waiting up to the priority's max_wait for them.
+
+        Raises:
+            RateLimited: The budget for this priority stays exhausted past max_wait.
+        """
+        priority = priority or current_priority()
+        floor = self.capacity * float(self.config["reserve"][priority])
+        deadline = time.monotonic() + float(self.config["max_wait"][priority])
+
+        while True:
+            allowed, wait, _ = self._take(keys=[self.key], args=[self.capacity, self.rate, cost, floor])
+            if int(allowed):
+                return
+            wait = float(wait)
+            if time.monotonic() + wait > deadline:
+                raise RateLimited(
+                    f"DocuSign API budget of account {self.account} exhausted for {priority} calls, "
+                    f"retry in {int(wait) + 1}s"
+                )
+            time.sleep(min(wait, 5))
+
+    def observe(self, headers):
+        """
+        Aligns the bucket with DocuSign's X-RateLimit-Remaining response header.
+        """
+        remaining = headers.get("X-RateLimit-Remaining") if headers else None
+        if remaining is not None and str(remaining).isdigit():
+            self._observe(keys=[self.key], args=[int(remaining)])
+
+    def remaining(self):
+        # Raw HGETALL: the key is already namespaced, RedisWrapper.hgetall would prefix it again
+        state = self.redis.execute_command("HGETALL", self.key) or {}
+        state = {(k.decode() if isinstance(k, bytes) else k): v for k, v in state.items()}
+        tokens = float(state.get("tokens") or self.capacity)
+        elapsed = time.time() - float(state.get("ts") or time.time())
+        return {
+            "tokens": round(min(self.capacity, tokens + max(0.0, elapsed) * self.rate), 1),
+            "capacity": self.capacity,
+            "reported_by_docusign": int(state["reported"]) if state.get("reported") else None,
+        }
+
+
+@frappe.whitelist()
+def get_rate_limit_status(account="default"):
+    """
+    Remaining DocuSign budget of `account`, overall and per priority class.
+    """
+    frappe.only_for("System Manager")
+    from docusign_integration.docusign_integration.accounts import get_account
+
+    limiter = RateLimiter(account, hourly_quota=get_account(account).hourly_quota)
+    status = limiter.remaining()
+    status["available"] = {
+        priority: max(0, round(status["tokens"] - limiter.capacity * float(reserve), 1))
+        for priority, reserve in limiter.config["reserve"].items()
+    }
+    return status
@@ -0,0 +1,59 @@
+# Copyright (c) 2026, nithin and Contributors
+# See license.txt
+
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from docusign_integration.utils.latency import (
+	HEDGE_PERCENTILE,
+	MIN_READ_TIMEOUT,
+	MIN_SAMPLES,
+	TIMEOUT_PERCENTILE,
+	LatencyTracker,
+	hedged_get,
+	percentile,
+)
+
+SAMPLES = [round(0.01 * i, 2) for i in range(1, 51)]
+
+
+class TestLatencyTracker(FrappeTestCase):
+	def setUp(self):
+		# Namespaced once, like CircuitBreaker.key_prefix; frappe.cache() is a RedisWrapper
+		self.redis = frappe.cache()
+		prefix = self.redis.make_key("docusign_integration:test_latency")
+		self.tracker = LatencyTracker(self.redis, prefix.decode() if isinstance(prefix, bytes) else prefix)
+		self.key = self.tracker.key.format("taxes")
+		self.redis.execute_command("DEL", self.key)
+
+	def tearDown(self):
+		self.redis.execute_command("DEL", self.key)
+
+	def test_reads_back_recorded_samples(self):
+		for seconds in SAMPLES:
+			self.tracker.record("taxes", seconds)
+
+		# Worker threads have no frappe context: reading must not prefix the key again
+		with patch.object(type(self.redis), "make_key", side_effect=AssertionError("key prefixed twice")):
+			stats = self.tracker.stats("taxes")
+
+		self.assertEqual(stats, (percentile(SAMPLES, HEDGE_PERCENTILE), percentile(SAMPLES, TIMEOUT_PERCENTILE)))
+		self.assertEqual(stats, (0.48, 0.5))
+
+	def test_no_stats_before_min_samples(self):
+		for seconds in SAMPLES[: MIN_SAMPLES - 1]:
+			self.tracker.record("taxes", seconds)
+		self.assertIsNone(self.tracker.stats("taxes"))
+
+	def test_adaptive_read_timeout(self):
+		for seconds in SAMPLES:
+			self.tracker.record("taxes", seconds)
+
+		session = MagicMock(latency=self.tracker)
+		session.breaker.config = {"timeout": (5, 20), "adaptive_timeout": 1, "hedge": 0}
+		hedged_get(session, "https://cms.example/taxes", "taxes", timeout=15)
+
+		# 2 x p99 (0.5 s) is below the floor; the caller's 15 s is only the ceiling
+		self.assertEqual(session.get.call_args.kwargs["timeout"], (15, MIN_READ_TIMEOUT))
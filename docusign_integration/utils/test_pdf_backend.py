@@ -0,0 +1,66 @@
+# Copyright (c) 2026, nithin and Contributors
+# See license.txt
+
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+from PyPDF2 import PdfReader
+
+from docusign_integration.benchmarks.pdf_corpus import make_pdf
+from docusign_integration.utils.pdf_backend import (
+	BACKENDS,
+	PikePDFBackend,
+	PyPDF2Backend,
+	resolve_engine,
+)
+
+
+def describe(content):
+	"""
+	What must not depend on the engine: page count, page sizes and page text.
+	"""
+	reader = PdfReader(BytesIO(content))
+	return [(tuple(float(v) for v in page.mediabox), page.extract_text().strip()) for page in reader.pages]
+
+
+class TestPDFBackend(FrappeTestCase):
+	def setUp(self):
+		self.template = make_pdf(2, title="Template")
+		self.contract = make_pdf(5, title="Contract", images=True)
+		self.expected = describe(self.template) + describe(self.contract)
+
+	def check_backend(self, backend):
+		merged = backend.merge([self.template, self.contract])
+		self.assertEqual(describe(merged), self.expected)
+		self.assertEqual(backend.page_count(merged), 7)
+
+		self.assertEqual(describe(backend.optimize(merged)), self.expected)
+
+		parts = backend.split(merged, pages_per_part=3)
+		self.assertEqual([backend.page_count(part) for part in parts], [3, 3, 1])
+		self.assertEqual([page for part in parts for page in describe(part)], self.expected)
+
+	def test_pypdf2_backend(self):
+		self.check_backend(PyPDF2Backend())
+
+	@unittest.skipUnless(PikePDFBackend.available(), "pikepdf is not installed")
+	def test_pikepdf_backend(self):
+		self.check_backend(PikePDFBackend())
+
+	@unittest.skipUnless(PikePDFBackend.available(), "pikepdf is not installed")
+	def test_backends_are_interchangeable(self):
+		# Output of one engine is read identically by the other
+		pypdf2, pikepdf = PyPDF2Backend(), PikePDFBackend()
+		merged = pikepdf.merge([pypdf2.merge([self.template]), self.contract])
+		self.assertEqual(pypdf2.page_count(merged), pikepdf.page_count(merged))
+		self.assertEqual(describe(merged), self.expected)
+
+	def test_missing_engine_falls_back_to_pypdf2(self):
+		with patch.object(PikePDFBackend, "available", return_value=False):
+			self.assertEqual(resolve_engine("pikepdf"), "PyPDF2")
+			self.assertEqual(resolve_engine("Auto"), "PyPDF2")
+		self.assertEqual(resolve_engine("PyPDF2"), "PyPDF2")
+		self.assertEqual(resolve_engine("unknown"), "PyPDF2")
+		self.assertEqual(set(BACKENDS), {"PyPDF2", "pikepdf"})